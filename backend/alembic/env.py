@@ -35,6 +35,8 @@ from app.db.models import (
     unanswered_question,
     otp,
     workspace_invitation,
+    email_outbox,
+    workspace_usage,
 )
 
 config = context.config
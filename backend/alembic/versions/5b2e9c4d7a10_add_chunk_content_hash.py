@@ -0,0 +1,34 @@
+"""add_chunk_content_hash
+
+Revision ID: 5b2e9c4d7a10
+Revises: 95e8066f5eb3
+Create Date: 2026-10-19 10:12:31.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9c4d7a10'
+down_revision: Union[str, Sequence[str], None] = '95e8066f5eb3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('document_chunks', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_document_chunks_workspace_content_hash', 'document_chunks', ['workspace_id', 'content_hash'], unique=False)
+    op.create_index(op.f('ix_document_chunks_document_id'), 'document_chunks', ['document_id'], unique=False)
+    op.create_index(op.f('ix_embeddings_chunk_id'), 'embeddings', ['chunk_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_embeddings_chunk_id'), table_name='embeddings')
+    op.drop_index(op.f('ix_document_chunks_document_id'), table_name='document_chunks')
+    op.drop_index('ix_document_chunks_workspace_content_hash', table_name='document_chunks')
+    op.drop_column('document_chunks', 'content_hash')
@@ -0,0 +1,30 @@
+"""add_workspace_member_indexes
+
+Revision ID: 7c1d3e5f9a21
+Revises: 5b2e9c4d7a10
+Create Date: 2026-10-19 16:40:12.514027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d3e5f9a21'
+down_revision: Union[str, Sequence[str], None] = '5b2e9c4d7a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_workspace_members_workspace_joined', 'workspace_members', ['workspace_id', 'joined_at', 'id'], unique=False)
+    op.create_index(op.f('ix_workspace_members_user_id'), 'workspace_members', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_workspace_members_user_id'), table_name='workspace_members')
+    op.drop_index('ix_workspace_members_workspace_joined', table_name='workspace_members')
@@ -0,0 +1,28 @@
+"""add_workspace_slug_pattern_index
+
+Revision ID: d91b4f7a2c63
+Revises: a3f6c2e8d4b7
+Create Date: 2026-10-19 18:42:07.611930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91b4f7a2c63'
+down_revision: Union[str, Sequence[str], None] = 'a3f6c2e8d4b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_workspaces_slug_pattern', 'workspaces', ['slug'], unique=False, postgresql_ops={'slug': 'text_pattern_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workspaces_slug_pattern', table_name='workspaces')
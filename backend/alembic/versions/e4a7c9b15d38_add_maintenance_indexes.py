@@ -0,0 +1,34 @@
+"""add_maintenance_indexes
+
+Revision ID: e4a7c9b15d38
+Revises: d91b4f7a2c63
+Create Date: 2026-10-19 19:20:44.093512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c9b15d38'
+down_revision: Union[str, Sequence[str], None] = 'd91b4f7a2c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_conversations_active_started', 'conversations', ['started_at'], unique=False, postgresql_where=sa.text("status = 'active'"))
+    op.create_index('ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at'], unique=False)
+    op.create_index(op.f('ix_otps_expires_at'), 'otps', ['expires_at'], unique=False)
+    op.create_index('ix_workspace_invitations_status_expires', 'workspace_invitations', ['status', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workspace_invitations_status_expires', table_name='workspace_invitations')
+    op.drop_index(op.f('ix_otps_expires_at'), table_name='otps')
+    op.drop_index('ix_messages_conversation_created', table_name='messages')
+    op.drop_index('ix_conversations_active_started', table_name='conversations', postgresql_where=sa.text("status = 'active'"))
@@ -0,0 +1,51 @@
+"""add_workspace_usage
+
+Revision ID: f2c8d6a41e97
+Revises: e4a7c9b15d38
+Create Date: 2026-10-19 20:02:16.447810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8d6a41e97'
+down_revision: Union[str, Sequence[str], None] = 'e4a7c9b15d38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('workspace_usage',
+    sa.Column('workspace_id', sa.UUID(), nullable=False),
+    sa.Column('metric', sa.String(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('workspace_id', 'metric', 'period')
+    )
+    # Monthly message reconciliation
+    op.create_index('ix_messages_workspace_created', 'messages', ['workspace_id', 'created_at'], unique=False)
+
+    # Start the counters from the current counts; quotas are enforced against them
+    for metric, table in (("members", "workspace_members"), ("agents", "agents"), ("documents", "documents")):
+        op.execute(
+            f"INSERT INTO workspace_usage (workspace_id, metric, period, value, updated_at) "
+            f"SELECT workspace_id, '{metric}', '', count(*), now() FROM {table} GROUP BY workspace_id"
+        )
+    op.execute(
+        "INSERT INTO workspace_usage (workspace_id, metric, period, value, updated_at) "
+        "SELECT workspace_id, 'messages', to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM'), count(*), now() "
+        "FROM messages WHERE role = 'user' "
+        "AND created_at >= date_trunc('month', now() AT TIME ZONE 'UTC') GROUP BY workspace_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_workspace_created', table_name='messages')
+    op.drop_table('workspace_usage')
@@ -1,41 +1,149 @@
+import hashlib
+import hmac
 from typing import AsyncGenerator
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Form, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from app.db.session import AsyncSessionLocal
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, AsyncReadSessionLocal
 from app.security.auth import decode_access_token
+from app.security.permissions import SESSION_KEY as WORKSPACE_ACCESS_KEY, resolve_access
+from app.security.rate_limit import client_ip as get_client_ip
 from app.db.repositories.auth_repository import UserRepository, OTPRepository
+from app.security.token_denylist import is_token_revoked
+from app.security.user_cache import get_user
 from app.services.auth_service import AuthService
 from app.db.models.user import User
 
 
 # HTTP Bearer token security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def require_metrics_token(
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_security),
+):
+    """
+    Dependency for operational endpoints (/metrics, /health/db), which expose
+    internal state and workspace/agent IDs: they need METRICS_TOKEN and are
+    hidden entirely when it is not configured.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(
+        credentials.credentials.encode("utf-8"), settings.METRICS_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def _prepare_session(session: AsyncSession, request: Request):
+    session.info["write_scope"] = _write_scope(request)
+    # Both of the request's sessions share its resolved workspace access
+    if not hasattr(request.state, "workspace_access"):
+        request.state.workspace_access = {}
+    session.info[WORKSPACE_ACCESS_KEY] = request.state.workspace_access
+
+
+def _write_scope(request: Request) -> str | None:
+    """Identifies the client for read-your-writes routing (a hash, so no tokens are kept in memory)."""
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """Dependency to get database session."""
     async with AsyncSessionLocal() as session:
+        _prepare_session(session, request)
         try:
             yield session
         finally:
             await session.close()
 
 
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get a read-only session for dashboards and listings.
+    Uses the read replica (DATABASE_READ_URL) except shortly after the same
+    client wrote to the primary, so it reads its own writes.
+    """
+    async with AsyncReadSessionLocal() as session:
+        _prepare_session(session, request)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def statement_timeout(timeout_ms: int):
+    """
+    Route dependency that sets the statement timeout for the request's session
+    (the same sessions every other get_db / get_read_db dependency of the
+    request receives).
+    """
+    async def _set_statement_timeout(
+        db: AsyncSession = Depends(get_db),
+        read_db: AsyncSession = Depends(get_read_db),
+    ) -> None:
+        db.info["statement_timeout_ms"] = timeout_ms
+        read_db.info["statement_timeout_ms"] = timeout_ms
+    return _set_statement_timeout
+
+
+
+_logins_in_progress: dict[str, int] = {}
+
+
+async def limit_login_concurrency(request: Request) -> AsyncGenerator[None, None]:
+    """
+    Caps concurrent login attempts per client IP, so one client can't occupy
+    the password hashing pool.
+    """
+    client_ip = get_client_ip(request)
+    if _logins_in_progress.get(client_ip, 0) >= settings.LOGIN_MAX_CONCURRENT_PER_IP:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts in progress. Please try again shortly."
+        )
+    _logins_in_progress[client_ip] = _logins_in_progress.get(client_ip, 0) + 1
+    try:
+        yield
+    finally:
+        remaining = _logins_in_progress[client_ip] - 1
+        if remaining:
+            _logins_in_progress[client_ip] = remaining
+        else:
+            del _logins_in_progress[client_ip]
+
 
 async def get_auth_service(db: AsyncSession = Depends(get_db)) -> AuthService:
     """Dependency to get auth service."""
     from app.services.email_service import EmailService
     user_repo = UserRepository(db)
     otp_repo = OTPRepository(db)
-    email_service = EmailService()
+    email_service = EmailService(db)
     return AuthService(user_repo, otp_repo, email_service)
 
 
 async def get_workspace_service(db: AsyncSession = Depends(get_db)):
     """Dependency to get workspace service."""
+    return _build_workspace_service(db)
+
+
+async def get_read_workspace_service(db: AsyncSession = Depends(get_read_db)):
+    """Dependency to get workspace service for read-only endpoints (replica, no email)."""
+    return _build_workspace_service(db, send_email=False)
+
+
+def _build_workspace_service(db: AsyncSession, send_email: bool = True):
     from app.db.repositories.workspace_repository import WorkspaceRepository, WorkspaceMemberRepository
     from app.services.workspace_service import WorkspaceService
     from app.services.email_service import EmailService
@@ -46,7 +154,8 @@ async def get_workspace_service(db: AsyncSession = Depends(get_db)):
     member_repo = WorkspaceMemberRepository(db)
     user_repo = UserRepository(db)
     invitation_repo = WorkspaceInvitationRepository(db)
-    email_service = EmailService()
+    # Queued emails are written to the outbox, which must not go to the replica
+    email_service = EmailService(db) if send_email else None
     return WorkspaceService(workspace_repo, member_repo, user_repo, invitation_repo, email_service)
 
 
@@ -75,12 +184,25 @@ async def get_knowledge_service(db: AsyncSession = Depends(get_db)):
     return KnowledgeService(db)
 
 
+async def get_read_agent_service(db: AsyncSession = Depends(get_read_db)):
+    """Dependency to get agent service for read-only endpoints (replica)."""
+    from app.services.agent_service import AgentService
+    return AgentService(db)
+
+
+async def get_read_knowledge_service(db: AsyncSession = Depends(get_read_db)):
+    """Dependency to get knowledge service for read-only endpoints (replica)."""
+    from app.services.knowledge_service import KnowledgeService
+    return KnowledgeService(db)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
 ) -> User:
     """
     Dependency to get the current authenticated user from JWT token.
+    Rejects revoked tokens; the user is served from a short-lived cache.
     """
     token = credentials.credentials
     
@@ -99,8 +221,15 @@ async def get_current_user(
             detail="Invalid token payload"
         )
 
-    user_repo = UserRepository(db)
-    user = await user_repo.get_by_id(UUID(user_id))
+    if await is_token_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    # The token is verified; the user usually comes from the cache without a query
+    user = await get_user(db, UUID(user_id))
     
     if not user:
         raise HTTPException(
@@ -128,3 +257,43 @@ async def get_current_user_optional(
         return await get_current_user(credentials, db)
     except HTTPException:
         return None
+
+
+async def get_workspace_access(
+    workspace_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    The current user's access to the route's workspace_id (path or query),
+    resolved once per request on the primary and shared with the services
+    through the request's sessions.
+    """
+    return await resolve_access(db, workspace_id, current_user.id)
+
+
+async def get_form_workspace_access(
+    workspace_id: UUID = Form(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """get_workspace_access() for routes that take workspace_id as a form field (uploads)."""
+    return await resolve_access(db, workspace_id, current_user.id)
+
+
+def _ensure_workspace_access(access):
+    if not access.exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workspace not found")
+    if not access.has_access:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You don't have access to this workspace")
+    return access
+
+
+async def require_workspace_access(access=Depends(get_workspace_access)):
+    """Dependency that rejects users without access to the route's workspace."""
+    return _ensure_workspace_access(access)
+
+
+async def require_form_workspace_access(access=Depends(get_form_workspace_access)):
+    """require_workspace_access() for routes that take workspace_id as a form field."""
+    return _ensure_workspace_access(access)
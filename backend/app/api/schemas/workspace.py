@@ -83,3 +83,4 @@ class WorkspaceMemberResponse(BaseModel):
 class WorkspaceMemberListResponse(BaseModel):
     members: List[WorkspaceMemberResponse]
     total: int
+    next_cursor: Optional[str] = None
@@ -1,13 +1,17 @@
+import asyncio
 from typing import List, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.api import deps
 from app.api.schemas.agent import AgentCreate, AgentResponse, ChatRequest, ChatResponse
+from app.core.resilience import CircuitOpenError, OverloadedError
 from app.services.agent_service import AgentService
+from app.services.quota_service import QuotaExceededError
 from app.db.models.user import User
 from app.rag.graph import RAGGraph
 from app.rag.retriever import Retriever
+from app.services.llm_service import llm_available
 
 router = APIRouter()
 
@@ -33,6 +37,8 @@ async def create_agent(
             document_ids=agent_in.document_ids,
             allowed_domains=agent_in.allowed_domains
         )
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -42,7 +48,7 @@ async def create_agent(
 async def list_agents(
     workspace_id: UUID,
     current_user: User = Depends(deps.get_current_user),
-    service: AgentService = Depends(deps.get_agent_service),
+    service: AgentService = Depends(deps.get_read_agent_service),
 ):
     """
     List all agents in a workspace.
@@ -53,7 +59,7 @@ async def list_agents(
 async def get_agent(
     agent_id: UUID,
     current_user: User = Depends(deps.get_current_user),
-    service: AgentService = Depends(deps.get_agent_service),
+    service: AgentService = Depends(deps.get_read_agent_service),
 ):
     """
     Get a specific agent.
@@ -131,20 +137,29 @@ async def chat_agent(
     # Initialize RAG Graph
     rag = RAGGraph(db_session)
     
-    # Extract document IDs from agent configuration
+    # Extract document IDs and context budget from agent configuration
     document_ids = None
-    if agent.configuration and "knowledge_sources" in agent.configuration:
-        document_ids = agent.configuration["knowledge_sources"]
+    context_token_budget = None
+    if agent.configuration:
+        document_ids = agent.configuration.get("knowledge_sources")
+        context_token_budget = agent.configuration.get("context_token_budget")
     
     # Process
     try:
+        if not llm_available():
+            # Don't spend embedding and vector search on an answer we can't generate
+            raise CircuitOpenError("LLM circuit open")
         response = await rag.process_message(
             question=chat_request.message, 
             workspace_id=agent.workspace_id,
             agent_id=str(agent.id),
-            document_ids=document_ids
+            document_ids=document_ids,
+            context_token_budget=context_token_budget
         )
         return {"response": response}
+    except (CircuitOpenError, OverloadedError, asyncio.TimeoutError):
+        # The LLM is degraded; answer like the widget does instead of failing
+        return {"response": agent.fallback_message or "I'm sorry, I couldn't process your request. Please try again."}
     except Exception as e:
         print(f"Chat error: {e}")
         import traceback
@@ -4,13 +4,19 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Query
 from app.api import deps
+from app.core.config import settings
 from app.services.analytics_service import AnalyticsService
 from app.db.models.user import User
 from pydantic import BaseModel
 from typing import List, Dict, Any
 
 
-router = APIRouter()
+# Dashboard aggregations scan more rows than the chat path; give them a longer timeout.
+# Every route takes workspace_id; only its members may read its analytics.
+router = APIRouter(dependencies=[
+    Depends(deps.statement_timeout(settings.DB_ANALYTICS_STATEMENT_TIMEOUT_MS)),
+    Depends(deps.require_workspace_access),
+])
 
 
 # Response schemas
@@ -71,8 +77,22 @@ class ResponseTimeDistribution(BaseModel):
     distribution: List[ResponseTimeBucket]
 
 
+class StageLatency(BaseModel):
+    stage: str
+    avg_ms: float
+    p95_ms: float
+
+
+class LatencyBreakdownResponse(BaseModel):
+    stages: List[StageLatency]
+    messages: int
+    messages_with_timings: int
+    avg_top_similarity: float
+    no_context_rate: float
+
+
 # Helper to get analytics service
-async def get_analytics_service(db=Depends(deps.get_db)) -> AnalyticsService:
+async def get_analytics_service(db=Depends(deps.get_read_db)) -> AnalyticsService:
     return AnalyticsService(db)
 
 
@@ -213,3 +233,23 @@ async def get_response_time_distribution(
         start_date=start_date,
         end_date=end_date
     )
+
+
+@router.get("/latency-breakdown", response_model=LatencyBreakdownResponse)
+async def get_latency_breakdown(
+    workspace_id: UUID,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    agent_id: Optional[UUID] = Query(None),
+    current_user: User = Depends(deps.get_current_user),
+    service: AnalyticsService = Depends(get_analytics_service),
+):
+    """
+    Get average/p95 time per RAG stage and retrieval quality (top chunk similarity).
+    """
+    return await service.get_latency_breakdown(
+        workspace_id=workspace_id,
+        start_date=start_date,
+        end_date=end_date,
+        agent_id=agent_id
+    )
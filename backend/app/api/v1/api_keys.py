@@ -1,14 +1,18 @@
 from typing import List
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
-from app.api.deps import get_current_user, get_api_key_service
+from app.api.deps import get_current_user, get_api_key_service, require_workspace_access
 from app.api.schemas.api_key import ApiKeyCreate, ApiKeyUpdate, ApiKeyResponse, ApiKeyGenerated
 from app.db.models.user import User
 from app.services.api_key_service import ApiKeyService
 
 router = APIRouter()
 
-@router.post("/workspaces/{workspace_id}/api-keys", response_model=ApiKeyGenerated)
+@router.post(
+    "/workspaces/{workspace_id}/api-keys",
+    response_model=ApiKeyGenerated,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def create_api_key(
     workspace_id: UUID,
     payload: ApiKeyCreate,
@@ -38,7 +42,11 @@ async def create_api_key(
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
 
-@router.get("/workspaces/{workspace_id}/api-keys", response_model=List[ApiKeyResponse])
+@router.get(
+    "/workspaces/{workspace_id}/api-keys",
+    response_model=List[ApiKeyResponse],
+    dependencies=[Depends(require_workspace_access)],
+)
 async def list_api_keys(
     workspace_id: UUID,
     current_user: User = Depends(get_current_user),
@@ -53,7 +61,11 @@ async def list_api_keys(
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
 
-@router.patch("/workspaces/{workspace_id}/api-keys/{key_id}", response_model=ApiKeyResponse)
+@router.patch(
+    "/workspaces/{workspace_id}/api-keys/{key_id}",
+    response_model=ApiKeyResponse,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def update_api_key(
     workspace_id: UUID,
     key_id: UUID,
@@ -76,7 +88,10 @@ async def update_api_key(
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
 
-@router.delete("/workspaces/{workspace_id}/api-keys/{key_id}")
+@router.delete(
+    "/workspaces/{workspace_id}/api-keys/{key_id}",
+    dependencies=[Depends(require_workspace_access)],
+)
 async def revoke_api_key(
     workspace_id: UUID,
     key_id: UUID,
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from app.api.deps import get_auth_service, get_current_user
+from fastapi.security import HTTPAuthorizationCredentials
+from app.api.deps import get_auth_service, get_current_user, limit_login_concurrency, security
 from app.services.auth_service import AuthService
 from app.api.schemas.auth import (
     SignupRequest,
@@ -15,6 +16,9 @@ from app.api.schemas.auth import (
 )
 from app.db.models.user import User
 from app.core.config import settings
+from app.core.resilience import OverloadedError
+from app.security.auth import decode_access_token
+from app.security.token_denylist import revoke_token
 
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -45,9 +49,14 @@ async def signup(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except OverloadedError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The server is busy. Please try again shortly."
+        )
 
 
-@router.post("/login", response_model=AuthResponse)
+@router.post("/login", response_model=AuthResponse, dependencies=[Depends(limit_login_concurrency)])
 async def login(
     request: LoginRequest,
     auth_service: AuthService = Depends(get_auth_service)
@@ -69,6 +78,11 @@ async def login(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e)
         )
+    except OverloadedError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The server is busy. Please try again shortly."
+        )
 
 
 @router.post("/verify-otp", response_model=AuthResponse)
@@ -142,6 +156,11 @@ async def reset_password(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except OverloadedError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The server is busy. Please try again shortly."
+        )
 
 
 @router.post("/resend-otp", response_model=OTPResponse)
@@ -178,11 +197,15 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/logout", response_model=MessageResponse)
-async def logout(current_user: User = Depends(get_current_user)):
+async def logout(
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
     """
     Logout the current user.
-    Client should discard the JWT token.
+    The token is revoked until it expires; the client should discard it too.
     """
+    await revoke_token(decode_access_token(credentials.credentials))
     return MessageResponse(
         message="Logged out successfully. Please discard your access token."
     )
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 import shutil
 import tempfile
@@ -8,25 +8,31 @@ import asyncio
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
 from app.api import deps
 from app.db.models.user import User
-from app.services.knowledge_service import KnowledgeService
+from app.services.knowledge_service import DocumentNotFoundError, KnowledgeService
+from app.services.quota_service import QuotaExceededError
 from app.api.schemas.knowledge import DocumentResponse
 
 router = APIRouter()
 
-@router.post("/upload", response_model=DocumentResponse)
+@router.post(
+    "/upload",
+    response_model=DocumentResponse,
+    dependencies=[Depends(deps.require_form_workspace_access)],
+)
 async def upload_document(
     workspace_id: UUID = Form(...),
     collection_id: UUID = Form(...),
     file: UploadFile = File(...),
     process: bool = Form(False),
+    document_id: Optional[UUID] = Form(None),
     current_user: User = Depends(deps.get_current_user),
     service: KnowledgeService = Depends(deps.get_knowledge_service),
 ):
     """
     Upload a PDF file to be ingested into the knowledge base.
     The file is saved temporarily, processed, and then deleted.
+    Pass document_id to upload a revised version of an existing document.
     """
-    # Verify user has access to workspace (TODO: Add proper permission check)
     print(f"[DEBUG] Uploading file: {file.filename}")
     
     if file.content_type != "application/pdf":
@@ -69,9 +75,17 @@ async def upload_document(
     try:
         # Ingest
         print(f"[DEBUG] Starting ingestion for workspace {workspace_id}")
-        document = await service.ingest_file(workspace_id, collection_id, tmp_path, process_embeddings=process, original_filename=file.filename)
+        document = await service.ingest_file(workspace_id, collection_id, tmp_path, process_embeddings=process, original_filename=file.filename, document_id=document_id)
         print(f"[DEBUG] Ingestion successful. Document ID: {document.id}")
         return document
+    except QuotaExceededError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise HTTPException(status_code=403, detail=str(e))
+    except DocumentNotFoundError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         print(f"[ERROR] Ingestion failed: {e}")
         import traceback
@@ -85,7 +99,7 @@ async def upload_document(
 async def list_documents(
     workspace_id: UUID,
     current_user: User = Depends(deps.get_current_user),
-    service: KnowledgeService = Depends(deps.get_knowledge_service),
+    service: KnowledgeService = Depends(deps.get_read_knowledge_service),
 ):
     """
     List all documents in a workspace.
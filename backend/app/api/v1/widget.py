@@ -12,6 +12,11 @@ Flow (similar to Google Analytics):
 ⑤ Sends initialization event + chat messages to these endpoints
 """
 
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import asdict
 from typing import Optional
 from uuid import UUID, uuid4
 from datetime import datetime
@@ -23,13 +28,32 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.api import deps
+from app.core.config import settings
+from app.core.metrics import CHAT_REQUESTS, CHAT_SECONDS, RAG_STAGE_SECONDS, bounded_label, record_cache
+from app.core.resilience import CircuitOpenError, OverloadedError
+from app.core.single_flight import SingleFlight
+from app.core.tracing import current_trace_id, tracer
 from app.db.models.agent import Agent
 from app.db.models.conversation import Conversation
 from app.db.models.message import Message
 from app.db.models.analytics_event import AnalyticsEvent
-from app.rag.graph import RAGGraph
+from app.db.repositories.knowledge_repo import KnowledgeRepository
+from app.db.session import AsyncSessionLocal
+from app.rag.graph import RAGGraph, RAGResult
+from app.rag.tokenizer import count_tokens
+from app.security.rate_limit import (
+    RateLimitExceeded,
+    client_ip as get_client_ip,
+    limit_widget_chat,
+    limit_widget_request,
+    remember_agent_tier,
+    remember_api_key_tier,
+)
+from app.services.llm_service import llm_available
+from app.services.quota_service import QuotaExceededError, QuotaService
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 # ============ SCHEMAS ============
@@ -123,6 +147,14 @@ def is_domain_allowed(hostname: str, allowed_domains: list) -> bool:
     return False
 
 
+def too_many_requests(e: RateLimitExceeded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests. Please try again shortly.",
+        headers={"Retry-After": e.retry_after_header},
+    )
+
+
 # ============ ENDPOINTS ============
 
 @router.post("/init", response_model=WidgetInitResponse)
@@ -145,6 +177,12 @@ async def widget_init(
         agent_uuid = UUID(request.agent_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid agent_id format")
+
+    # Before any database work, so throttled requests cost nothing
+    try:
+        await limit_widget_request(get_client_ip(req), request.api_key)
+    except RateLimitExceeded as e:
+        raise too_many_requests(e)
     
     stmt = select(Agent).where(Agent.id == agent_uuid)
     result = await db.execute(stmt)
@@ -152,6 +190,8 @@ async def widget_init(
     
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
+    tier = await QuotaService(db).get_tier(agent.workspace_id)
+    remember_agent_tier(agent.id, tier)
         
     hostname = extract_hostname(request.page_url)
     
@@ -173,6 +213,7 @@ async def widget_init(
             is_allowed = False
             auth_error = "API Key does not belong to this agent's workspace."
         else:
+            remember_api_key_tier(request.api_key, tier)
             print(f"DEBUG: API Key Valid. Checking Agent Domains: {agent.allowed_domains}")
             # Enforce Agent-Level Domain Whitelist
             # If agent has allowed_domains set, we MUST match one of them.
@@ -275,7 +316,45 @@ async def widget_init(
     )
 
 
-@router.post("/chat", response_model=WidgetChatResponse)
+_chat_flight = SingleFlight("widget_chat")
+
+
+def _chat_flight_key(agent_id, question: str, document_ids, context_token_budget, knowledge_fingerprint: str) -> str:
+    """Requests with the same key get the same answer: same agent, question, knowledge and budget."""
+    normalized = " ".join(question.lower().split()).rstrip("?!. ")
+    parts = [str(agent_id), normalized, ",".join(sorted(map(str, document_ids or []))),
+             str(context_token_budget), knowledge_fingerprint]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _dump_result(result: RAGResult) -> str:
+    return json.dumps(asdict(result))
+
+
+def _load_result(data) -> RAGResult:
+    return RAGResult(**json.loads(data))
+
+
+def _message_meta(result: Optional[RAGResult], coalesced: bool = False) -> Optional[dict]:
+    """
+    Assistant message meta: token usage, stage timings and retrieved chunks of
+    the RAG run, plus the trace id of the turn (when traced). coalesced marks
+    answers shared with an identical concurrent request.
+    """
+    meta = result.to_meta() if result else {}
+    if coalesced:
+        meta["coalesced"] = True
+    trace_id = current_trace_id()
+    if trace_id:
+        meta["trace_id"] = trace_id
+    return meta or None
+
+
+@router.post(
+    "/chat",
+    response_model=WidgetChatResponse,
+    dependencies=[Depends(deps.statement_timeout(settings.DB_WIDGET_STATEMENT_TIMEOUT_MS))],
+)
 async def widget_chat(
     request: WidgetChatRequest,
     req: Request,
@@ -286,12 +365,23 @@ async def widget_chat(
     
     This is PUBLIC - no auth required.
     Validates session and processes message through RAG pipeline.
+
+    The session's connection is only held for short phases (load + save the
+    user message, vector search, save the answer); each phase commits, which
+    returns the connection to the pool before the next slow step (embedding,
+    LLM call).
     """
     try:
         agent_id = UUID(request.agent_id)
         session_id = UUID(request.session_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    # Before any database work, so throttled requests cost nothing
+    try:
+        await limit_widget_chat(get_client_ip(req), agent_id, session_id)
+    except RateLimitExceeded as e:
+        raise too_many_requests(e)
     
     # Verify session exists
     stmt = select(Conversation).where(Conversation.id == session_id)
@@ -300,6 +390,11 @@ async def widget_chat(
     
     if not conversation:
         raise HTTPException(status_code=400, detail="Invalid session. Please refresh the page.")
+
+    if conversation.status == "ended":
+        # Ended for inactivity by the maintenance worker; the visitor came back
+        conversation.status = "active"
+        conversation.ended_at = None
     
     # Fetch agent
     stmt = select(Agent).where(Agent.id == agent_id)
@@ -308,6 +403,18 @@ async def widget_chat(
     
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
+
+    quota = QuotaService(db)
+    remember_agent_tier(agent.id, await quota.get_tier(agent.workspace_id))
+
+    # Count the message against the workspace's monthly quota (committed on its own)
+    try:
+        await quota.consume_message(agent.workspace_id)
+    except QuotaExceededError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="This assistant has reached its message limit for this month."
+        )
     
     # Save user message
     user_message = Message(
@@ -315,42 +422,75 @@ async def widget_chat(
         workspace_id=agent.workspace_id,
         role="user",
         content=request.message,
-        token_count=len(request.message.split()),  # Simple token count
+        token_count=count_tokens(request.message),
     )
     db.add(user_message)
-    await db.flush()
-    
-    # Process with RAG
-    rag = RAGGraph(db)
     
-    # Extract document IDs from agent configuration
+    # Extract document IDs and context budget from agent configuration
     document_ids = None
-    if agent.configuration and "knowledge_sources" in agent.configuration:
-        document_ids = agent.configuration["knowledge_sources"]
-    
-    import time
-    import random
+    context_token_budget = None
+    if agent.configuration:
+        document_ids = agent.configuration.get("knowledge_sources")
+        context_token_budget = agent.configuration.get("context_token_budget")
+    
+    flight_key = None
+    if settings.SINGLE_FLIGHT_ENABLED:
+        fingerprint = await KnowledgeRepository(db).get_knowledge_fingerprint(agent.workspace_id, document_ids)
+        flight_key = _chat_flight_key(agent.id, request.message, document_ids, context_token_budget, fingerprint)
+    await db.commit()
     
-    start_time = time.time()
-    try:
-        response_text = await rag.process_message(
+    # Process with RAG
+    async def run_rag(session: AsyncSession) -> RAGResult:
+        return await RAGGraph(session, release_connection=True).run(
             question=request.message,
             workspace_id=agent.workspace_id,
             agent_id=str(agent.id),
-            document_ids=document_ids
+            document_ids=document_ids,
+            context_token_budget=context_token_budget
         )
-        status = "success"
+    
+    async def run_shared() -> RAGResult:
+        # Own session: the run outlives this request if it disconnects while others wait on it
+        async with AsyncSessionLocal(info=dict(db.info)) as session:
+            return await run_rag(session)
+    
+    import time
+    
+    workspace_label = bounded_label("workspace", agent.workspace_id)
+    agent_label = bounded_label("agent", agent.id)
+    start_time = time.perf_counter()
+    result = None
+    coalesced = False
+    try:
+        if not llm_available():
+            # Don't spend embedding and vector search on an answer we can't generate
+            raise CircuitOpenError("LLM circuit open")
+        if flight_key:
+            # Identical concurrent questions share one generation
+            result, coalesced = await _chat_flight.do(flight_key, run_shared, dumps=_dump_result, loads=_load_result)
+            record_cache("single_flight", hits=int(coalesced), misses=int(not coalesced))
+        else:
+            result = await run_rag(db)
+        response_text = result.answer
+        outcome = "success"
+    except (CircuitOpenError, OverloadedError, asyncio.TimeoutError) as e:
+        # Counted in CHAT_REQUESTS (outcome "fallback") and LLM_REQUESTS
+        logger.info("LLM unavailable, using fallback: %r", e)
+        response_text = agent.fallback_message or "I'm sorry, I couldn't process your request. Please try again."
+        outcome = "fallback"
     except Exception as e:
         print(f"RAG Error: {e}")
         response_text = agent.fallback_message or "I'm sorry, I couldn't process your request. Please try again."
-        status = "error"
+        outcome = "error"
     
-    end_time = time.time()
+    end_time = time.perf_counter()
     response_time_ms = int((end_time - start_time) * 1000)
+    CHAT_SECONDS.labels(workspace_label, agent_label).observe(end_time - start_time)
+    CHAT_REQUESTS.labels(workspace_label, agent_label, outcome).inc()
     
-    # Simulate confidence score for now (0.85 - 0.99) as LLM doesn't return it yet
-    # In a real scenario, this would come from the RAG pipeline's relevance score
-    confidence_score = round(random.uniform(0.85, 0.99), 2)
+    # Similarity of the best retrieved chunk (None if nothing was retrieved)
+    confidence_score = result.confidence if result else None
+    usage = result.usage if result else {}
     
     # Save assistant message
     assistant_message = Message(
@@ -358,7 +498,8 @@ async def widget_chat(
         workspace_id=agent.workspace_id,
         role="assistant",
         content=response_text,
-        token_count=len(response_text.split()),
+        meta=_message_meta(result, coalesced),
+        token_count=usage.get("completion_tokens", count_tokens(response_text)),
         response_time_ms=response_time_ms,
         confidence_score=confidence_score
     )
@@ -375,12 +516,13 @@ async def widget_chat(
             "response_length": len(response_text),
             "response_time_ms": response_time_ms,
             "confidence_score": confidence_score,
-            "status": status
+            "status": outcome
         }
     )
     db.add(event)
     
-    await db.commit()
+    with RAG_STAGE_SECONDS.labels("db_persist", workspace_label).time(), tracer.start_as_current_span("db.persist"):
+        await db.commit()
     
     return WidgetChatResponse(
         response=response_text,
@@ -391,6 +533,7 @@ async def widget_chat(
 @router.post("/event")
 async def widget_track_event(
     request: WidgetEventRequest,
+    req: Request,
     db: AsyncSession = Depends(deps.get_db),
 ):
     """
@@ -407,6 +550,11 @@ async def widget_track_event(
         session_id = UUID(request.session_id) if request.session_id else None
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    try:
+        await limit_widget_request(get_client_ip(req))
+    except RateLimitExceeded as e:
+        raise too_many_requests(e)
     
     # Fetch agent to get workspace_id
     stmt = select(Agent).where(Agent.id == agent_id)
@@ -433,6 +581,7 @@ async def widget_track_event(
 @router.get("/config/{agent_id}")
 async def widget_get_config(
     agent_id: str,
+    req: Request,
     db: AsyncSession = Depends(deps.get_db),
 ):
     """
@@ -443,6 +592,11 @@ async def widget_get_config(
         agent_uuid = UUID(agent_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid agent_id format")
+
+    try:
+        await limit_widget_request(get_client_ip(req))
+    except RateLimitExceeded as e:
+        raise too_many_requests(e)
     
     stmt = select(Agent).where(Agent.id == agent_uuid)
     result = await db.execute(stmt)
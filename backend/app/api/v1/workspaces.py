@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
 from uuid import UUID
 
-from app.api.deps import get_workspace_service, get_current_user
+from app.api.deps import get_workspace_service, get_read_workspace_service, get_current_user, require_workspace_access
 from app.services.workspace_service import WorkspaceService
 from app.api.schemas.workspace import (
     WorkspaceCreate,
@@ -49,7 +49,7 @@ async def create_workspace(
 @router.get("", response_model=WorkspaceListResponse)
 async def list_workspaces(
     current_user: User = Depends(get_current_user),
-    workspace_service: WorkspaceService = Depends(get_workspace_service)
+    workspace_service: WorkspaceService = Depends(get_read_workspace_service)
 ):
     """
     Get all workspaces where the user is owner or member.
@@ -80,11 +80,15 @@ async def list_workspaces(
         )
 
 
-@router.get("/{workspace_id}", response_model=WorkspaceWithStats)
+@router.get(
+    "/{workspace_id}",
+    response_model=WorkspaceWithStats,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def get_workspace(
     workspace_id: UUID,
     current_user: User = Depends(get_current_user),
-    workspace_service: WorkspaceService = Depends(get_workspace_service)
+    workspace_service: WorkspaceService = Depends(get_read_workspace_service)
 ):
     """
     Get workspace details by ID.
@@ -113,7 +117,11 @@ async def get_workspace(
         )
 
 
-@router.patch("/{workspace_id}", response_model=WorkspaceResponse)
+@router.patch(
+    "/{workspace_id}",
+    response_model=WorkspaceResponse,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def update_workspace(
     workspace_id: UUID,
     request: WorkspaceUpdate,
@@ -146,7 +154,11 @@ async def update_workspace(
         )
 
 
-@router.delete("/{workspace_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{workspace_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def delete_workspace(
     workspace_id: UUID,
     current_user: User = Depends(get_current_user),
@@ -172,7 +184,12 @@ async def delete_workspace(
 
 # Member Management Endpoints
 
-@router.post("/{workspace_id}/members", response_model=WorkspaceMemberResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/{workspace_id}/members",
+    response_model=WorkspaceMemberResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def add_member(
     workspace_id: UUID,
     request: WorkspaceMemberAdd,
@@ -203,25 +220,41 @@ async def add_member(
         )
 
 
-@router.get("/{workspace_id}/members", response_model=WorkspaceMemberListResponse)
+@router.get(
+    "/{workspace_id}/members",
+    response_model=WorkspaceMemberListResponse,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def list_members(
     workspace_id: UUID,
+    sort: str = Query("joined_at", pattern="^(joined_at|name|email)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     current_user: User = Depends(get_current_user),
-    workspace_service: WorkspaceService = Depends(get_workspace_service)
+    workspace_service: WorkspaceService = Depends(get_read_workspace_service)
 ):
     """
-    Get all members of the workspace.
+    Get members of the workspace, a page at a time (owner first on the first page).
     """
     try:
-        members_data = await workspace_service.get_members(workspace_id, current_user.id)
+        page = await workspace_service.get_members(
+            workspace_id, current_user.id, sort=sort, order=order, limit=limit, cursor=cursor
+        )
         
         members = []
-        for data in members_data:
+        for data in page["members"]:
             members.append(WorkspaceMemberResponse(**data))
         
         return WorkspaceMemberListResponse(
             members=members,
-            total=len(members)
+            total=page["total"],
+            next_cursor=page["next_cursor"]
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except PermissionError as e:
         raise HTTPException(
@@ -230,7 +263,11 @@ async def list_members(
         )
 
 
-@router.delete("/{workspace_id}/members/{member_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{workspace_id}/members/{member_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def remove_member(
     workspace_id: UUID,
     member_id: UUID,
@@ -250,7 +287,12 @@ async def remove_member(
         )
 
 
-@router.post("/{workspace_id}/invitations", response_model=InvitationResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/{workspace_id}/invitations",
+    response_model=InvitationResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_workspace_access)],
+)
 async def create_invitation(
     workspace_id: UUID,
     request: InvitationCreate,
@@ -281,11 +323,15 @@ async def create_invitation(
         )
 
 
-@router.get("/{workspace_id}/invitations", response_model=List[InvitationResponse])
+@router.get(
+    "/{workspace_id}/invitations",
+    response_model=List[InvitationResponse],
+    dependencies=[Depends(require_workspace_access)],
+)
 async def list_invitations(
     workspace_id: UUID,
     current_user: User = Depends(get_current_user),
-    workspace_service: WorkspaceService = Depends(get_workspace_service)
+    workspace_service: WorkspaceService = Depends(get_read_workspace_service)
 ):
     """
     Get all pending invitations for a workspace.
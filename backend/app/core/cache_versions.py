@@ -0,0 +1,41 @@
+"""
+Cross-worker invalidation for in-process caches of authorization data.
+
+Each cached entity has a version counter in Redis. A worker stores a value
+together with the version it read before loading it, and uses the entry only
+while Redis still holds that version; invalidating bumps the counter, so every
+worker drops its copy on its next lookup. Without Redis (or while it is
+unreachable) a worker can't hear about other workers' writes, so
+current_version() returns None and callers don't cache across requests.
+"""
+from typing import Optional
+
+from app.core.redis import get_redis
+
+# Far longer than any cache TTL, so a counter never expires under a live entry
+_VERSION_TTL_SECONDS = 86400
+
+
+async def current_version(key: str) -> Optional[int]:
+    """The entity's version, or None when cached copies can't be validated."""
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        value = await redis.get(f"cache_version:{key}")
+    except Exception as e:
+        print(f"[DEBUG] Cache versions unavailable, not caching: {e}")
+        return None
+    return int(value or 0)
+
+
+async def bump_version(key: str) -> None:
+    """Invalidate every worker's cached copy of the entity."""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            await pipe.incr(f"cache_version:{key}").expire(f"cache_version:{key}", _VERSION_TTL_SECONDS).execute()
+    except Exception as e:
+        print(f"[DEBUG] Could not bump cache version for {key}: {e}")
@@ -4,11 +4,32 @@ from typing import Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DATABASE_READ_URL: Optional[str] = None  # Read replica for dashboards/listings; defaults to the primary
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0  # Read from the primary this long after a client's last write
+
+    # Database engine / pool
+    DB_ECHO: bool = False  # Log every SQL statement (development only)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # Max wait for a pooled connection
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100  # Per connection; ignored in PgBouncer mode
+    DB_PGBOUNCER: bool = False  # Behind PgBouncer in transaction pooling mode
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables
+    DB_WIDGET_STATEMENT_TIMEOUT_MS: int = 5000
+    DB_ANALYTICS_STATEMENT_TIMEOUT_MS: int = 60000
     
     # JWT Settings
     JWT_SECRET_KEY: str = "insydr-secret-key-change-in-production-2026"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
+
+    # Password hashing (bcrypt runs on a worker pool, off the event loop)
+    BCRYPT_ROUNDS: int = 12  # Stored hashes with a lower cost are rehashed on login
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 5.0  # Then the request fails with 503
+    LOGIN_MAX_CONCURRENT_PER_IP: int = 4
     
     # OTP Settings
     OTP_EXPIRY_MINUTES: int = 10
@@ -24,6 +45,31 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
+    MAIL_TIMEOUT_SECONDS: float = 30.0
+
+    # Email outbox (app.workers.email_outbox)
+    EMAIL_SENDER_ENABLED: bool = True  # Run the background sender in this process
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5.0  # Idle poll interval; local enqueues wake the sender at once
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS: float = 30.0  # Doubles per attempt
+    EMAIL_OUTBOX_RETRY_MAX_SECONDS: float = 3600.0
+    EMAIL_OUTBOX_LEASE_SECONDS: float = 120.0  # A claimed batch is retried if its sender dies
+    EMAIL_OUTBOX_RETENTION_DAYS: int = 7  # Sent and failed rows are purged after this
+
+    # Maintenance (app.workers.cleanup)
+    MAINTENANCE_ENABLED: bool = True  # Run the scheduler in this process
+    MAINTENANCE_INTERVAL_SECONDS: float = 300.0
+    MAINTENANCE_BATCH_SIZE: int = 500  # Rows per statement/transaction, to keep locks short
+    MAINTENANCE_MAX_BATCHES: int = 200  # Per task per run; the rest waits for the next run
+    MAINTENANCE_BATCH_PAUSE_SECONDS: float = 0.05
+    CONVERSATION_IDLE_TIMEOUT_MINUTES: int = 30  # Active conversations with no messages for this long are ended
+    OTP_RETENTION_HOURS: int = 24  # Expired OTPs are deleted after this
+    INVITATION_RETENTION_DAYS: int = 30  # Expired invitations are deleted after this
+
+    # Tier quotas (app.services.quota_service)
+    QUOTAS_ENABLED: bool = True  # Usage is counted either way
+    QUOTA_RECONCILE_INTERVAL_SECONDS: float = 3600.0  # Recount usage counters from the source tables
     
     # CORS - Include widget dev server and allow any origin for widget endpoints
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:5173,http://127.0.0.1:5173,http://localhost:8000,null"
@@ -35,12 +81,77 @@ class Settings(BaseSettings):
     # AI Providers
     HF_TOKEN: Optional[str] = None
     GOOGLE_API_KEY: Optional[str] = None
+
+    # LLM limits (see app.core.resilience)
+    LLM_TIMEOUT_SECONDS: float = 20.0
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 2.0  # Max wait for a concurrency slot before falling back
+    LLM_CONCURRENCY: int = 16  # Initial global limit; adapts between min and max
+    LLM_MIN_CONCURRENCY: int = 8  # Floor kept through outages, so recovery doesn't start from a trickle
+    LLM_MAX_CONCURRENCY: int = 64
+    LLM_WORKSPACE_MIN_CONCURRENCY: int = 2
+    LLM_WORKSPACE_MAX_CONCURRENCY: int = 8  # So one busy workspace can't take every slot
+    LLM_TARGET_LATENCY_SECONDS: float = 8.0  # Slower calls shrink the limit
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures before the circuit opens
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+    LLM_BREAKER_HALF_OPEN_CALLS: int = 1
+
+    # RAG
+    EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    RAG_CONTEXT_TOKEN_BUDGET: int = 2000  # Default per-agent context budget (tokens)
+    RAG_MIN_TRUNCATED_TOKENS: int = 32  # Don't add a truncated chunk smaller than this
+    CHUNK_MAX_TOKENS: int = 120  # MiniLM sees 128 tokens, including special tokens
+    CHUNK_OVERLAP_TOKENS: int = 20
+    TOKENIZER_RETRY_SECONDS: float = 300.0  # After a failed tokenizer load (approximate counts meanwhile)
     
     # Cloudinary
     CLOUDINARY_CLOUD_NAME: Optional[str] = None
     CLOUDINARY_API_KEY: Optional[str] = None
     CLOUDINARY_API_SECRET: Optional[str] = None
 
+    # Outbound HTTP / download cache
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_TIMEOUT_SECONDS: float = 60.0
+    DOWNLOAD_CACHE_DIR: Optional[str] = None  # Defaults to <tmp>/insydr-download-cache
+    DOWNLOAD_CACHE_MAX_MB: int = 512  # Shared by the workers using DOWNLOAD_CACHE_DIR
+    DOWNLOAD_CONCURRENCY: int = 4
+
+    # Metrics
+    METRICS_MAX_LABEL_VALUES: int = 100  # Distinct agent/workspace label values before "other"
+    METRICS_TOKEN: Optional[str] = None  # Bearer token for /metrics and /health/db; unset hides both (404)
+
+    # Tracing (OpenTelemetry)
+    TRACING_EXPORTER: Optional[str] = None  # "otlp", "console" or "memory"; unset disables tracing
+    TRACING_OTLP_ENDPOINT: Optional[str] = None  # e.g. http://localhost:4318/v1/traces
+    TRACING_SAMPLE_RATIO: float = 0.1
+    TRACING_SERVICE_NAME: str = "insydr-backend"
+
+    # In-process caches (seconds; 0 disables)
+    WORKSPACE_STATS_CACHE_SECONDS: float = 10.0
+    ROLE_CACHE_SECONDS: float = 30.0  # Workspace roles; only with REDIS_URL, which invalidates them across workers
+    USER_CACHE_SECONDS: float = 60.0  # Token users; only with REDIS_URL, which invalidates them across workers
+    TIER_CACHE_SECONDS: float = 60.0  # Workspace subscription tiers, for quota checks
+
+    # Redis (optional; shared state across workers)
+    REDIS_URL: Optional[str] = None  # e.g. redis://localhost:6379/0
+
+    # Widget rate limits (app.security.rate_limit): requests per minute and burst;
+    # agent and API key limits depend on the tier
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_CHAT_IP_PER_MINUTE: float = 20.0
+    RATE_LIMIT_CHAT_IP_BURST: int = 10
+    RATE_LIMIT_CHAT_SESSION_PER_MINUTE: float = 10.0
+    RATE_LIMIT_CHAT_SESSION_BURST: int = 5
+    RATE_LIMIT_WIDGET_IP_PER_MINUTE: float = 120.0  # init, event and config calls
+    RATE_LIMIT_WIDGET_IP_BURST: int = 60
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100000  # In-process buckets kept when Redis is unavailable
+    TRUSTED_PROXY_HOPS: int = 0  # Reverse proxies in front of the app; client IPs come from X-Forwarded-For when > 0
+
+    # Single-flight coalescing of identical concurrent chat questions
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_LOCK_TTL_SECONDS: float = 30.0  # Cross-worker lock; should exceed LLM_TIMEOUT_SECONDS
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS: float = 5.0  # How long workers waiting on a run have to pick up its answer
+    SINGLE_FLIGHT_POLL_SECONDS: float = 0.05
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,30 @@
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared, pooled HTTP client for outbound calls (created on first use)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (on app shutdown)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,221 @@
+"""
+Prometheus metrics for the chat and ingestion hot paths, served at /metrics.
+
+Agent and workspace labels go through bounded_label() so a busy instance
+can't create an unbounded number of series: after METRICS_MAX_LABEL_VALUES
+distinct values per label, new values are reported as "other".
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR (an empty
+directory, before the app starts) so /metrics aggregates every worker's
+samples instead of reporting whichever worker served the scrape. The process
+manager should call prometheus_client.multiprocess.mark_process_dead(pid)
+when a worker exits (e.g. Gunicorn's child_exit hook).
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.core.config import settings
+
+# Stage latencies range from a few ms (vector search) to tens of seconds (LLM)
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_INGEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+RAG_STAGE_SECONDS = Histogram(
+    "insydr_rag_stage_seconds",
+    "Time spent in each stage of a chat turn "
+    "(embed_query, vector_search, context_build, llm_generate, db_persist)",
+    ["stage", "workspace"],
+    buckets=_LATENCY_BUCKETS,
+)
+CHAT_SECONDS = Histogram(
+    "insydr_chat_seconds",
+    "End-to-end RAG time for a widget chat turn",
+    ["workspace", "agent"],
+    buckets=_LATENCY_BUCKETS,
+)
+CHAT_REQUESTS = Counter(
+    "insydr_chat_requests_total",
+    "Widget chat turns by outcome",
+    ["workspace", "agent", "status"],
+)
+
+INGEST_STAGE_SECONDS = Histogram(
+    "insydr_ingest_stage_seconds",
+    "Time spent in each document ingestion stage (download, upload, chunk, embed, save)",
+    ["stage"],
+    buckets=_INGEST_BUCKETS,
+)
+INGEST_IN_PROGRESS = Gauge(
+    "insydr_ingest_in_progress",
+    "Documents currently being ingested",
+    multiprocess_mode="livesum",
+)
+DOWNLOAD_QUEUE_DEPTH = Gauge(
+    "insydr_download_queue_depth",
+    "Prefetch downloads waiting for a download slot",
+    multiprocess_mode="livesum",
+)
+
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "insydr_llm_queue_wait_seconds",
+    "Time LLM calls waited for a concurrency slot",
+    ["scope"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "insydr_llm_requests_total",
+    "LLM calls by outcome (success, error, timeout, overloaded, circuit_open)",
+    ["outcome"],
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "insydr_llm_concurrency_limit",
+    "Current adaptive global LLM concurrency limit (summed over workers)",
+    multiprocess_mode="livesum",
+)
+LLM_IN_FLIGHT = Gauge(
+    "insydr_llm_in_flight",
+    "LLM calls currently in flight",
+    multiprocess_mode="livesum",
+)
+LLM_CIRCUIT_STATE = Gauge(
+    "insydr_llm_circuit_state",
+    "LLM circuit breaker state (0 closed, 1 half-open, 2 open; the worst worker)",
+    multiprocess_mode="livemax",
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "insydr_password_hash_seconds",
+    "bcrypt work per call on the hashing pool, by operation (hash, verify)",
+    ["op"],
+    buckets=_LATENCY_BUCKETS,
+)
+PASSWORD_HASH_QUEUE_WAIT_SECONDS = Histogram(
+    "insydr_password_hash_queue_wait_seconds",
+    "Time password hashing calls waited for a pool worker",
+    buckets=_LATENCY_BUCKETS,
+)
+PASSWORD_HASH_QUEUED = Gauge(
+    "insydr_password_hash_queued",
+    "Password hashing calls waiting for a pool worker",
+    multiprocess_mode="livesum",
+)
+
+EMAIL_DELIVERIES = Counter(
+    "insydr_email_deliveries_total",
+    "Outbox delivery attempts by outcome (sent, retry, failed)",
+    ["outcome"],
+)
+EMAIL_SMTP_CONNECTIONS = Counter(
+    "insydr_email_smtp_connections_total",
+    "SMTP connections opened by the outbox sender",
+)
+
+MAINTENANCE_ROWS = Counter(
+    "insydr_maintenance_rows_total",
+    "Rows deleted or updated by maintenance tasks",
+    ["task"],
+)
+MAINTENANCE_RUN_SECONDS = Histogram(
+    "insydr_maintenance_run_seconds",
+    "Duration of one maintenance task run",
+    ["task"],
+    buckets=_INGEST_BUCKETS,
+)
+
+RATE_LIMITED = Counter(
+    "insydr_rate_limited_total",
+    "Widget requests rejected by the rate limiter, by the bucket that ran out (ip, session, agent, api_key)",
+    ["kind"],
+)
+
+CACHE_REQUESTS = Counter(
+    "insydr_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss); hit ratio = hit / (hit + miss)",
+    ["cache", "result"],
+)
+
+_label_values: Dict[str, Set[str]] = {}
+
+
+def bounded_label(kind: str, value) -> str:
+    """Label value for a high-cardinality dimension (agent, workspace)."""
+    if value is None:
+        return "none"
+    value = str(value)
+    seen = _label_values.setdefault(kind, set())
+    if value in seen:
+        return value
+    if len(seen) < settings.METRICS_MAX_LABEL_VALUES:
+        seen.add(value)
+        return value
+    return "other"
+
+
+@contextmanager
+def observe_stage(stage: str, workspace: str, timings: Optional[Dict[str, float]] = None):
+    """Time a chat stage into RAG_STAGE_SECONDS and, if given, timings[stage] (ms)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        RAG_STAGE_SECONDS.labels(stage, workspace).observe(elapsed)
+        if timings is not None:
+            timings[stage] = round(elapsed * 1000, 2)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, "miss").inc(misses)
+
+
+def metrics_registry(*process_collectors) -> CollectorRegistry:
+    """
+    Registry to serve: every worker's samples in multiprocess mode, else this
+    process's. process_collectors (already in the default registry) report
+    the serving worker's own state in multiprocess mode.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in process_collectors:
+        registry.register(collector)
+    return registry
+
+
+class PoolCollector:
+    """Exports database pool usage (see app.db.session.pool_status) at scrape time."""
+
+    def __init__(self, engines: dict):
+        self.engines = {name: engine for name, engine in engines.items() if engine is not None}
+
+    def collect(self):
+        from app.db.session import pool_status
+
+        in_use = GaugeMetricFamily("insydr_db_pool_checked_out", "Connections in use", labels=["pool"])
+        idle = GaugeMetricFamily("insydr_db_pool_checked_in", "Idle pooled connections", labels=["pool"])
+        overflow = GaugeMetricFamily("insydr_db_pool_overflow", "Connections open beyond pool_size", labels=["pool"])
+        checkouts = CounterMetricFamily("insydr_db_pool_checkouts", "Connection checkouts", labels=["pool"])
+        wait = CounterMetricFamily("insydr_db_pool_checkout_wait_seconds", "Total time spent waiting for a connection", labels=["pool"])
+        timeouts = CounterMetricFamily("insydr_db_pool_checkout_timeouts", "Checkouts that timed out", labels=["pool"])
+
+        for name, engine in self.engines.items():
+            status = pool_status(engine)
+            in_use.add_metric([name], status["checked_out"])
+            idle.add_metric([name], status["checked_in"])
+            overflow.add_metric([name], status["overflow"])
+            stats = getattr(engine.sync_engine.pool, "stats", None)
+            if stats:
+                checkouts.add_metric([name], stats.checkouts)
+                wait.add_metric([name], stats.wait_seconds_total)
+                timeouts.add_metric([name], stats.timeouts)
+
+        yield from (in_use, idle, overflow, checkouts, wait, timeouts)
@@ -0,0 +1,148 @@
+"""
+Concurrency limiting and circuit breaking for slow or failing upstreams (Gemini).
+
+AdaptiveLimiter caps in-flight calls and adjusts the cap AIMD-style: it shrinks
+multiplicatively on timeouts or calls slower than the latency target, and on
+fast successes grows back to the last limit that was known to be good by one
+slot per call (doubling per window), then by roughly one slot per window.
+Callers beyond the cap queue for up to a timeout and then fail with
+OverloadedError.
+
+CircuitBreaker opens after consecutive failures and rejects calls with
+CircuitOpenError until reset_timeout has passed; it then lets a limited number
+of probe calls through (half-open) and closes again if they succeed.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+class OverloadedError(Exception):
+    """No concurrency slot became free within the queue timeout."""
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int, min_limit: int, max_limit: int, target_latency: float, backoff: float = 0.7):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.backoff = backoff
+        # Below this the limit doubles per window of fast calls; lowered only
+        # when calls slow down again while regrowing towards it
+        self.good_limit = float(self.max_limit)
+        self._regrowing = False
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _capacity(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self, timeout: float) -> float:
+        """Wait for a slot; returns the time spent queued."""
+        if self.in_flight < self._capacity() and not self._waiters:
+            self.in_flight += 1
+            return 0.0
+
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as we gave up; hand it on
+                self._release_slot()
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                raise OverloadedError(f"no slot within {timeout}s ({self.in_flight} in flight, limit {self._capacity()})") from None
+            raise
+        return time.perf_counter() - start
+
+    def release(self, latency: Optional[float] = None, timed_out: bool = False):
+        """Give a slot back and adapt the limit to how the call went."""
+        if timed_out or (latency is not None and latency > self.target_latency):
+            if self._regrowing:
+                self.good_limit = max(self.min_limit, self.limit * self.backoff)
+                self._regrowing = False
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif latency is not None:
+            if self.limit < self.good_limit:
+                self.limit = min(self.good_limit, self.limit + 1)
+                self._regrowing = True
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.good_limit = self.limit
+                self._regrowing = False
+        self._release_slot()
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self._capacity():
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted right now (without reserving a probe)."""
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at >= self.reset_timeout
+        if self.state == self.HALF_OPEN:
+            return self._probes < self.half_open_max_calls
+        return True
+
+    def before_call(self):
+        """Reserve the call; raises CircuitOpenError if it must not be attempted."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("circuit open")
+            self.state = self.HALF_OPEN
+            self._probes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                raise CircuitOpenError("circuit half-open, probe in progress")
+            self._probes += 1
+
+    def record_success(self):
+        self.failures = 0
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self._probes = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probes = 0
+
+    def record_abandoned(self):
+        """The call was cancelled before it finished; free its probe slot."""
+        if self.state == self.HALF_OPEN and self._probes:
+            self._probes -= 1
@@ -0,0 +1,129 @@
+"""
+Single-flight: concurrent calls with the same key share one execution.
+
+In-process, callers await the same task. It is shielded, so a caller that goes
+away (client disconnect) doesn't cancel the work for the others.
+
+With REDIS_URL set and a serializer given, the call is also coalesced across
+workers: the worker that takes the key's lock runs it, and workers that find
+the lock held register as waiters on that run (identified by the holder's lock
+token) and poll for its result. The holder publishes the result, under its
+token and for SINGLE_FLIGHT_RESULT_TTL_SECONDS, only if someone is waiting, so
+a call made after a run has finished always runs again: this coalesces
+concurrent calls, it doesn't cache results. If the lock holder finishes
+without a result (it failed), the next worker takes the lock and runs the call
+itself. Redis errors fall back to running locally.
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+# Delete the lock only if we still hold it
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Publish the result only if a waiter registered for this run
+_PUBLISH_RESULT = """
+if tonumber(redis.call("get", KEYS[1]) or "0") > 0 then
+    redis.call("set", KEYS[2], ARGV[1], "PX", ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class SingleFlight:
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        dumps: Optional[Callable[[Any], str]] = None,
+        loads: Optional[Callable[[str], Any]] = None,
+    ) -> Tuple[Any, bool]:
+        """Run fn() once for all concurrent callers of key. Returns (result, shared)."""
+        task = self._inflight.get(key)
+        if task is not None:
+            result, _ = await asyncio.shield(task)
+            return result, True
+
+        task = asyncio.create_task(self._run(key, fn, dumps, loads))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller went away
+
+    async def _run(self, key, fn, dumps, loads) -> Tuple[Any, bool]:
+        redis = get_redis()
+        if redis is None or dumps is None or loads is None:
+            return await fn(), False
+
+        prefix = f"singleflight:{self.namespace}:{key}"
+        lock_key = f"{prefix}:lock"
+        token = uuid.uuid4().hex
+        lock_ms = int(settings.SINGLE_FLIGHT_LOCK_TTL_SECONDS * 1000)
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_LOCK_TTL_SECONDS
+
+        while True:
+            try:
+                locked = await redis.set(lock_key, token, nx=True, px=lock_ms)
+                holder = None if locked else await redis.get(lock_key)
+                if holder is not None:
+                    holder = holder.decode() if isinstance(holder, bytes) else holder
+                    waiters_key = f"{prefix}:{holder}:waiters"
+                    async with redis.pipeline(transaction=True) as pipe:
+                        await pipe.incr(waiters_key).pexpire(waiters_key, lock_ms).execute()
+            except Exception as e:
+                print(f"[DEBUG] Single-flight Redis error, running locally: {e}")
+                return await fn(), False
+
+            if locked:
+                try:
+                    result = await fn()
+                    try:
+                        await redis.eval(
+                            _PUBLISH_RESULT, 2, f"{prefix}:{token}:waiters", f"{prefix}:{token}:result",
+                            dumps(result), int(settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS * 1000),
+                        )
+                    except Exception as e:
+                        print(f"[DEBUG] Single-flight could not publish result: {e}")
+                    return result, False
+                finally:
+                    try:
+                        await redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+                    except Exception:
+                        pass  # Expires with the lock TTL
+
+            if holder is not None:
+                # Wait for this run only; once its lock is gone without a result, try to take over
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_SECONDS)
+                    try:
+                        published, current = await redis.mget(f"{prefix}:{holder}:result", lock_key)
+                    except Exception as e:
+                        print(f"[DEBUG] Single-flight Redis error, running locally: {e}")
+                        return await fn(), False
+                    if published is not None:
+                        return loads(published), True
+                    current = current.decode() if isinstance(current, bytes) else current
+                    if current != holder:
+                        break
+
+            if time.monotonic() >= deadline:
+                return await fn(), False
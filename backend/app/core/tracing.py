@@ -0,0 +1,84 @@
+"""
+OpenTelemetry tracing.
+
+Disabled unless TRACING_EXPORTER is set ("otlp", "console" or "memory" for
+tests). When disabled, the module-level tracer is the API's no-op tracer, so
+the spans in the RAG graph and services cost almost nothing; when enabled,
+traces are sampled at TRACING_SAMPLE_RATIO (respecting the caller's sampling
+decision) and unsampled spans are non-recording.
+"""
+from typing import Optional
+
+from opentelemetry import trace
+
+from app.core.config import settings
+
+tracer = trace.get_tracer("insydr")
+
+_memory_exporter = None
+
+
+def setup_tracing(app, engines=()) -> None:
+    """Install the tracer provider and instrument FastAPI, SQLAlchemy and httpx."""
+    global _memory_exporter
+
+    exporter_name = (settings.TRACING_EXPORTER or "").lower()
+    if not exporter_name:
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)))
+    elif exporter_name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    elif exporter_name == "memory":
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        _memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(_memory_exporter))
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER}")
+
+    trace.set_tracer_provider(provider)
+
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="health,metrics")
+    HTTPXClientInstrumentor().instrument()
+    for engine in engines:
+        if engine is not None:
+            SQLAlchemyInstrumentor().instrument(engine=engine.sync_engine, tracer_provider=provider)
+
+    print(f"[DEBUG] Tracing enabled ({exporter_name}, sample ratio {settings.TRACING_SAMPLE_RATIO})")
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans (on app shutdown)."""
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+def get_memory_exporter():
+    """The in-memory exporter when TRACING_EXPORTER=memory (for tests), else None."""
+    return _memory_exporter
+
+
+def current_trace_id() -> Optional[str]:
+    """Hex id of the current trace, if it is being recorded."""
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid or not span_context.trace_flags.sampled:
+        return None
+    return format(span_context.trace_id, "032x")
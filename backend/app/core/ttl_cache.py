@@ -0,0 +1,53 @@
+"""
+Small in-process cache with per-entry expiry, for data that may be a few
+seconds stale (dashboard stats, roles). Each worker has its own copy.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.core.metrics import record_cache
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float, maxsize: int = 10000):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING and entry[0] > time.monotonic():
+            record_cache(self.name, hits=1)
+            return entry[1]
+        if entry is not _MISSING:
+            del self._data[key]
+        record_cache(self.name, misses=1)
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if not self.enabled:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [k for k in self._data if predicate(k)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
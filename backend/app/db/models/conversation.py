@@ -1,4 +1,4 @@
-from sqlalchemy import DateTime, JSON, String
+from sqlalchemy import DateTime, JSON, String, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -8,6 +8,10 @@ from app.db.base import Base, UUIDBase
 
 class Conversation(UUIDBase, Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Idle-conversation sweep (app.workers.cleanup) only looks at active ones
+        Index("ix_conversations_active_started", "started_at", postgresql_where=text("status = 'active'")),
+    )
 
     agent_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
     workspace_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
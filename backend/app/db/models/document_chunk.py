@@ -1,4 +1,4 @@
-from sqlalchemy import DateTime, Integer, JSON, Text
+from sqlalchemy import DateTime, Integer, JSON, Text, String, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -8,13 +8,17 @@ from app.db.base import Base, UUIDBase
 
 class DocumentChunk(UUIDBase, Base):
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index("ix_document_chunks_workspace_content_hash", "workspace_id", "content_hash"),
+    )
 
-    document_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
+    document_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), index=True)
     workspace_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
 
     content: Mapped[str] = mapped_column(Text)
     chunk_index: Mapped[int]
     token_count: Mapped[int]
+    content_hash: Mapped[str | None] = mapped_column(String(64))  # sha256 of normalized content
     meta: Mapped[dict | None] = mapped_column(JSON)
 
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
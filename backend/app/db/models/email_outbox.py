@@ -0,0 +1,26 @@
+from sqlalchemy import String, Integer, Text, JSON, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.base import Base, UUIDBase
+
+
+class EmailOutbox(UUIDBase, Base):
+    """An email waiting to be (or already) delivered by app.workers.email_outbox."""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The sender's claim query: due PENDING rows, oldest first
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    to_email: Mapped[str] = mapped_column(String)
+    subject: Mapped[str] = mapped_column(String)
+    template_name: Mapped[str] = mapped_column(String)
+    template_body: Mapped[dict] = mapped_column(JSON, default=dict)
+
+    status: Mapped[str] = mapped_column(String, default="PENDING")  # PENDING, SENT, FAILED
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    last_error: Mapped[str | None] = mapped_column(Text)
+
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    sent_at: Mapped[datetime | None]
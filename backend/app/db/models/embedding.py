@@ -10,7 +10,7 @@ from app.db.base import Base, UUIDBase
 class Embedding(UUIDBase, Base):
     __tablename__ = "embeddings"
 
-    chunk_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
+    chunk_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), index=True)
     workspace_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
 
     embedding: Mapped[list[float]] = mapped_column(Vector(384))
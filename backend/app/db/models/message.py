@@ -1,4 +1,4 @@
-from sqlalchemy import DateTime, JSON, Float, Integer, Text, String
+from sqlalchemy import DateTime, JSON, Float, Integer, Text, String, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -8,6 +8,12 @@ from app.db.base import Base, UUIDBase
 
 class Message(UUIDBase, Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # A conversation's messages in order, and its last activity
+        Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+        # Monthly message counts per workspace (quota reconciliation)
+        Index("ix_messages_workspace_created", "workspace_id", "created_at"),
+    )
 
     conversation_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
     workspace_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
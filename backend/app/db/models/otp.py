@@ -12,6 +12,6 @@ class OTP(UUIDBase, Base):
     purpose: Mapped[str]  # 'email_verification', 'password_reset'
     
     is_used: Mapped[bool] = mapped_column(Boolean, default=False)
-    expires_at: Mapped[datetime]
+    expires_at: Mapped[datetime] = mapped_column(index=True)
     
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import String, DateTime, JSON
+from sqlalchemy import String, DateTime, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
@@ -8,6 +8,10 @@ from app.db.base import Base, UUIDBase
 
 class Workspace(UUIDBase, Base):
     __tablename__ = "workspaces"
+    __table_args__ = (
+        # Prefix LIKE lookups (slug LIKE 'base-%') when picking a free slug
+        Index("ix_workspaces_slug_pattern", "slug", postgresql_ops={"slug": "text_pattern_ops"}),
+    )
 
     owner_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
 
@@ -1,4 +1,4 @@
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -8,6 +8,10 @@ from app.db.base import Base, UUIDBase
 
 class WorkspaceInvitation(UUIDBase, Base):
     __tablename__ = "workspace_invitations"
+    __table_args__ = (
+        # Expiry and purge sweeps (app.workers.cleanup)
+        Index("ix_workspace_invitations_status_expires", "status", "expires_at"),
+    )
 
     workspace_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
     inviter_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
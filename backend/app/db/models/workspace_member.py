@@ -1,4 +1,4 @@
-from sqlalchemy import String, DateTime, JSON
+from sqlalchemy import String, DateTime, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -8,9 +8,13 @@ from app.db.base import Base, UUIDBase
 
 class WorkspaceMember(UUIDBase, Base):
     __tablename__ = "workspace_members"
+    __table_args__ = (
+        # Keyset pagination of member lists (ORDER BY joined_at, id)
+        Index("ix_workspace_members_workspace_joined", "workspace_id", "joined_at", "id"),
+    )
 
     workspace_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
-    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True))
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), index=True)
 
     role: Mapped[str]
     permissions: Mapped[dict | None] = mapped_column(JSON)
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from datetime import datetime
+from app.db.base import Base
+
+
+class WorkspaceUsage(Base):
+    """
+    Per-workspace usage counter (members, agents, documents, messages), kept
+    up to date incrementally and reconciled against the source tables by
+    app.workers.cleanup. period is "" for totals, "YYYY-MM" for monthly counts.
+    """
+    __tablename__ = "workspace_usage"
+
+    workspace_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    metric: Mapped[str] = mapped_column(String, primary_key=True)
+    period: Mapped[str] = mapped_column(String, primary_key=True, default="")
+
+    value: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
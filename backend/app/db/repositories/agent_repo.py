@@ -5,12 +5,14 @@ from typing import List, Optional
 
 from app.db.models.agent import Agent
 from app.db.models.agent_knowledge_collection import AgentKnowledgeCollection
+from app.db.repositories.usage_repository import UsageCounterRepository
 
 class AgentRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create(self, agent: Agent) -> Agent:
+        """Commits the agent together with the caller's QuotaService.reserve()."""
         self.session.add(agent)
         await self.session.commit()
         await self.session.refresh(agent)
@@ -34,6 +36,7 @@ class AgentRepository:
 
     async def delete(self, agent: Agent):
         await self.session.delete(agent)
+        await UsageCounterRepository(self.session).increment(agent.workspace_id, "agents", -1, commit=False)
         await self.session.commit()
 
     async def add_knowledge_collection(self, link: AgentKnowledgeCollection):
@@ -6,6 +6,7 @@ from datetime import datetime
 
 from app.db.models.user import User
 from app.db.models.otp import OTP
+from app.security.user_cache import invalidate_user
 
 
 class UserRepository:
@@ -24,9 +25,12 @@ class UserRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def create(self, user: User) -> User:
-        """Create a new user."""
+    async def create(self, user: User, commit: bool = True) -> User:
+        """Create a new user (commit=False: flushed only, the caller commits)."""
         self.session.add(user)
+        if not commit:
+            await self.session.flush()
+            return user
         await self.session.commit()
         await self.session.refresh(user)
         return user
@@ -34,9 +38,16 @@ class UserRepository:
     async def update(self, user: User) -> User:
         """Update an existing user."""
         await self.session.commit()
+        await invalidate_user(user.id)
         await self.session.refresh(user)
         return user
 
+    async def delete(self, user: User) -> None:
+        """Delete a user."""
+        await self.session.delete(user)
+        await self.session.commit()
+        await invalidate_user(user.id)
+
     async def email_exists(self, email: str) -> bool:
         """Check if email already exists."""
         stmt = select(User.id).where(User.email == email)
@@ -48,9 +59,12 @@ class OTPRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create(self, otp: OTP) -> OTP:
-        """Create a new OTP."""
+    async def create(self, otp: OTP, commit: bool = True) -> OTP:
+        """Create a new OTP (commit=False: flushed only, the caller commits)."""
         self.session.add(otp)
+        if not commit:
+            await self.session.flush()
+            return otp
         await self.session.commit()
         await self.session.refresh(otp)
         return otp
@@ -67,7 +81,7 @@ class OTPRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def invalidate_previous_otps(self, email: str, purpose: str) -> None:
+    async def invalidate_previous_otps(self, email: str, purpose: str, commit: bool = True) -> None:
         """Mark all previous OTPs for this email and purpose as used."""
         stmt = select(OTP).where(
             OTP.email == email,
@@ -78,7 +92,8 @@ class OTPRepository:
         otps = result.scalars().all()
         for otp in otps:
             otp.is_used = True
-        await self.session.commit()
+        if commit:
+            await self.session.commit()
 
     async def mark_as_used(self, otp: OTP) -> None:
         """Mark an OTP as used."""
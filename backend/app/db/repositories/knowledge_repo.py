@@ -1,18 +1,23 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from uuid import UUID
-from typing import List, Optional
+from sqlalchemy import select, delete, func
+from uuid import UUID, uuid4
+from typing import List, Optional, Dict
+
+from app.core.config import settings
 
 from app.db.models.document import Document
 from app.db.models.document_chunk import DocumentChunk
+from app.db.models.document_version import DocumentVersion
 from app.db.models.embedding import Embedding
 from app.db.models.knowledge import KnowledgeCollection
+from app.db.repositories.usage_repository import UsageCounterRepository
 
 class KnowledgeRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create_document(self, document: Document) -> Document:
+        """Commits the document together with the caller's QuotaService.reserve()."""
         self.session.add(document)
         await self.session.commit()
         await self.session.refresh(document)
@@ -30,37 +35,88 @@ class KnowledgeRepository:
         await self.session.refresh(embedding)
         return embedding
 
-    async def save_document_tree(self, document: Document, chunks_data: List[dict]):
+    async def get_document(self, document_id: UUID) -> Optional[Document]:
+        stmt = select(Document).where(Document.id == document_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_embeddings_by_hashes(self, workspace_id: UUID, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up existing embeddings for chunk content hashes within a workspace,
+        for the current embedding model. Returns content_hash -> vector.
+        """
+        hashes = list(set(h for h in content_hashes if h))
+        if not hashes:
+            return {}
+
+        stmt = select(DocumentChunk.content_hash, Embedding.embedding)\
+            .join(Embedding, DocumentChunk.id == Embedding.chunk_id)\
+            .where(
+                DocumentChunk.workspace_id == workspace_id,
+                DocumentChunk.content_hash.in_(hashes),
+                Embedding.model_name == settings.EMBEDDING_MODEL
+            )
+        result = await self.session.execute(stmt)
+
+        found = {}
+        for content_hash, vector in result.all():
+            if content_hash not in found:
+                found[content_hash] = vector.tolist() if hasattr(vector, 'tolist') else list(vector)
+        return found
+
+    async def save_document_tree(self, document: Document, chunks_data: List[dict], version_content: Optional[str] = None, version_meta: Optional[dict] = None):
         """
         Saves the document, chunks, and embeddings hierarchically.
-        chunks_data is a list of dicts with keys: 'content', 'embedding', 'chunk_index', 'token_count'
+        chunks_data is a list of dicts with keys: 'content', 'embedding', 'chunk_index', 'token_count', 'content_hash'
+        and optionally 'meta' (defaults to the document meta).
+
+        Any existing chunk set for the document is replaced in the same transaction,
+        and the document's version_number is bumped, so readers see either the old
+        or the new version, never a mix.
         """
         # Save Document
         self.session.add(document)
         await self.session.flush() # flush to get document.id
-        
+
+        # Drop the previous chunk set
+        old_chunk_ids = select(DocumentChunk.id).where(DocumentChunk.document_id == document.id)
+        await self.session.execute(
+            delete(Embedding).where(Embedding.chunk_id.in_(old_chunk_ids)).execution_options(synchronize_session=False)
+        )
+        deleted = await self.session.execute(
+            delete(DocumentChunk).where(DocumentChunk.document_id == document.id).execution_options(synchronize_session=False)
+        )
+        if deleted.rowcount:
+            document.version_number = (document.version_number or 1) + 1
+
         for chunk_data in chunks_data:
-            # Create Chunk
-            chunk = DocumentChunk(
+            # Assign ids up front so chunks and embeddings go out in one flush
+            chunk_id = uuid4()
+            self.session.add(DocumentChunk(
+                id=chunk_id,
                 document_id=document.id,
                 workspace_id=document.workspace_id,
                 content=chunk_data['content'],
                 chunk_index=chunk_data['chunk_index'],
                 token_count=chunk_data['token_count'],
-                meta=document.meta
-            )
-            self.session.add(chunk)
-            await self.session.flush() # flush to get chunk.id
-            
-            # Create Embedding
-            embedding_record = Embedding(
-                chunk_id=chunk.id,
+                content_hash=chunk_data.get('content_hash'),
+                meta=chunk_data.get('meta', document.meta)
+            ))
+            self.session.add(Embedding(
+                chunk_id=chunk_id,
                 workspace_id=document.workspace_id,
                 embedding=chunk_data['embedding'],
-                model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+                model_name=settings.EMBEDDING_MODEL,
                 dimension=384
-            )
-            self.session.add(embedding_record)
+            ))
+
+        if version_content is not None:
+            self.session.add(DocumentVersion(
+                document_id=document.id,
+                version=document.version_number,
+                content=version_content,
+                meta=version_meta
+            ))
             
         await self.session.commit()
         await self.session.refresh(document)
@@ -77,6 +133,25 @@ class KnowledgeRepository:
         await self.session.refresh(collection)
         return collection
 
+    async def get_knowledge_fingerprint(self, workspace_id: UUID, document_ids: Optional[List[str]] = None) -> str:
+        """
+        Cheap fingerprint of the documents a search would see; changes when a
+        document is added, removed, re-ingested or finishes processing.
+        """
+        stmt = select(
+            func.count(Document.id),
+            func.count(Document.id).filter(Document.status == "processed"),
+            func.coalesce(func.sum(Document.version_number), 0),
+            func.max(Document.updated_at),
+        ).where(Document.workspace_id == workspace_id)
+        if document_ids:
+            try:
+                stmt = stmt.where(Document.id.in_([UUID(did) if isinstance(did, str) else did for did in document_ids]))
+            except ValueError:
+                pass
+        total, processed, versions, updated_at = (await self.session.execute(stmt)).one()
+        return f"{total}:{processed}:{versions}:{updated_at.isoformat() if updated_at else ''}"
+
     async def search_similar_chunks(
         self, 
         workspace_id: UUID, 
@@ -88,8 +163,10 @@ class KnowledgeRepository:
         Search for similar chunks using cosine distance.
         Note: pgvector w/ cosine distance: <=> operator.
         Order by distance ascending -> most similar first.
+        Returns rows of (DocumentChunk, distance).
         """
-        stmt = select(DocumentChunk).join(Embedding, DocumentChunk.id == Embedding.chunk_id)\
+        distance = Embedding.embedding.cosine_distance(embedding_vector).label("distance")
+        stmt = select(DocumentChunk, distance).join(Embedding, DocumentChunk.id == Embedding.chunk_id)\
             .where(
                 Embedding.workspace_id == workspace_id
             )
@@ -106,11 +183,11 @@ class KnowledgeRepository:
                 # Or just log error.
                 pass
 
-        stmt = stmt.order_by(Embedding.embedding.cosine_distance(embedding_vector))\
+        stmt = stmt.order_by(distance)\
             .limit(limit)
 
         result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return result.all()
 
     async def get_documents_by_workspace(self, workspace_id: UUID) -> List[Document]:
         stmt = select(Document).where(Document.workspace_id == workspace_id).order_by(Document.created_at.desc())
@@ -124,6 +201,7 @@ class KnowledgeRepository:
         
         if document:
              await self.session.delete(document)
+             await UsageCounterRepository(self.session).increment(document.workspace_id, "documents", -1, commit=False)
              await self.session.commit()
              return document
         return None
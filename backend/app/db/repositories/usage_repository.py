@@ -0,0 +1,109 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.agent import Agent
+from app.db.models.document import Document
+from app.db.models.message import Message
+from app.db.models.workspace import Workspace
+from app.db.models.workspace_member import WorkspaceMember
+from app.db.models.workspace_usage import WorkspaceUsage
+
+# Metrics counted per calendar month (UTC); the rest are running totals
+MONTHLY_METRICS = ("messages",)
+
+
+def usage_period(metric: str, at: Optional[datetime] = None) -> str:
+    if metric in MONTHLY_METRICS:
+        return (at or datetime.utcnow()).strftime("%Y-%m")
+    return ""
+
+
+class UsageCounterRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, workspace_id: UUID, metric: str) -> int:
+        """Current value of a counter (primary key lookup)."""
+        result = await self.session.execute(
+            select(WorkspaceUsage.value).where(
+                WorkspaceUsage.workspace_id == workspace_id,
+                WorkspaceUsage.metric == metric,
+                WorkspaceUsage.period == usage_period(metric),
+            )
+        )
+        return result.scalar_one_or_none() or 0
+
+    async def increment(self, workspace_id: UUID, metric: str, delta: int = 1, commit: bool = True):
+        """Add delta to a counter, creating it if needed."""
+        stmt = insert(WorkspaceUsage).values(
+            workspace_id=workspace_id, metric=metric, period=usage_period(metric),
+            value=max(delta, 0), updated_at=datetime.utcnow(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WorkspaceUsage.workspace_id, WorkspaceUsage.metric, WorkspaceUsage.period],
+            set_={"value": func.greatest(WorkspaceUsage.value + delta, 0), "updated_at": stmt.excluded.updated_at},
+        )
+        await self.session.execute(stmt)
+        if commit:
+            await self.session.commit()
+
+    async def increment_if_below(self, workspace_id: UUID, metric: str, limit: int) -> bool:
+        """
+        Atomically add one to a counter unless it has reached limit. Returns
+        False (and changes nothing) at the limit. Joins the caller's transaction.
+        """
+        stmt = insert(WorkspaceUsage).values(
+            workspace_id=workspace_id, metric=metric, period=usage_period(metric),
+            value=1, updated_at=datetime.utcnow(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WorkspaceUsage.workspace_id, WorkspaceUsage.metric, WorkspaceUsage.period],
+            set_={"value": WorkspaceUsage.value + 1, "updated_at": stmt.excluded.updated_at},
+            where=WorkspaceUsage.value < limit,
+        ).returning(WorkspaceUsage.value)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none() is not None
+
+    async def reconcile(self, metric: str) -> int:
+        """
+        Overwrite one metric's counters for every workspace with a fresh count
+        from the source table. Returns the number of counters written.
+        """
+        now = datetime.utcnow()
+        if metric == "members":
+            source = select(WorkspaceMember.workspace_id, func.count().label("n")).group_by(WorkspaceMember.workspace_id)
+        elif metric == "agents":
+            source = select(Agent.workspace_id, func.count().label("n")).group_by(Agent.workspace_id)
+        elif metric == "documents":
+            source = select(Document.workspace_id, func.count().label("n")).group_by(Document.workspace_id)
+        elif metric == "messages":
+            month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            source = (
+                select(Message.workspace_id, func.count().label("n"))
+                .where(Message.role == "user", Message.created_at >= month_start)
+                .group_by(Message.workspace_id)
+            )
+        else:
+            raise ValueError(f"Unknown usage metric: {metric}")
+        counts = source.subquery()
+
+        # Every workspace gets a row, so counters of emptied workspaces drop to 0
+        rows = select(
+            Workspace.id, literal(metric), literal(usage_period(metric, now)),
+            func.coalesce(counts.c.n, 0), literal(now),
+        ).outerjoin(counts, counts.c.workspace_id == Workspace.id)
+        stmt = insert(WorkspaceUsage).from_select(
+            ["workspace_id", "metric", "period", "value", "updated_at"], rows
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WorkspaceUsage.workspace_id, WorkspaceUsage.metric, WorkspaceUsage.period],
+            set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+        )
+        result = await self.session.execute(stmt)
+        await self.session.commit()
+        return result.rowcount
@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import func, select
 from app.db.models.workspace_invitation import WorkspaceInvitation
 from typing import Optional
 from uuid import UUID
@@ -8,8 +9,11 @@ class WorkspaceInvitationRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def create(self, invitation: WorkspaceInvitation) -> WorkspaceInvitation:
+    async def create(self, invitation: WorkspaceInvitation, commit: bool = True) -> WorkspaceInvitation:
         self.db.add(invitation)
+        if not commit:
+            await self.db.flush()
+            return invitation
         await self.db.commit()
         await self.db.refresh(invitation)
         return invitation
@@ -27,6 +31,16 @@ class WorkspaceInvitationRepository:
         )
         return result.scalars().all()
 
+    async def count_pending(self, workspace_id: UUID) -> int:
+        result = await self.db.execute(
+            select(func.count()).select_from(WorkspaceInvitation).where(
+                WorkspaceInvitation.workspace_id == workspace_id,
+                WorkspaceInvitation.status == "PENDING",
+                WorkspaceInvitation.expires_at > datetime.utcnow()
+            )
+        )
+        return result.scalar_one()
+
     async def get_by_email_and_workspace(self, email: str, workspace_id: UUID) -> Optional[WorkspaceInvitation]:
         result = await self.db.execute(
             select(WorkspaceInvitation).where(
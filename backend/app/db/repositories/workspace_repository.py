@@ -1,12 +1,19 @@
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from uuid import UUID
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import BigInteger, delete, select, func, and_, or_, case, cast, inspect, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.workspace import Workspace
 from app.db.models.workspace_member import WorkspaceMember
 from app.db.models.user import User
+from app.db.models.workspace_usage import WorkspaceUsage
+from app.db.repositories.usage_repository import UsageCounterRepository
+from app.security.permissions import invalidate_workspace_access, resolve_access
 import re
 
+# Slug picks to try when concurrent creates keep taking the same one
+SLUG_ATTEMPTS = 5
+
 
 class WorkspaceRepository:
     def __init__(self, db: AsyncSession):
@@ -20,31 +27,53 @@ class WorkspaceRepository:
         slug = slug.strip('-')
         return slug[:50]  # Limit slug length
 
-    async def _ensure_unique_slug(self, base_slug: str, workspace_id: Optional[UUID] = None) -> str:
-        """Ensure slug is unique by appending numbers if needed."""
-        slug = base_slug
-        counter = 1
-
-        while True:
-            query = select(Workspace).where(Workspace.slug == slug)
-            if workspace_id:
-                query = query.where(Workspace.id != workspace_id)
-            
-            result = await self.db.execute(query)
-            existing = result.scalar_one_or_none()
-            
-            if not existing:
-                return slug
-            
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-
-    async def create(self, workspace: Workspace) -> Workspace:
-        """Create a new workspace with unique slug."""
+    async def _next_free_slug(self, base_slug: str, workspace_id: Optional[UUID] = None) -> str:
+        """
+        base_slug if it's free, else base_slug-N with N one past the highest
+        suffix in use, found in a single query.
+        """
+        suffix = func.substring(Workspace.slug, len(base_slug) + 2)
+        query = select(
+            func.count().filter(Workspace.slug == base_slug),
+            func.max(case(
+                (Workspace.slug.op("~")(f"^{re.escape(base_slug)}-[0-9]{{1,9}}$"), cast(suffix, BigInteger))
+            )),
+        ).where(or_(Workspace.slug == base_slug, Workspace.slug.like(f"{base_slug}-%")))
+        if workspace_id:
+            query = query.where(Workspace.id != workspace_id)
+
+        taken, max_suffix = (await self.db.execute(query)).one()
+        if not taken:
+            return base_slug
+        return f"{base_slug}-{(max_suffix or 0) + 1}"
+
+    async def _save_with_unique_slug(self, workspace: Workspace, workspace_id: Optional[UUID] = None):
+        """
+        Pick a free slug and flush inside a savepoint; if a concurrent write took
+        the slug first, pick again.
+        """
         base_slug = self._generate_slug(workspace.name)
-        workspace.slug = await self._ensure_unique_slug(base_slug)
-        
-        self.db.add(workspace)
+        if workspace_id:
+            # Flush the other changes outside the savepoint, so a rollback only undoes the slug
+            await self.db.flush()
+        for attempt in range(SLUG_ATTEMPTS):
+            slug = await self._next_free_slug(base_slug, workspace_id)
+            try:
+                async with self.db.begin_nested():
+                    workspace.slug = slug
+                    self.db.add(workspace)
+                return
+            except IntegrityError as e:
+                if "ix_workspaces_slug" not in str(e.orig) or attempt == SLUG_ATTEMPTS - 1:
+                    raise
+                if workspace_id:
+                    await self.db.refresh(workspace)  # Expired by the savepoint rollback
+
+    async def create(self, workspace: Workspace, commit: bool = True) -> Workspace:
+        """Create a new workspace with unique slug (commit=False: flushed only, the caller commits)."""
+        await self._save_with_unique_slug(workspace)
+        if not commit:
+            return workspace
         await self.db.commit()
         await self.db.refresh(workspace)
         return workspace
@@ -88,12 +117,15 @@ class WorkspaceRepository:
         return list(result.scalars().all())
 
     async def update(self, workspace: Workspace) -> Workspace:
-        """Update workspace."""
-        if workspace.name:
+        """Update workspace; the slug follows the name only when the name changed."""
+        if workspace.name and inspect(workspace).attrs.name.history.has_changes():
+            # Renames that keep the same base (case, punctuation) keep the slug
             base_slug = self._generate_slug(workspace.name)
-            workspace.slug = await self._ensure_unique_slug(base_slug, workspace.id)
+            if not re.fullmatch(rf"{re.escape(base_slug)}(-[0-9]+)?", workspace.slug or ""):
+                await self._save_with_unique_slug(workspace, workspace.id)
         
         await self.db.commit()
+        await invalidate_workspace_access(workspace.id, self.db)  # In case ownership changed
         await self.db.refresh(workspace)
         return workspace
 
@@ -102,89 +134,117 @@ class WorkspaceRepository:
         workspace = await self.get_by_id(workspace_id)
         if workspace:
             await self.db.delete(workspace)
+            await self.db.execute(delete(WorkspaceUsage).where(WorkspaceUsage.workspace_id == workspace_id))
             await self.db.commit()
+            await invalidate_workspace_access(workspace_id, self.db)
             return True
         return False
 
-    async def get_workspace_stats(self, workspace_id: UUID) -> dict:
-        """Get workspace statistics."""
+    async def get_user_workspaces_with_roles(self, user_id: UUID) -> List[Tuple[Workspace, Optional[str]]]:
+        """Get all workspaces where user is owner or member, with the user's role, in one query."""
+        membership = (
+            select(WorkspaceMember.workspace_id, WorkspaceMember.role)
+            .where(WorkspaceMember.user_id == user_id)
+            .subquery()
+        )
+        role = case((Workspace.owner_id == user_id, "OWNER"), else_=membership.c.role)
+        query = (
+            select(Workspace, role)
+            .outerjoin(membership, membership.c.workspace_id == Workspace.id)
+            .where(or_(Workspace.owner_id == user_id, membership.c.workspace_id.is_not(None)))
+            .order_by(Workspace.created_at.desc())
+        )
+        result = await self.db.execute(query)
+        # A member row for the owner would repeat the workspace
+        seen = set()
+        rows = []
+        for workspace, workspace_role in result.all():
+            if workspace.id not in seen:
+                seen.add(workspace.id)
+                rows.append((workspace, workspace_role))
+        return rows
+
+    async def get_workspaces_stats(self, workspace_ids: List[UUID]) -> Dict[UUID, dict]:
+        """Get statistics for several workspaces in one query (grouped counts per table)."""
         from app.db.models.agent import Agent
         from app.db.models.document import Document
         from app.db.models.conversation import Conversation
         from app.db.models.message import Message
 
-        # Count agents
-        agents_result = await self.db.execute(
-            select(func.count(Agent.id)).where(Agent.workspace_id == workspace_id)
-        )
-        agent_count = agents_result.scalar() or 0
-
-        # Count documents
-        docs_result = await self.db.execute(
-            select(func.count(Document.id)).where(Document.workspace_id == workspace_id)
-        )
-        document_count = docs_result.scalar() or 0
+        if not workspace_ids:
+            return {}
 
-        # Count conversations
-        convs_result = await self.db.execute(
-            select(func.count(Conversation.id)).where(Conversation.workspace_id == workspace_id)
-        )
-        conversation_count = convs_result.scalar() or 0
+        def counts(model):
+            return (
+                select(model.workspace_id, func.count(model.id).label("n"))
+                .where(model.workspace_id.in_(workspace_ids))
+                .group_by(model.workspace_id)
+                .subquery()
+            )
 
-        # Count messages
-        msgs_result = await self.db.execute(
-            select(func.count(Message.id)).where(Message.workspace_id == workspace_id)
+        agents, documents, conversations, messages = (counts(m) for m in (Agent, Document, Conversation, Message))
+        query = (
+            select(
+                Workspace.id,
+                func.coalesce(agents.c.n, 0),
+                func.coalesce(documents.c.n, 0),
+                func.coalesce(conversations.c.n, 0),
+                func.coalesce(messages.c.n, 0),
+            )
+            .outerjoin(agents, agents.c.workspace_id == Workspace.id)
+            .outerjoin(documents, documents.c.workspace_id == Workspace.id)
+            .outerjoin(conversations, conversations.c.workspace_id == Workspace.id)
+            .outerjoin(messages, messages.c.workspace_id == Workspace.id)
+            .where(Workspace.id.in_(workspace_ids))
         )
-        message_count = msgs_result.scalar() or 0
-
+        result = await self.db.execute(query)
         return {
-            "total_agents": agent_count,
-            "total_documents": document_count,
-            "total_conversations": conversation_count,
-            "total_messages": message_count
+            workspace_id: {
+                "total_agents": agent_count,
+                "total_documents": document_count,
+                "total_conversations": conversation_count,
+                "total_messages": message_count
+            }
+            for workspace_id, agent_count, document_count, conversation_count, message_count in result.all()
         }
 
-    async def user_has_access(self, workspace_id: UUID, user_id: UUID) -> bool:
-        """Check if user has access to workspace."""
-        workspace = await self.get_by_id(workspace_id)
-        if not workspace:
-            return False
-        
-        # Owner has access
-        if workspace.owner_id == user_id:
-            return True
-        
-        # Check membership
+    async def get_workspace_stats(self, workspace_id: UUID) -> dict:
+        """Get workspace statistics."""
+        stats = await self.get_workspaces_stats([workspace_id])
+        return stats.get(workspace_id) or {
+            "total_agents": 0,
+            "total_documents": 0,
+            "total_conversations": 0,
+            "total_messages": 0
+        }
+
+    async def get_with_owner(self, workspace_id: UUID) -> Optional[Tuple[Workspace, Optional[User]]]:
+        """Get workspace and its owner's user row in one query."""
         result = await self.db.execute(
-            select(WorkspaceMember).where(
-                and_(
-                    WorkspaceMember.workspace_id == workspace_id,
-                    WorkspaceMember.user_id == user_id
-                )
-            )
+            select(Workspace, User)
+            .outerjoin(User, User.id == Workspace.owner_id)
+            .where(Workspace.id == workspace_id)
         )
-        member = result.scalar_one_or_none()
-        return member is not None
+        row = result.first()
+        return tuple(row) if row else None
+
+    async def user_has_access(self, workspace_id: UUID, user_id: UUID) -> bool:
+        """Check if user has access to workspace."""
+        access = await resolve_access(self.db, workspace_id, user_id)
+        return access.has_access
 
     async def get_user_role(self, workspace_id: UUID, user_id: UUID) -> Optional[str]:
         """Get user's role in workspace."""
-        workspace = await self.get_by_id(workspace_id)
-        if not workspace:
-            return None
-        
-        if workspace.owner_id == user_id:
-            return "OWNER"
-        
-        result = await self.db.execute(
-            select(WorkspaceMember).where(
-                and_(
-                    WorkspaceMember.workspace_id == workspace_id,
-                    WorkspaceMember.user_id == user_id
-                )
-            )
-        )
-        member = result.scalar_one_or_none()
-        return member.role if member else None
+        access = await resolve_access(self.db, workspace_id, user_id)
+        return access.role
+
+
+# Member list sort orders; NULLs (deleted users) sort as empty strings
+MEMBER_SORT_KEYS = {
+    "joined_at": WorkspaceMember.joined_at,
+    "name": func.coalesce(User.full_name, ""),
+    "email": func.coalesce(User.email, ""),
+}
 
 
 class WorkspaceMemberRepository:
@@ -192,9 +252,10 @@ class WorkspaceMemberRepository:
         self.db = db
 
     async def add_member(self, member: WorkspaceMember) -> WorkspaceMember:
-        """Add member to workspace."""
+        """Add member to workspace (committed together with the caller's QuotaService.reserve())."""
         self.db.add(member)
         await self.db.commit()
+        await invalidate_workspace_access(member.workspace_id, self.db)
         await self.db.refresh(member)
         return member
 
@@ -207,6 +268,42 @@ class WorkspaceMemberRepository:
         )
         return list(result.scalars().all())
 
+    async def get_members_page(
+        self,
+        workspace_id: UUID,
+        sort: str = "joined_at",
+        descending: bool = True,
+        limit: int = 100,
+        after: Optional[Tuple[object, UUID]] = None
+    ) -> List[Tuple[WorkspaceMember, Optional[str], Optional[str]]]:
+        """
+        Get one page of members with their user's email and name (joined, one query).
+        Keyset pagination: after is the (sort value, member id) of the last row of
+        the previous page.
+        """
+        sort_key = MEMBER_SORT_KEYS[sort]
+        query = (
+            select(WorkspaceMember, User.email, User.full_name)
+            .outerjoin(User, User.id == WorkspaceMember.user_id)
+            .where(WorkspaceMember.workspace_id == workspace_id)
+        )
+        if after is not None:
+            position = tuple_(sort_key, WorkspaceMember.id)
+            query = query.where(position < tuple_(*after) if descending else position > tuple_(*after))
+        if descending:
+            query = query.order_by(sort_key.desc(), WorkspaceMember.id.desc())
+        else:
+            query = query.order_by(sort_key.asc(), WorkspaceMember.id.asc())
+        result = await self.db.execute(query.limit(limit))
+        return list(result.all())
+
+    async def count_members(self, workspace_id: UUID) -> int:
+        """Count members of a workspace (not including the owner)."""
+        result = await self.db.execute(
+            select(func.count(WorkspaceMember.id)).where(WorkspaceMember.workspace_id == workspace_id)
+        )
+        return result.scalar() or 0
+
     async def get_member(self, workspace_id: UUID, user_id: UUID) -> Optional[WorkspaceMember]:
         """Get specific member."""
         result = await self.db.execute(
@@ -228,7 +325,9 @@ class WorkspaceMemberRepository:
         
         if member:
             await self.db.delete(member)
+            await UsageCounterRepository(self.db).increment(member.workspace_id, "members", -1, commit=False)
             await self.db.commit()
+            await invalidate_workspace_access(member.workspace_id, self.db)
             return True
         return False
 
@@ -242,6 +341,7 @@ class WorkspaceMemberRepository:
         if member:
             member.role = role
             await self.db.commit()
+            await invalidate_workspace_access(member.workspace_id, self.db)
             await self.db.refresh(member)
         
         return member
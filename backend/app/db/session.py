@@ -1,12 +1,186 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from uuid import uuid4
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True,
-)
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    timeouts: int = 0
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        waited = time.perf_counter() - start
+        self.stats.checkouts += 1
+        self.stats.wait_seconds_total += waited
+        self.stats.wait_seconds_max = max(self.stats.wait_seconds_max, waited)
+        return connection
+
+
+def _connect_args() -> dict:
+    if settings.DB_PGBOUNCER:
+        # Transaction pooling hands each transaction a different server
+        # connection, so named prepared statements can't be cached or reused,
+        # and PgBouncer rejects unknown startup parameters (statement_timeout
+        # is set per transaction instead, see _apply_statement_timeout).
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    server_settings = {"application_name": settings.APP_NAME}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    return {
+        "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        "server_settings": server_settings,
+    }
+
+
+def build_engine(url: str, **overrides) -> AsyncEngine:
+    """Create an async engine configured from Settings (keyword arguments override)."""
+    options = dict(
+        echo=settings.DB_ECHO,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=_connect_args(),
+    )
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+def pool_status(engine: AsyncEngine) -> dict:
+    """Current pool usage and checkout wait statistics for an engine."""
+    pool = engine.sync_engine.pool
+    status = {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+    stats = getattr(pool, "stats", None)
+    if stats:
+        status.update({
+            "checkouts": stats.checkouts,
+            "checkout_wait_avg_ms": round(stats.wait_seconds_total / stats.checkouts * 1000, 3) if stats.checkouts else 0.0,
+            "checkout_wait_max_ms": round(stats.wait_seconds_max * 1000, 3),
+            "checkout_timeouts": stats.timeouts,
+        })
+    return status
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    """
+    Apply a per-request statement timeout (session.info["statement_timeout_ms"])
+    to every transaction the session begins. Without PgBouncer the default
+    timeout is a connection setting, so nothing extra is sent.
+    """
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms is None:
+        if not settings.DB_PGBOUNCER:
+            return
+        timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout_ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+engine = build_engine(settings.DATABASE_URL)
+read_engine = build_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else None
+
+# write scope (e.g. a hash of the client's bearer token) -> time of its last committed write
+_last_write: Dict[str, float] = {}
+
+
+def _recent_write(scope: Optional[str]) -> bool:
+    if not scope:
+        return False
+    written_at = _last_write.get(scope)
+    if written_at is None:
+        return False
+    if time.monotonic() - written_at > settings.DB_READ_YOUR_WRITES_SECONDS:
+        del _last_write[scope]
+        return False
+    return True
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_flush_write(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_write(session):
+    if session.info.pop("has_writes", False) and session.info.get("write_scope"):
+        now = time.monotonic()
+        _last_write[session.info["write_scope"]] = now
+        if len(_last_write) > 10000:
+            # Forget clients whose window has passed
+            for scope, written_at in list(_last_write.items()):
+                if now - written_at > settings.DB_READ_YOUR_WRITES_SECONDS:
+                    del _last_write[scope]
+
+
+class ReadSession(Session):
+    """
+    Session that reads from the replica unless the same client (write_scope)
+    committed a write within DB_READ_YOUR_WRITES_SECONDS, in which case the
+    replica may still be behind and the primary is used. Flushes and
+    INSERT/UPDATE/DELETE statements always go to the primary, and so do
+    statements with the use_primary execution option (reads that must not be
+    stale, e.g. authorization).
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            read_engine is None
+            or self._flushing
+            or (clause is not None and (clause.is_dml or clause.get_execution_options().get("use_primary")))
+            or _recent_write(self.info.get("write_scope"))
+        ):
+            return engine.sync_engine
+        return read_engine.sync_engine
+
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
     expire_on_commit=False,
 )
+
+AsyncReadSessionLocal = async_sessionmaker(
+    sync_session_class=ReadSession,
+    expire_on_commit=False,
+)
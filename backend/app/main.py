@@ -1,6 +1,18 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.http import close_http_client
+from app.api.deps import require_metrics_token
+from app.core.metrics import PoolCollector, metrics_registry
+from app.core.redis import close_redis
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.rag.tokenizer import load_tokenizer_async
+from app.workers.cleanup import start_maintenance, stop_maintenance
+from app.workers.email_outbox import start_email_sender, stop_email_sender
+from app.db.session import engine, read_engine, pool_status
 from app.api.v1.auth import router as auth_router
 from app.api.v1.workspaces import router as workspace_router
 from app.api.v1.api_keys import router as api_key_router
@@ -10,10 +22,27 @@ from app.api.v1.widget import router as widget_router
 from app.api.v1.analytics import router as analytics_router
 from app.api.v1.invitations import router as invitations_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Off the event loop: the first load may download the tokenizer
+    await load_tokenizer_async()
+    start_email_sender()
+    start_maintenance()
+    yield
+    # Shutdown: flush the email batch in progress, release pooled outbound connections
+    await stop_maintenance()
+    await stop_email_sender()
+    await close_http_client()
+    await close_redis()
+    shutdown_tracing()
+
+
 app = FastAPI(
     title="Insydr.AI Backend",
     description="AI-powered chatbot platform API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - Allow all origins for widget embeds to work on customer sites
@@ -43,6 +72,26 @@ async def health():
     return {"status": "ok", "app": settings.APP_NAME}
 
 
+@app.get("/health/db", dependencies=[Depends(require_metrics_token)])
+async def health_db():
+    """Database connection pool usage and checkout wait times (this worker's pools)."""
+    status = {"status": "ok", "pool": pool_status(engine)}
+    if read_engine is not None:
+        status["read_pool"] = pool_status(read_engine)
+    return status
+
+
+pool_collector = PoolCollector({"primary": engine, "replica": read_engine})
+REGISTRY.register(pool_collector)
+setup_tracing(app, engines=(engine, read_engine))
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    """Prometheus metrics (scrape with METRICS_TOKEN as a bearer token)."""
+    return Response(generate_latest(metrics_registry(pool_collector)), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
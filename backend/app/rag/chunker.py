@@ -1,9 +1,225 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list[str]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    return splitter.split_text(text)
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
+
+from app.core.config import settings
+from app.rag.tokenizer import count_tokens_batch, token_spans
+
+# Sentence boundary: end punctuation followed by whitespace
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+# "1.", "2.3", "IV." style section numbers
+_NUMBERED_HEADING_RE = re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.)\s+\S")
+_MAX_HEADING_WORDS = 12
+_MAX_HEADING_CHARS = 100
+
+
+@dataclass
+class _Unit:
+    """A piece of source text that is never split further."""
+    text: str
+    tokens: int
+    start: int  # Offsets into the full document text
+    end: int
+    page: int
+    new_block: bool  # Starts a paragraph/heading (vs. continuing one)
+
+
+def _is_heading(line: str) -> bool:
+    """Heuristic for heading lines in extracted PDF text."""
+    # Cheapest checks first: most lines are ordinary wrapped text
+    if len(line) > _MAX_HEADING_CHARS or line[-1] in ".,;:!?" or line.count(" ") >= _MAX_HEADING_WORDS:
+        return False
+    # isupper()/istitle() imply a letter; a section number alone needs one checked
+    if line.isupper() or line.istitle():
+        return True
+    return bool(_NUMBERED_HEADING_RE.match(line)) and any(c.isalpha() for c in line)
+
+
+def _iter_blocks(page_text: str) -> Iterator[Tuple[str, int, int]]:
+    """
+    Yield (kind, start, end) for headings and paragraphs of a page.
+    Paragraphs end at blank lines and headings; offsets are relative to page_text.
+    """
+    para_start = None
+    para_end = None
+    pos = 0
+
+    for line in page_text.splitlines(keepends=True):
+        line_start = pos
+        pos += len(line)
+        stripped = line.strip()
+
+        if not stripped or _is_heading(stripped):
+            if para_start is not None:
+                yield "paragraph", para_start, para_end
+                para_start = None
+            if stripped:
+                lead = len(line) - len(line.lstrip())
+                yield "heading", line_start + lead, line_start + lead + len(stripped)
+            continue
+
+        if para_start is None:
+            para_start = line_start + len(line) - len(line.lstrip())
+        para_end = line_start + len(line.rstrip())
+
+    if para_start is not None:
+        yield "paragraph", para_start, para_end
+
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) of each sentence in a paragraph."""
+    spans = []
+    start = 0
+    for m in _SENTENCE_END_RE.finditer(text):
+        spans.append((start, m.start()))
+        start = m.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans or [(0, len(text))]
+
+
+def _split_spans(text: str, sentence_spans: List[Tuple[int, int]], counts: List[int],
+                 max_tokens: int) -> List[Tuple[int, int, int]]:
+    """
+    Split an oversized paragraph into (start, end, tokens) spans of at most
+    max_tokens: on sentence boundaries first (counts are the sentences' token
+    counts), then on token boundaries for long sentences.
+    """
+    spans = []
+    for (s, e), n in zip(sentence_spans, counts):
+        if n <= max_tokens:
+            spans.append((s, e, n))
+            continue
+        offsets = token_spans(text[s:e])
+        for i in range(0, len(offsets), max_tokens):
+            group = offsets[i:i + max_tokens]
+            spans.append((s + group[0][0], s + group[-1][1], len(group)))
+    return spans
+
+
+class _ChunkBuilder:
+    def __init__(self, max_tokens: int, overlap_tokens: int):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.units: List[_Unit] = []
+        self.tokens = 0
+        self.section: Optional[str] = None
+        self.has_new_content = False
+        self.has_body = False  # Holds more than headings
+
+    def add(self, unit: _Unit, is_heading: bool = False) -> Iterator[Dict[str, Any]]:
+        if self.units and self.tokens + unit.tokens > self.max_tokens:
+            yield from self.flush(keep_overlap=True)
+            if self.tokens + unit.tokens > self.max_tokens:
+                # No room for overlap in front of this unit
+                self.units, self.tokens, self.has_body = [], 0, False
+        self.units.append(unit)
+        self.tokens += unit.tokens
+        self.has_new_content = True
+        self.has_body = self.has_body or not is_heading
+
+    def flush(self, keep_overlap: bool = False) -> Iterator[Dict[str, Any]]:
+        # A chunk that is only overlap carried from the previous one is dropped
+        if self.units and self.has_new_content:
+            yield self._build()
+        else:
+            keep_overlap = False
+
+        carried = []
+        if keep_overlap and self.overlap_tokens:
+            total = 0
+            for unit in reversed(self.units):
+                if total + unit.tokens > self.overlap_tokens:
+                    break
+                carried.insert(0, unit)
+                total += unit.tokens
+        self.units = carried
+        self.tokens = sum(u.tokens for u in carried)
+        self.has_new_content = False
+        self.has_body = bool(carried)
+
+    def _build(self) -> Dict[str, Any]:
+        parts = []
+        for i, unit in enumerate(self.units):
+            if i:
+                parts.append("\n" if unit.new_block else " ")
+            parts.append(" ".join(unit.text.split()))
+
+        meta = {
+            "page_start": self.units[0].page,
+            "page_end": self.units[-1].page,
+            "char_start": self.units[0].start,
+            "char_end": self.units[-1].end,
+        }
+        if self.section:
+            meta["section"] = self.section
+
+        return {"content": "".join(parts), "token_count": self.tokens, "meta": meta}
+
+
+def iter_chunks(pages: Iterable[str], max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Chunk a document in a single streaming pass over its pages.
+
+    Chunks are sized in embedding-model tokens, start a new chunk at each heading,
+    and only split paragraphs (by sentence, then by token) when a paragraph is
+    larger than a chunk. Each page's sentences are tokenized once, in one batch;
+    a paragraph's size is the sum of its sentences.
+
+    Chunks don't span pages, so each chunk can be cited by one page. The one
+    exception is a heading at the foot of a page: it stays with the body it
+    introduces on the next page rather than becoming a chunk on its own.
+
+    Yields dicts with 'content', 'token_count' and 'meta' (page_start, page_end,
+    char_start, char_end and section). Offsets refer to the document text as
+    pages joined with a trailing newline each.
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    builder = _ChunkBuilder(max_tokens, overlap_tokens)
+
+    offset = 0
+    for page_no, page_text in enumerate(pages, start=1):
+        if builder.has_body:
+            yield from builder.flush(keep_overlap=False)
+
+        blocks = [(kind, s, e, page_text[s:e].replace("\n", " ")) for kind, s, e in _iter_blocks(page_text)]
+        sentences = [[(0, len(text))] if kind == "heading" else _sentence_spans(text) for kind, _, _, text in blocks]
+        flat_counts = count_tokens_batch([text[a:b] for (_, _, _, text), spans in zip(blocks, sentences) for a, b in spans])
+
+        position = 0
+        for (kind, s, e, text), spans in zip(blocks, sentences):
+            counts = flat_counts[position:position + len(spans)]
+            position += len(spans)
+            n = sum(counts)
+
+            if kind == "heading":
+                # Headings start a new chunk and label the chunks that follow.
+                # Consecutive headings stay together with the body below them.
+                if builder.has_body:
+                    yield from builder.flush(keep_overlap=False)
+                builder.section = " ".join(text.split())
+                yield from builder.add(_Unit(text, n, offset + s, offset + e, page_no, True), is_heading=True)
+                continue
+
+            if n <= max_tokens:
+                # Fast path: the paragraph fits in a chunk as-is
+                yield from builder.add(_Unit(text, n, offset + s, offset + e, page_no, True))
+                continue
+
+            for i, (a, b, m) in enumerate(_split_spans(text, spans, counts, max_tokens)):
+                yield from builder.add(_Unit(text[a:b], m, offset + s + a, offset + s + b, page_no, i == 0))
+
+        offset += len(page_text) + 1
+
+    yield from builder.flush(keep_overlap=False)
+
+
+def chunk_pages(pages: Iterable[str], max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Chunk a document given as a list of page texts."""
+    return list(iter_chunks(pages, max_tokens, overlap_tokens))
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> list[str]:
+    """Chunk plain text (treated as a single page) and return chunk contents."""
+    return [chunk["content"] for chunk in iter_chunks([text], max_tokens, overlap_tokens)]
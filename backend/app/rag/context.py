@@ -0,0 +1,88 @@
+import re
+from typing import List, Dict, Any, Optional
+
+from app.core.config import settings
+from app.rag.tokenizer import count_tokens, token_spans
+
+# Split after sentence-ending punctuation or on blank lines.
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+CONTEXT_SEPARATOR = "\n\n"
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, dropping empty fragments."""
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s and s.strip()]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncate text to at most max_tokens, cutting on a sentence boundary. If
+    not even the first sentence fits, it is cut on a token boundary instead.
+    """
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        sentence_tokens = count_tokens(sentence)
+        if used + sentence_tokens > max_tokens:
+            if not kept:
+                spans = token_spans(sentence)[:max(max_tokens, 0)]
+                if spans:
+                    kept.append(sentence[:spans[-1][1]])
+            break
+        kept.append(sentence)
+        used += sentence_tokens
+    return " ".join(kept)
+
+
+def build_context(chunks: List[Dict[str, Any]], token_budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Pack retrieved chunks into a token budget, best score first.
+
+    chunks is a list of dicts with keys: 'content' and 'distance' (cosine distance,
+    lower is better). Chunks that don't fit are truncated (see truncate_to_tokens),
+    as long as the truncated part is still worth including.
+
+    Returns a dict with 'text', 'tokens', 'chunks' (the packed chunks, in order)
+    and 'truncated' (number of chunks that were cut).
+    """
+    if token_budget is None:
+        token_budget = settings.RAG_CONTEXT_TOKEN_BUDGET
+
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    ranked = sorted(chunks, key=lambda c: c.get("distance") if c.get("distance") is not None else float("inf"))
+
+    packed = []
+    parts = []
+    used = 0
+    truncated = 0
+
+    for chunk in ranked:
+        content = (chunk.get("content") or "").strip()
+        if not content:
+            continue
+
+        remaining = token_budget - used - (separator_tokens if parts else 0)
+        if remaining <= 0:
+            break
+
+        content_tokens = count_tokens(content)
+        if content_tokens > remaining:
+            if remaining < settings.RAG_MIN_TRUNCATED_TOKENS:
+                break
+            content = truncate_to_tokens(content, remaining)
+            if not content:
+                continue
+            content_tokens = count_tokens(content)
+            truncated += 1
+
+        used += content_tokens + (separator_tokens if parts else 0)
+        parts.append(content)
+        packed.append({**chunk, "content": content, "tokens": content_tokens})
+
+    return {
+        "text": CONTEXT_SEPARATOR.join(parts),
+        "tokens": used,
+        "chunks": packed,
+        "truncated": truncated,
+    }
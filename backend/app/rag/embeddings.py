@@ -2,6 +2,7 @@ from typing import List, Optional
 import os
 from huggingface_hub import InferenceClient
 from app.core.config import settings
+from app.core.tracing import tracer
 
 class EmbeddingService:
     def __init__(self):
@@ -16,7 +17,7 @@ class EmbeddingService:
         )
         if not token:
             print("WARNING: HF_TOKEN not set. Using public Hugging Face API (rate limits may apply).")
-        self.model = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        self.model = settings.EMBEDDING_MODEL
 
     def embed_query(self, text: str) -> List[float]:
         return self._get_embedding(text)
@@ -34,7 +35,11 @@ class EmbeddingService:
         # API call
         # We use feature_extraction to get the embedding vector
         try:
-            response = self.client.feature_extraction(text, model=self.model)
+            with tracer.start_as_current_span("embedding.feature_extraction") as span:
+                if span.is_recording():
+                    span.set_attribute("embedding.model", self.model)
+                    span.set_attribute("embedding.input_chars", len(text))
+                response = self.client.feature_extraction(text, model=self.model)
         except Exception as e:
             print(f"Error calling HF API: {e}")
             import traceback
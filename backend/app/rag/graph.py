@@ -1,19 +1,47 @@
-from typing import Annotated, TypedDict, List, Optional
+from dataclasses import dataclass, field
+from typing import Annotated, TypedDict, List, Optional, Dict, Any
 from uuid import UUID
 
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langgraph.graph import StateGraph, END
 from app.services.llm_service import LLMService
 from app.rag.retriever import Retriever
+from app.rag.context import build_context
+from app.rag.tokenizer import count_tokens
+from app.core.metrics import bounded_label, observe_stage
+from app.core.tracing import tracer
 
 # Define State
 class GraphState(TypedDict):
     messages: List[BaseMessage]
-    context: List[str]
+    context: List[Dict[str, Any]]
     question: str
     workspace_id: UUID
     agent_id: Optional[str]
     document_ids: Optional[List[str]]
+    context_token_budget: Optional[int]
+    usage: Dict[str, Any]
+    timings: Dict[str, float]
+    context_chunk_ids: List[str]
+
+
+@dataclass
+class RAGResult:
+    """Answer of a RAG run plus what it took to produce it."""
+    answer: str
+    usage: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)  # Stage -> ms
+    chunks: List[Dict[str, Any]] = field(default_factory=list)  # chunk_id, distance, in_context
+    confidence: Optional[float] = None  # Cosine similarity of the best retrieved chunk
+
+    def to_meta(self) -> Dict[str, Any]:
+        """Message.meta representation."""
+        return {
+            "usage": self.usage,
+            "timings": self.timings,
+            "retrieval": {"chunks": self.chunks, "top_similarity": self.confidence},
+        }
+
 
 async def retrieve_node(state: GraphState, retriever: Retriever):
     """
@@ -29,8 +57,9 @@ async def retrieve_node(state: GraphState, retriever: Retriever):
         if "document_ids" in state:
             document_ids = state["document_ids"]
 
-        docs = await retriever.retrieve(question, workspace_id, document_ids=document_ids)
-        return {"context": docs}
+        timings = dict(state.get("timings") or {})
+        docs = await retriever.retrieve(question, workspace_id, document_ids=document_ids, timings=timings)
+        return {"context": docs, "timings": timings}
     except Exception as e:
         print(f"Error in retrieve_node: {e}")
         import traceback
@@ -42,10 +71,13 @@ async def generate_node(state: GraphState, llm_service: LLMService):
     Generate answer using RAG.
     """
     question = state["question"]
-    context = state["context"]
+    workspace = bounded_label("workspace", state["workspace_id"])
+    timings = dict(state.get("timings") or {})
+    with observe_stage("context_build", workspace, timings):
+        context = build_context(state["context"], state.get("context_token_budget"))
     
     # Construct prompt
-    context_str = "\n\n".join(context)
+    context_str = context["text"]
     prompt = f"""
     You are a helpful assistant. Use the following context to answer the user's question.
     If the answer is not in the context, say you don't know.
@@ -59,12 +91,35 @@ async def generate_node(state: GraphState, llm_service: LLMService):
     Answer:
     """
     
-    response = await llm_service.generate(prompt)
-    return {"messages": [AIMessage(content=response)]}
+    reported = {}
+    with observe_stage("llm_generate", workspace, timings):
+        response = await llm_service.generate(prompt, workspace_id=state["workspace_id"], usage=reported)
+    # Prompt and completion counts come from the model when it reports them;
+    # otherwise (and for the context, whose budget is in these units) they are
+    # counted with the embedding model's tokenizer, an approximation of the LLM's
+    usage = {
+        "prompt_tokens": reported.get("prompt_tokens") or count_tokens(prompt),
+        "context_tokens": context["tokens"],
+        "context_chunks": len(context["chunks"]),
+        "context_chunks_truncated": context["truncated"],
+        "completion_tokens": reported.get("completion_tokens") or count_tokens(response),
+        "token_counts": "reported" if len(reported) == 2 else "approximate",
+    }
+    return {
+        "messages": [AIMessage(content=response)],
+        "usage": usage,
+        "timings": timings,
+        "context_chunk_ids": [c["chunk_id"] for c in context["chunks"] if c.get("chunk_id")],
+    }
 
 class RAGGraph:
-    def __init__(self, session):
-        self.retriever = Retriever(session)
+    def __init__(self, session, release_connection: bool = False):
+        """
+        release_connection: commit the session right after retrieval so no
+        connection is checked out during generation. The session must not
+        hold changes that shouldn't be committed at that point.
+        """
+        self.retriever = Retriever(session, release_connection=release_connection)
         self.llm_service = LLMService()
         self.workflow = self._build_graph()
 
@@ -83,10 +138,20 @@ class RAGGraph:
         # Let's wrap them in async functions or use functools.partial.
         
         async def call_retrieve(state):
-            return await retrieve_node(state, self.retriever)
+            with tracer.start_as_current_span("rag.retrieve") as span:
+                result = await retrieve_node(state, self.retriever)
+                if span.is_recording():
+                    span.set_attribute("insydr.workspace_id", str(state["workspace_id"]))
+                    span.set_attribute("rag.chunks", len(result["context"]))
+                return result
             
         async def call_generate(state):
-            return await generate_node(state, self.llm_service)
+            with tracer.start_as_current_span("rag.generate") as span:
+                result = await generate_node(state, self.llm_service)
+                if span.is_recording():
+                    for key, value in result["usage"].items():
+                        span.set_attribute(f"rag.usage.{key}", value)
+                return result
 
         workflow.add_node("retrieve", call_retrieve)
         workflow.add_node("generate", call_generate)
@@ -98,15 +163,40 @@ class RAGGraph:
         
         return workflow.compile()
 
-    async def process_message(self, question: str, workspace_id: UUID, agent_id: Optional[str] = None, document_ids: Optional[List[str]] = None):
+    async def run(self, question: str, workspace_id: UUID, agent_id: Optional[str] = None, document_ids: Optional[List[str]] = None, context_token_budget: Optional[int] = None) -> RAGResult:
+        """Run the graph and return the answer with its usage, stage timings and retrieval details."""
         initial_state = {
             "messages": [HumanMessage(content=question)],
             "question": question,
             "workspace_id": workspace_id,
             "agent_id": agent_id,
             "document_ids": document_ids,
-            "context": []
+            "context_token_budget": context_token_budget,
+            "context": [],
+            "usage": {},
+            "timings": {},
+            "context_chunk_ids": []
         }
         
-        result = await self.workflow.ainvoke(initial_state)
-        return result["messages"][-1].content
+        state = await self.workflow.ainvoke(initial_state)
+
+        in_context = set(state.get("context_chunk_ids") or [])
+        chunks = [
+            {"chunk_id": c["chunk_id"], "distance": c["distance"], "in_context": c["chunk_id"] in in_context}
+            for c in state["context"]
+        ]
+        distances = [c["distance"] for c in chunks if c["distance"] is not None]
+        # Cosine distance -> similarity of the closest chunk
+        confidence = round(min(max(1 - min(distances), 0.0), 1.0), 4) if distances else None
+
+        return RAGResult(
+            answer=state["messages"][-1].content,
+            usage=state.get("usage") or {},
+            timings=state.get("timings") or {},
+            chunks=chunks,
+            confidence=confidence,
+        )
+
+    async def process_message(self, question: str, workspace_id: UUID, agent_id: Optional[str] = None, document_ids: Optional[List[str]] = None, context_token_budget: Optional[int] = None):
+        result = await self.run(question, workspace_id, agent_id, document_ids, context_token_budget)
+        return result.answer
@@ -1,77 +1,92 @@
 import os
 import asyncio
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pypdf import PdfReader
-from app.rag.chunker import chunk_text
+from app.rag.chunker import iter_chunks
 from app.rag.embeddings import EmbeddingService
+from app.rag.versioning import content_hash
+from app.core.metrics import INGEST_STAGE_SECONDS
 
 class IngestionPipeline:
     def __init__(self):
         self.embedding_service = EmbeddingService()
 
-    async def process_document(self, file_path: str) -> Dict[str, Any]:
+    async def prepare_document(self, file_path: str) -> Dict[str, Any]:
         """
-        Asynchronously processes a document by running the synchronous logic in a thread.
+        Extracts and chunks a document without embedding it.
+        Runs the synchronous logic in a thread.
         """
-        return await asyncio.to_thread(self._process_sync, file_path)
+        with INGEST_STAGE_SECONDS.labels("chunk").time():
+            return await asyncio.to_thread(self._prepare_sync, file_path)
 
-    def _process_sync(self, file_path: str) -> Dict[str, Any]:
-        print(f"[DEBUG] Starting ingestion for {file_path}")
+    async def embed_chunks(self, chunks: List[Dict[str, Any]], known_embeddings: Optional[Dict[str, List[float]]] = None) -> int:
+        """
+        Fills in 'embedding' on each chunk, reusing known_embeddings (content_hash -> vector)
+        and only calling the embedding API for content it hasn't seen.
+        Returns the number of chunks whose embedding was reused.
         """
-        Extracts text, chunks it, and generates embeddings.
-        Returns a dict with 'title', 'chunks' (content, embedding, index, tokens).
+        with INGEST_STAGE_SECONDS.labels("embed").time():
+            return await asyncio.to_thread(self._embed_sync, chunks, dict(known_embeddings or {}))
+
+    def _prepare_sync(self, file_path: str) -> Dict[str, Any]:
         """
+        Extracts text and chunks it.
+        Returns a dict with 'title', 'text' and 'chunks' (content, chunk_index, token_count, content_hash, meta).
+        """
+        print(f"[DEBUG] Starting ingestion for {file_path}")
         # 1. Extract Text
-        text = self._extract_text(file_path)
+        pages = self._extract_pages(file_path)
+        text = "".join(page + "\n" for page in pages)
         title = Path(file_path).stem
 
-        # 2. Chunk Text
-        text_chunks = chunk_text(text)
+        # 2. Chunk Text (meta carries page numbers and offsets into text)
+        chunks_data = [
+            {
+                **chunk,
+                "chunk_index": i,
+                "content_hash": content_hash(chunk["content"]),
+            }
+            for i, chunk in enumerate(iter_chunks(pages))
+        ]
+
+        return {
+            "title": title,
+            "text": text,
+            "chunks": chunks_data
+        }
+
+    def _embed_sync(self, chunks: List[Dict[str, Any]], known: Dict[str, List[float]]) -> int:
+        # Unique content that still needs an embedding (duplicates within the
+        # document are embedded once)
+        contents = {}
+        for chunk in chunks:
+            if chunk["content_hash"] not in known:
+                contents.setdefault(chunk["content_hash"], chunk["content"])
+        pending = list(contents)
 
-        # 3. Embed Chunks
-        chunks_data = []
-        
         # Batch embedding
         # Process in batches of 32 to avoid timeouts or payload issues
         batch_size = 32
-        embeddings = []
-        
-        for i in range(0, len(text_chunks), batch_size):
-            batch = text_chunks[i : i + batch_size]
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i : i + batch_size]
             try:
-                batch_embeddings = self.embedding_service.embed_documents(batch)
-                embeddings.extend(batch_embeddings)
+                batch_embeddings = self.embedding_service.embed_documents([contents[h] for h in batch])
             except Exception as e:
                 print(f"Error embedding batch {i}: {e}")
                 raise e
+            for h, vector in zip(batch, batch_embeddings):
+                known[h] = vector
 
-        for i, chunk_content in enumerate(text_chunks):
-            # approximate token count
-            token_count = len(chunk_content.split())
-            
-            # Ensure embedding exists
-            embedding_vector = embeddings[i] if i < len(embeddings) else [0.0]*384
-            
-            chunks_data.append({
-                "content": chunk_content,
-                "embedding": embedding_vector,
-                "chunk_index": i,
-                "token_count": token_count
-            })
+        for chunk in chunks:
+            chunk["embedding"] = known.get(chunk["content_hash"], [0.0]*384)
 
-        return {
-            "title": title,
-            "chunks": chunks_data
-        }
+        return len(chunks) - len(pending)
 
-    def _extract_text(self, file_path: str) -> str:
-        text = ""
+    def _extract_pages(self, file_path: str) -> List[str]:
         try:
             reader = PdfReader(file_path)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+            return [page.extract_text() or "" for page in reader.pages]
         except Exception as e:
             print(f"Error reading PDF: {e}")
             raise e
-        return text
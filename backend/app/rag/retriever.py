@@ -1,29 +1,49 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.repositories.knowledge_repo import KnowledgeRepository
 from app.rag.embeddings import EmbeddingService
+from app.core.metrics import bounded_label, observe_stage
 
 class Retriever:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, release_connection: bool = False):
         self.embedding_service = EmbeddingService()
         self.knowledge_repo = KnowledgeRepository(session)
+        self.session = session
+        # End the transaction after the search so the pooled connection isn't
+        # held while the caller does slow, DB-free work (the LLM call)
+        self.release_connection = release_connection
 
-    async def retrieve(self, query: str, workspace_id: UUID, limit: int = 5, document_ids: Optional[List[str]] = None) -> List[str]:
+    async def retrieve(self, query: str, workspace_id: UUID, limit: int = 5, document_ids: Optional[List[str]] = None, timings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
         """
         Embeds the query and searches the vector database.
-        Returns a list of context strings.
+        Returns a list of dicts with 'chunk_id', 'content' and 'distance'.
+        Stage durations (ms) are added to timings if given.
         """
+        workspace = bounded_label("workspace", workspace_id)
+
         # 1. Embed Query
-        query_embedding = self.embedding_service.embed_query(query)
+        with observe_stage("embed_query", workspace, timings):
+            query_embedding = self.embedding_service.embed_query(query)
         
         # 2. Search DB (with filter)
-        chunks = await self.knowledge_repo.search_similar_chunks(
-            workspace_id=workspace_id, 
-            embedding_vector=query_embedding, 
-            limit=limit,
-            document_ids=document_ids
-        )
+        with observe_stage("vector_search", workspace, timings):
+            rows = await self.knowledge_repo.search_similar_chunks(
+                workspace_id=workspace_id, 
+                embedding_vector=query_embedding, 
+                limit=limit,
+                document_ids=document_ids
+            )
         
         # 3. Format chunks
-        return [chunk.content for chunk in chunks]
+        chunks = [
+            {
+                "chunk_id": str(chunk.id),
+                "content": chunk.content,
+                "distance": float(distance) if distance is not None else None,
+            }
+            for chunk, distance in rows
+        ]
+        if self.release_connection:
+            await self.session.commit()
+        return chunks
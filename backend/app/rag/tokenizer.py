@@ -0,0 +1,93 @@
+import asyncio
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+# Used when the real tokenizer can't be loaded (offline, no HF access).
+# Roughly matches WordPiece granularity: words and punctuation count separately.
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_tokenizer = None
+_retry_at = 0.0  # monotonic time before which a failed load isn't retried
+_load_lock = threading.Lock()
+
+
+def load_tokenizer():
+    """
+    Load the embedding model's tokenizer (may download it; blocks). Returns
+    None if it can't be loaded; the next attempt is TOKENIZER_RETRY_SECONDS later.
+    """
+    global _tokenizer, _retry_at
+    with _load_lock:
+        if _tokenizer is not None or time.monotonic() < _retry_at:
+            return _tokenizer
+        try:
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_pretrained(settings.EMBEDDING_MODEL, token=settings.HF_TOKEN)
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            _tokenizer = tokenizer
+        except Exception as e:
+            _retry_at = time.monotonic() + settings.TOKENIZER_RETRY_SECONDS
+            print(f"WARNING: Could not load tokenizer for {settings.EMBEDDING_MODEL}: {e}. Using approximate token counts.")
+        return _tokenizer
+
+
+async def load_tokenizer_async():
+    """load_tokenizer() off the event loop (on app startup)."""
+    return await asyncio.to_thread(load_tokenizer)
+
+
+def get_tokenizer() -> Optional[object]:
+    """
+    The tokenizer, or None while it isn't loaded (callers fall back to
+    approximate counts). Loads it here outside the event loop; on the event
+    loop the (possibly downloading) load runs in a background thread instead.
+    """
+    if _tokenizer is not None or time.monotonic() < _retry_at:
+        return _tokenizer
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return load_tokenizer()
+    if not _load_lock.locked():
+        threading.Thread(target=load_tokenizer, name="tokenizer-load", daemon=True).start()
+    return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text using the cached tokenizer."""
+    if not text:
+        return 0
+
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return len(_APPROX_TOKEN_RE.findall(text))
+
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """Count tokens for many texts in one tokenizer call."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [count_tokens(t) for t in texts]
+
+    encodings = tokenizer.encode_batch(list(texts), add_special_tokens=False)
+    return [len(e.ids) for e in encodings]
+
+
+def token_spans(text: str) -> List[Tuple[int, int]]:
+    """Character (start, end) offsets of each token in text."""
+    if not text:
+        return []
+
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [m.span() for m in _APPROX_TOKEN_RE.finditer(text)]
+
+    return [span for span in tokenizer.encode(text, add_special_tokens=False).offsets if span[1] > span[0]]
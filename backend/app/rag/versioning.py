@@ -0,0 +1,33 @@
+import hashlib
+import re
+import unicodedata
+from typing import List, Dict, Any
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_content(text: str) -> str:
+    """
+    Normalize chunk text before hashing.
+    Mirrors what the embedding input sees (newlines become spaces), so two chunks
+    with the same hash always produce the same embedding.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the normalized chunk content."""
+    return hashlib.sha256(normalize_content(text).encode("utf-8")).hexdigest()
+
+
+def embedding_reuse_stats(chunks: List[Dict[str, Any]], reused: int) -> Dict[str, Any]:
+    """Summarize how many embedding calls were avoided during an ingest."""
+    total = len(chunks)
+    computed = total - reused
+    return {
+        "chunks_total": total,
+        "embeddings_reused": reused,
+        "embeddings_computed": computed,
+        "embedding_calls_avoided_pct": round(reused / total * 100, 1) if total else 0.0,
+    }
@@ -1,11 +1,36 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_QUEUE_WAIT_SECONDS, PASSWORD_HASH_QUEUED, PASSWORD_HASH_SECONDS
+from app.core.resilience import AdaptiveLimiter
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Hashes made with fewer than BCRYPT_ROUNDS report
+# needs-update and are rehashed on the next login; costlier ones are kept
+# (passlib flags any cost other than the default unless max_rounds is set).
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=31,
+)
+
+# bcrypt takes 100-300 ms of CPU per call (and releases the GIL), so async code
+# runs it on a small dedicated pool. The fixed-size limiter bounds how long a
+# call may queue for a worker.
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = AdaptiveLimiter(
+    initial=settings.PASSWORD_HASH_WORKERS,
+    min_limit=settings.PASSWORD_HASH_WORKERS,
+    max_limit=settings.PASSWORD_HASH_WORKERS,
+    target_latency=float("inf"),
+)
 
 
 def hash_password(password: str) -> str:
@@ -18,6 +43,35 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def _run_on_hash_pool(op: str, fn, *args):
+    """Run a bcrypt call on the hashing pool. Raises OverloadedError if no worker frees up in time."""
+    PASSWORD_HASH_QUEUED.set(_hash_slots.queued + 1)
+    try:
+        waited = await _hash_slots.acquire(settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS)
+    finally:
+        PASSWORD_HASH_QUEUED.set(_hash_slots.queued)
+    PASSWORD_HASH_QUEUE_WAIT_SECONDS.observe(waited)
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        PASSWORD_HASH_SECONDS.labels(op=op).observe(time.perf_counter() - start)
+        _hash_slots.release()
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password() without blocking the event loop."""
+    return await _run_on_hash_pool("hash", pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password off the event loop. Returns (valid, new_hash), where
+    new_hash is set when the stored hash uses outdated parameters.
+    """
+    return await _run_on_hash_pool("verify", pwd_context.verify_and_update, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -27,7 +81,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(hours=settings.JWT_EXPIRATION_HOURS)
     
-    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    # iat is whole seconds; iat_ms orders the token against a revocation in the same second
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "iat_ms": int(time.time() * 1000), "jti": uuid.uuid4().hex})
     
     encoded_jwt = jwt.encode(
         to_encode, 
@@ -0,0 +1,97 @@
+"""
+Workspace authorization: a user's role in a workspace, resolved once per
+request and cached briefly across requests.
+
+resolve_access() runs one query (workspace owner + the user's membership)
+on the primary, even from a replica session: the cached entry is stored under
+the version read before the query, so a lagging replica could otherwise put a
+removed member's old role back under the new version. It memoizes the result
+in session.info (the API dependencies give a request's primary and replica
+sessions the same memo, so repeated checks within a request are free) and,
+when Redis is configured, keeps it in a per-worker TTL cache for
+ROLE_CACHE_SECONDS, validated against the workspace's version in Redis on each
+use (app.core.cache_versions). Writes that change access (membership
+added/removed, role change, workspace update or deletion) call
+invalidate_workspace_access(), which bumps the version, so every worker stops
+using the old role on its next check.
+"""
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache_versions import bump_version, current_version
+from app.core.config import settings
+from app.core.ttl_cache import TTLCache
+from app.db.models.workspace import Workspace
+from app.db.models.workspace_member import WorkspaceMember
+
+ADMIN_ROLES = ("OWNER", "ADMIN")
+
+_access_cache = TTLCache("workspace_access", settings.ROLE_CACHE_SECONDS)
+SESSION_KEY = "workspace_access"
+
+
+@dataclass(frozen=True)
+class WorkspaceAccess:
+    workspace_id: UUID
+    user_id: UUID
+    exists: bool
+    role: Optional[str]  # "OWNER", the membership role, or None without access
+
+    @property
+    def has_access(self) -> bool:
+        return self.role is not None
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role in ADMIN_ROLES
+
+
+async def resolve_access(db: AsyncSession, workspace_id: UUID, user_id: UUID) -> WorkspaceAccess:
+    """The user's access to a workspace (one query on a cache miss)."""
+    key = (workspace_id, user_id)
+    memo = db.info.setdefault(SESSION_KEY, {})
+    access = memo.get(key)
+    version = None
+    if access is None and _access_cache.enabled:
+        version = await current_version(f"workspace_access:{workspace_id}")
+        cached = _access_cache.get(key) if version is not None else None
+        if cached is not None and cached[0] == version:
+            access = cached[1]
+    if access is None:
+        result = await db.execute(
+            select(Workspace.owner_id, WorkspaceMember.role)
+            .outerjoin(
+                WorkspaceMember,
+                and_(WorkspaceMember.workspace_id == Workspace.id, WorkspaceMember.user_id == user_id),
+            )
+            .where(Workspace.id == workspace_id)
+            .limit(1)
+            .execution_options(use_primary=True)
+        )
+        row = result.first()
+        if row is None:
+            access = WorkspaceAccess(workspace_id, user_id, exists=False, role=None)
+        else:
+            owner_id, member_role = row
+            access = WorkspaceAccess(workspace_id, user_id, exists=True,
+                                     role="OWNER" if owner_id == user_id else member_role)
+        if version is not None:
+            # Read before the query, so a change committed meanwhile invalidates this entry
+            _access_cache.set(key, (version, access))
+    memo[key] = access
+    return access
+
+
+async def invalidate_workspace_access(workspace_id: UUID, db: Optional[AsyncSession] = None) -> None:
+    """Forget cached access for every user of a workspace, on every worker (after membership or ownership changes)."""
+    _access_cache.invalidate_where(lambda key: key[0] == workspace_id)
+    await bump_version(f"workspace_access:{workspace_id}")
+    if db is not None:
+        memo = db.info.get(SESSION_KEY)
+        if memo:
+            for key in [k for k in memo if k[0] == workspace_id]:
+                del memo[key]
@@ -0,0 +1,204 @@
+"""
+Token-bucket rate limiting for the public widget endpoints.
+
+A request draws one token from each bucket that applies to it (client IP,
+session, agent, API key); it is admitted only if every bucket has a token, and
+a rejected request takes none. Buckets live in Redis when REDIS_URL is set,
+checked and updated by one Lua script so every worker shares them, and in this
+worker's memory otherwise (or while Redis is unreachable).
+
+Agent and API key limits depend on the workspace's subscription tier. The
+check runs before the endpoint touches the database, so tiers come from caches
+filled by admitted requests (remember_agent_tier, remember_api_key_tier).
+Until an agent's tier is known to this worker, only its IP and session buckets
+apply; an API key whose tier isn't known yet gets the FREE limits.
+
+Clients are identified by client_ip(): the socket peer, or with
+TRUSTED_PROXY_HOPS set, the address the outermost trusted proxy saw in
+X-Forwarded-For.
+"""
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.core.metrics import RATE_LIMITED
+from app.core.redis import get_redis
+from app.core.ttl_cache import TTLCache
+
+# Per tier: (requests per minute, burst) for chat turns per agent and for
+# widget initializations per API key
+TIER_RATE_LIMITS = {
+    "FREE": {"agent_chat": (60, 20), "api_key": (120, 40)},
+    "PRO": {"agent_chat": (300, 100), "api_key": (600, 200)},
+    "BUSINESS": {"agent_chat": (1500, 500), "api_key": (3000, 1000)},
+}
+
+# KEYS: bucket keys. ARGV: cost, then rate (tokens/s) and burst for each key.
+# Returns {"0", 0} when admitted, else {seconds until admitted, index of the
+# bucket that ran out}. Uses the Redis clock, so workers' clocks don't matter.
+_TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local tokens = {}
+local wait, blocking = 0, 0
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or burst
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    available = math.min(burst, available + elapsed * rate)
+    if available < cost and (cost - available) / rate > wait then
+        wait, blocking = (cost - available) / rate, i
+    end
+    tokens[i] = available
+end
+if blocking > 0 then
+    return {tostring(wait), blocking}
+end
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    redis.call('HSET', key, 'tokens', tokens[i] - cost, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+return {'0', 0}
+"""
+
+# (kind, key, requests per minute, burst)
+Bucket = Tuple[str, str, float, float]
+
+_agent_tiers = TTLCache("agent_tier", settings.TIER_CACHE_SECONDS)
+_api_key_tiers = TTLCache("api_key_tier", settings.TIER_CACHE_SECONDS)
+_local_buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, monotonic ts)
+_script = None
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, kind: str, retry_after: float):
+        self.kind = kind
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit exceeded ({kind}); retry in {retry_after:.1f}s")
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def client_ip(request: Request) -> str:
+    """
+    The client's address. Behind TRUSTED_PROXY_HOPS reverse proxies, each of
+    which appends the address it received from to X-Forwarded-For, that is the
+    entry the outermost proxy added; entries left of it are client-supplied.
+    With fewer entries than that the request didn't come through every proxy,
+    so the header can't be trusted and the peer address is used.
+    """
+    peer = request.client.host if request.client else "unknown"
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops <= 0:
+        return peer
+    forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+    return forwarded[-hops] if len(forwarded) >= hops else peer
+
+
+def _api_key_id(api_key: str) -> str:
+    # Never keep raw keys in Redis or memory
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+
+def remember_agent_tier(agent_id, tier: str):
+    """Record an agent's workspace tier so its next requests get tier limits."""
+    _agent_tiers.set(str(agent_id), tier)
+
+
+def remember_api_key_tier(api_key: str, tier: str):
+    """Record a validated API key's workspace tier so its next requests get tier limits."""
+    _api_key_tiers.set(_api_key_id(api_key), tier)
+
+
+def _tier_limits(tier: Optional[str]) -> Optional[dict]:
+    return TIER_RATE_LIMITS.get(tier, TIER_RATE_LIMITS["FREE"]) if tier else None
+
+
+def _take_local(buckets: List[Bucket], cost: float) -> Tuple[float, Optional[str]]:
+    now = time.monotonic()
+    available = []
+    wait, blocking = 0.0, None
+    for kind, key, per_minute, burst in buckets:
+        rate = per_minute / 60
+        tokens, ts = _local_buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - ts) * rate)
+        if tokens < cost and (cost - tokens) / rate > wait:
+            wait, blocking = (cost - tokens) / rate, kind
+        available.append(tokens)
+    if blocking:
+        return wait, blocking
+    for (_, key, _, _), tokens in zip(buckets, available):
+        _local_buckets[key] = (tokens - cost, now)
+        _local_buckets.move_to_end(key)
+    # Evicting the least recently used bucket only resets it to full
+    while len(_local_buckets) > settings.RATE_LIMIT_LOCAL_MAX_KEYS:
+        _local_buckets.popitem(last=False)
+    return 0.0, None
+
+
+async def _take_redis(redis, buckets: List[Bucket], cost: float) -> Tuple[float, Optional[str]]:
+    global _script
+    if _script is None:
+        _script = redis.register_script(_TOKEN_BUCKET_LUA)
+    args = [cost]
+    for _, _, per_minute, burst in buckets:
+        args += [per_minute / 60, burst]
+    wait, blocking = await _script(keys=[key for _, key, _, _ in buckets], args=args, client=redis)
+    return float(wait), (buckets[int(blocking) - 1][0] if int(blocking) else None)
+
+
+async def take(buckets: List[Bucket], cost: float = 1):
+    """Draw cost tokens from every bucket, or raise RateLimitExceeded and draw none."""
+    if not settings.RATE_LIMIT_ENABLED or not buckets:
+        return
+    redis = get_redis()
+    wait, blocking = None, None
+    if redis is not None:
+        try:
+            wait, blocking = await _take_redis(redis, buckets, cost)
+        except Exception as e:
+            print(f"[DEBUG] Rate limiter unavailable in Redis, using local buckets: {e}")
+    if wait is None:
+        wait, blocking = _take_local(buckets, cost)
+    if blocking:
+        RATE_LIMITED.labels(kind=blocking).inc()
+        raise RateLimitExceeded(blocking, wait)
+
+
+def _key(*parts) -> str:
+    return "ratelimit:" + ":".join(str(p) for p in parts)
+
+
+async def limit_widget_chat(client_ip: str, agent_id, session_id):
+    """Buckets for one widget chat turn: client IP, session and agent."""
+    buckets = [
+        ("ip", _key("chat", "ip", client_ip), settings.RATE_LIMIT_CHAT_IP_PER_MINUTE, settings.RATE_LIMIT_CHAT_IP_BURST),
+        ("session", _key("chat", "session", session_id),
+         settings.RATE_LIMIT_CHAT_SESSION_PER_MINUTE, settings.RATE_LIMIT_CHAT_SESSION_BURST),
+    ]
+    limits = _tier_limits(_agent_tiers.get(str(agent_id)))
+    if limits:
+        per_minute, burst = limits["agent_chat"]
+        buckets.append(("agent", _key("chat", "agent", agent_id), per_minute, burst))
+    await take(buckets)
+
+
+async def limit_widget_request(client_ip: str, api_key: Optional[str] = None):
+    """Buckets for the other widget endpoints (init, event, config): client IP and API key."""
+    buckets = [("ip", _key("widget", "ip", client_ip), settings.RATE_LIMIT_WIDGET_IP_PER_MINUTE,
+                settings.RATE_LIMIT_WIDGET_IP_BURST)]
+    if api_key:
+        key_id = _api_key_id(api_key)
+        per_minute, burst = _tier_limits(_api_key_tiers.get(key_id) or "FREE")["api_key"]
+        buckets.append(("api_key", _key("widget", "api_key", key_id), per_minute, burst))
+    await take(buckets)
@@ -0,0 +1,88 @@
+"""
+Access-token revocation.
+
+Tokens carry a jti; logout adds it to a deny-list until the token would have
+expired anyway, so the list stays small. revoke_user_tokens() rejects every
+token a user was issued before now (password reset), compared in milliseconds
+against the token's iat_ms claim, so a login right after a reset is valid. Entries live in Redis when
+REDIS_URL is set, so every worker sees them, and always in this worker's memory
+as well, which is what is checked if Redis is unreachable.
+"""
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+_revoked_jtis: Dict[str, float] = {}  # jti -> token expiry (epoch seconds)
+_revoked_before: Dict[str, int] = {}  # user id -> tokens issued before this (epoch ms) are revoked
+
+
+def _prune(now: float):
+    for jti in [j for j, exp in _revoked_jtis.items() if exp <= now]:
+        del _revoked_jtis[jti]
+    horizon_ms = (now - settings.JWT_EXPIRATION_HOURS * 3600) * 1000
+    for user_id in [u for u, ts in _revoked_before.items() if ts <= horizon_ms]:
+        del _revoked_before[user_id]
+
+
+def _issued_at_ms(payload: dict) -> int:
+    # Tokens issued before iat_ms existed count from the start of their second
+    if "iat_ms" in payload:
+        return int(payload["iat_ms"])
+    return int(payload.get("iat", 0)) * 1000
+
+
+async def revoke_token(payload: dict) -> None:
+    """Deny-list a decoded token until its expiry."""
+    jti, exp = payload.get("jti"), payload.get("exp")
+    if not jti or not exp:
+        return
+    now = time.time()
+    ttl_ms = int((exp - now) * 1000)
+    if ttl_ms <= 0:
+        return
+    _prune(now)
+    _revoked_jtis[jti] = exp
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            await redis.set(f"jwt:revoked:{jti}", 1, px=ttl_ms)
+        except Exception as e:
+            print(f"[DEBUG] Could not record token revocation in Redis: {e}")
+
+
+async def revoke_user_tokens(user_id: str) -> None:
+    """Revoke every token issued to the user so far."""
+    now = time.time()
+    _prune(now)
+    now_ms = int(now * 1000)
+    _revoked_before[str(user_id)] = now_ms
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            await redis.set(f"jwt:revoked_before:{user_id}", now_ms, ex=settings.JWT_EXPIRATION_HOURS * 3600)
+        except Exception as e:
+            print(f"[DEBUG] Could not record token revocation in Redis: {e}")
+
+
+async def is_token_revoked(payload: dict) -> bool:
+    """True if the decoded token was revoked by logout or a password reset."""
+    jti, user_id, issued_at = payload.get("jti"), str(payload.get("sub")), _issued_at_ms(payload)
+    if jti and jti in _revoked_jtis:
+        return True
+    before: Optional[int] = _revoked_before.get(user_id)
+    if before is not None and issued_at < before:
+        return True
+
+    redis = get_redis()
+    if redis is None:
+        return False
+    try:
+        denied, remote_before = await redis.mget(f"jwt:revoked:{jti or '-'}", f"jwt:revoked_before:{user_id}")
+    except Exception as e:
+        print(f"[DEBUG] Token deny-list unavailable, using local entries: {e}")
+        return False
+    return denied is not None or (remote_before is not None and issued_at < int(remote_before))
@@ -0,0 +1,44 @@
+"""
+Short-lived per-worker cache of the users behind access tokens, so an
+authenticated request doesn't need a users lookup once the token is verified.
+
+Entries are column snapshots; each hit gets its own transient User, so no ORM
+instance is shared between requests. Entries are only kept when Redis is
+configured, and each use checks the user's version there
+(app.core.cache_versions); UserRepository bumps it when the user is updated
+(profile, password) or deleted, so every worker drops its copy at once.
+"""
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache_versions import bump_version, current_version
+from app.core.config import settings
+from app.core.ttl_cache import TTLCache
+from app.db.models.user import User
+
+_user_cache = TTLCache("auth_user", settings.USER_CACHE_SECONDS)
+_COLUMNS = [attr.key for attr in User.__mapper__.column_attrs]
+
+
+async def get_user(db: AsyncSession, user_id: UUID) -> Optional[User]:
+    """The user by id, from the cache when possible."""
+    version = await current_version(f"auth_user:{user_id}") if _user_cache.enabled else None
+    cached = _user_cache.get(user_id) if version is not None else None
+    if cached is not None and cached[0] == version:
+        return User(**cached[1])
+
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is not None and version is not None:
+        # Version read before the query, so a change committed meanwhile invalidates this entry
+        _user_cache.set(user_id, (version, {key: getattr(user, key) for key in _COLUMNS}))
+    return user
+
+
+async def invalidate_user(user_id: UUID) -> None:
+    """Drop the cached user on every worker (after an update or deletion)."""
+    _user_cache.invalidate(user_id)
+    await bump_version(f"auth_user:{user_id}")
@@ -3,11 +3,13 @@ from typing import List, Optional, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.agent import Agent
 from app.db.repositories.agent_repo import AgentRepository
+from app.services.quota_service import QuotaService
 
 class AgentService:
     def __init__(self, session: AsyncSession):
         self.session = session
         self.agent_repo = AgentRepository(session)
+        self.quota = QuotaService(session)
 
     async def create_agent(self, 
                            workspace_id: UUID, 
@@ -18,6 +20,7 @@ class AgentService:
                            behavior_settings: Optional[Dict] = None,
                            document_ids: Optional[List[UUID]] = None,
                            allowed_domains: Optional[List[str]] = None) -> Agent:
+        await self.quota.check(workspace_id, "agents")
         agent = Agent(
             workspace_id=workspace_id,
             name=name,
@@ -31,6 +34,8 @@ class AgentService:
             conversation_rules={},
             allowed_domains=allowed_domains or []
         )
+        # Atomic with the insert, so concurrent creates can't pass the limit together
+        await self.quota.reserve(workspace_id, "agents")
         created_agent = await self.agent_repo.create(agent)
         
         # Link documents (using collection_id linkage)
@@ -68,6 +73,10 @@ class AgentService:
              # We need to instantiate it, but it needs a session. We have self.session.
              # This is a bit "service calling service", which is fine.
              ks = KnowledgeService(self.session)
+
+             # Download all sources concurrently up front; processing stays
+             # sequential because every document shares this session.
+             await ks.prefetch_documents(document_ids)
              
              for doc_id in document_ids:
                  try:
@@ -8,6 +8,9 @@ from app.db.models.message import Message
 from app.db.models.agent import Agent
 from app.db.models.usage_metric import UsageMetric
 
+# Stages recorded in assistant Message.meta["timings"] (see app.rag.graph.RAGResult)
+RAG_STAGES = ("embed_query", "vector_search", "context_build", "llm_generate")
+
 
 class AnalyticsService:
     def __init__(self, session: AsyncSession):
@@ -446,3 +449,68 @@ class AnalyticsService:
             })
         
         return {"distribution": distribution}
+
+    async def get_latency_breakdown(
+        self,
+        workspace_id: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        agent_id: Optional[UUID] = None
+    ) -> Dict[str, Any]:
+        """
+        Average and p95 time per RAG stage, plus retrieval quality (top chunk
+        similarity), from the timings and retrieval details stored in
+        assistant message meta.
+        """
+        if not end_date:
+            end_date = date.today()
+        if not start_date:
+            start_date = end_date - timedelta(days=30)
+
+        start_datetime = datetime.combine(start_date, datetime.min.time())
+        end_datetime = datetime.combine(end_date, datetime.max.time())
+
+        filters = [
+            Message.workspace_id == workspace_id,
+            Message.created_at >= start_datetime,
+            Message.created_at <= end_datetime,
+            Message.role == 'assistant',
+        ]
+        if agent_id:
+            filters.append(Message.conversation_id.in_(
+                select(Conversation.id).where(Conversation.agent_id == agent_id)
+            ))
+
+        # Only messages with stored retrieval details (older rows have a placeholder confidence)
+        top_similarity = Message.meta['retrieval']['top_similarity'].as_float()
+        columns = [
+            func.count(Message.id),
+            func.count(Message.meta['timings'].as_string()),
+            func.avg(top_similarity),
+            func.count(top_similarity),
+        ]
+        for stage in RAG_STAGES:
+            value = Message.meta['timings'][stage].as_float()
+            columns.append(func.avg(value))
+            columns.append(func.percentile_cont(0.95).within_group(value))
+
+        result = await self.session.execute(select(*columns).where(and_(*filters)))
+        row = result.one()
+        messages, timed, avg_similarity, with_context = row[:4]
+
+        stages = []
+        for i, stage in enumerate(RAG_STAGES):
+            avg_ms, p95_ms = row[4 + 2 * i], row[5 + 2 * i]
+            stages.append({
+                "stage": stage,
+                "avg_ms": round(avg_ms, 2) if avg_ms is not None else 0,
+                "p95_ms": round(p95_ms, 2) if p95_ms is not None else 0,
+            })
+
+        return {
+            "stages": stages,
+            "messages": messages or 0,
+            "messages_with_timings": timed or 0,
+            "avg_top_similarity": round(avg_similarity, 4) if avg_similarity is not None else 0,
+            "no_context_rate": round((timed - with_context) / timed * 100, 1) if timed else 0,
+        }
@@ -6,12 +6,13 @@ from app.db.models.user import User
 from app.db.models.otp import OTP
 from app.db.repositories.auth_repository import UserRepository, OTPRepository
 from app.security.auth import (
-    hash_password, 
-    verify_password, 
+    hash_password_async,
+    verify_and_update_password,
     create_access_token, 
     generate_otp
 )
 from app.core.config import settings
+from app.security.token_denylist import revoke_user_tokens
 
 
 from app.services.email_service import EmailService
@@ -34,21 +35,21 @@ class AuthService:
         # Create user
         user = User(
             email=email,
-            password_hash=hash_password(password),
+            password_hash=await hash_password_async(password),
             full_name=full_name,
             email_verified=False
         )
-        user = await self.user_repo.create(user)
+        user = await self.user_repo.create(user, commit=False)
 
         # Generate and save OTP
         otp_code = await self._create_otp(email, "email_verification")
         
-        # Send emails background
-        # Note: In a real production app, you might want to use BackgroundTasks from FastAPI
-        # here to initiate sending without blocking the response too much. 
-        # For now, we await it to ensure it works.
+        # Queued on the email outbox; delivered in the background. The user,
+        # OTP and emails commit together.
         await self.email_service.send_welcome_email(email, full_name)
         await self.email_service.send_verification_email(email, full_name, otp_code)
+        await self.user_repo.session.commit()
+        await self.user_repo.session.refresh(user)
 
         return user, otp_code
 
@@ -61,8 +62,12 @@ class AuthService:
         if not user:
             raise ValueError("The email or password you entered is incorrect. Please try again.")
 
-        if not verify_password(password, user.password_hash):
+        valid, new_hash = await verify_and_update_password(password, user.password_hash)
+        if not valid:
             raise ValueError("The email or password you entered is incorrect. Please try again.")
+        if new_hash:
+            # Stored with outdated bcrypt parameters; upgrade while we have the password
+            user.password_hash = new_hash
 
         # if not user.email_verified:
         #     raise ValueError("Your email address hasn't been verified yet. Please check your inbox for the verification link.")
@@ -113,6 +118,7 @@ class AuthService:
 
         otp_code = await self._create_otp(email, "password_reset")
         await self.email_service.send_password_reset_email(email, otp_code)
+        await self.otp_repo.session.commit()
         
         return otp_code
 
@@ -130,9 +136,11 @@ class AuthService:
             raise ValueError("We couldn't find an account with that email address.")
 
         # Update password
-        user.password_hash = hash_password(new_password)
+        user.password_hash = await hash_password_async(new_password)
         user.updated_at = datetime.utcnow()
         await self.user_repo.update(user)
+        # Sessions started with the old password end here
+        await revoke_user_tokens(user.id)
 
         # Mark OTP as used
         await self.otp_repo.mark_as_used(otp)
@@ -157,6 +165,7 @@ class AuthService:
             await self.email_service.send_verification_email(email, user.full_name, otp_code)
         elif purpose == "password_reset":
             await self.email_service.send_password_reset_email(email, otp_code)
+        await self.otp_repo.session.commit()
             
         return otp_code
 
@@ -165,9 +174,12 @@ class AuthService:
         return await self.user_repo.get_by_id(user_id)
 
     async def _create_otp(self, email: str, purpose: str) -> str:
-        """Create a new OTP and invalidate previous ones."""
+        """
+        Create a new OTP and invalidate previous ones, without committing: the
+        caller commits them together with the email that carries the code.
+        """
         # Invalidate previous OTPs
-        await self.otp_repo.invalidate_previous_otps(email, purpose)
+        await self.otp_repo.invalidate_previous_otps(email, purpose, commit=False)
 
         # Generate new OTP
         otp_code = generate_otp()
@@ -177,7 +189,7 @@ class AuthService:
             purpose=purpose,
             expires_at=datetime.utcnow() + timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
         )
-        await self.otp_repo.create(otp)
+        await self.otp_repo.create(otp, commit=False)
 
         # Console log the OTP (for development)
         print("\n" + "=" * 50)
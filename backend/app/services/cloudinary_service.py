@@ -1,7 +1,10 @@
 import asyncio
+import time
 import cloudinary
 import cloudinary.uploader
 from app.core.config import settings
+from app.core.metrics import INGEST_STAGE_SECONDS
+from app.core.tracing import tracer
 
 # Initialize Cloudinary
 if settings.CLOUDINARY_CLOUD_NAME:
@@ -21,19 +24,22 @@ async def upload_file(file_path: str, public_id: str = None) -> dict:
         # Use 'raw' resource type for PDFs to preserve the original file
         # 'auto' sometimes converts PDFs to images which can fail for large/complex PDFs
         res_type = "raw"
+        started = time.perf_counter()
         
         # Use upload_large for chunked uploads - handles files > 100MB
         # chunk_size is in bytes (6MB chunks is a good balance)
-        response = await asyncio.to_thread(
-            cloudinary.uploader.upload_large,
-            file_path,
-            public_id=public_id,
-            resource_type=res_type,
-            type="upload", 
-            access_mode="public",
-            chunk_size=6000000,  # 6MB chunks
-            timeout=300  # 5 minute timeout
-        )
+        with tracer.start_as_current_span("cloudinary.upload"):
+            response = await asyncio.to_thread(
+                cloudinary.uploader.upload_large,
+                file_path,
+                public_id=public_id,
+                resource_type=res_type,
+                type="upload", 
+                access_mode="public",
+                chunk_size=6000000,  # 6MB chunks
+                timeout=300  # 5 minute timeout
+            )
+        INGEST_STAGE_SECONDS.labels("upload").observe(time.perf_counter() - started)
         return response
     except Exception as e:
         print(f"Cloudinary upload error: {e}")
@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import IO, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows (development): no cross-process locks, open files can't be removed anyway
+    fcntl = None
+
+from app.core.config import settings
+from app.core.http import get_http_client
+from app.core.metrics import DOWNLOAD_QUEUE_DEPTH, INGEST_STAGE_SECONDS, record_cache
+
+logger = logging.getLogger(__name__)
+
+# Partial downloads older than this were left by a worker that died mid-download
+_STALE_PART_SECONDS = 3600
+
+
+class DownloadCache:
+    """
+    Size-bounded, content-addressed on-disk cache for remote files.
+
+    Entries are keyed by a stable id (e.g. the Cloudinary public_id) and
+    revalidated with conditional GETs (ETag / Last-Modified), so a document
+    that hasn't changed is never downloaded twice. Files are stored by the
+    sha256 of their content; identical files under different keys share one
+    copy. Least recently used files are evicted once max_bytes is exceeded,
+    skipping files that are currently open.
+
+    base_dir is shared by every worker process (and kept across restarts):
+    the index is updated under an exclusive lock on index.lock, and an open
+    file holds a shared lock on itself, which eviction (an exclusive,
+    non-blocking lock) respects in every worker. File IO runs in threads,
+    off the event loop.
+    """
+
+    def __init__(self, base_dir: str, max_bytes: int):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._cleaned = False
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.base_dir, "index.json")
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.base_dir, f"{sha256}.bin")
+
+    def _prepare(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        if self._cleaned:
+            return
+        now = time.time()
+        for name in os.listdir(self.base_dir):
+            path = os.path.join(self.base_dir, name)
+            try:
+                if name.endswith(".part") and now - os.path.getmtime(path) > _STALE_PART_SECONDS:
+                    os.remove(path)
+            except OSError:
+                pass
+        self._cleaned = True
+
+    def _read_index(self) -> Dict[str, dict]:
+        # Replaced atomically, so it can be read without the lock
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _locked_index(self):
+        """The index (key -> {url, etag, last_modified, sha256, size, last_used}), saved on exit."""
+        with open(os.path.join(self.base_dir, "index.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            entries = self._read_index()
+            yield entries
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.index_path)
+
+    def _remove_unused(self, sha256: str) -> bool:
+        """Delete a cached file unless a worker has it open. True if it is gone."""
+        path = self._path(sha256)
+        try:
+            if fcntl is None:
+                os.remove(path)
+                return True
+            with open(path, "rb") as f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def _evict(self, entries: Dict[str, dict]):
+        """Drop least recently used files until the cache fits in max_bytes."""
+        files: Dict[str, Tuple[int, float]] = {}
+        for entry in entries.values():
+            size, last_used = files.get(entry["sha256"], (entry["size"], 0.0))
+            files[entry["sha256"]] = (size, max(last_used, entry["last_used"]))
+
+        total = sum(size for size, _ in files.values())
+        for sha256, (size, _) in sorted(files.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            if not self._remove_unused(sha256):
+                continue
+            for key in [k for k, v in entries.items() if v["sha256"] == sha256]:
+                del entries[key]
+            total -= size
+
+    def _pin(self, key: str, entry: dict) -> Optional[IO]:
+        """
+        Record key's entry and open its file with a shared lock (so no worker
+        evicts it), then evict. None if another worker evicted the file since
+        it was revalidated.
+        """
+        with self._locked_index() as entries:
+            try:
+                pinned = open(self._path(entry["sha256"]), "rb")
+            except FileNotFoundError:
+                entries.pop(key, None)
+                return None
+            if fcntl is not None:
+                fcntl.flock(pinned.fileno(), fcntl.LOCK_SH)
+            entries[key] = dict(entry, last_used=time.time())
+            self._evict(entries)
+            return pinned
+
+    def _store(self, tmp_path: str, sha256: str):
+        path = self._path(sha256)
+        if os.path.exists(path):
+            # Same content already cached (maybe open in a worker); keep that copy
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def _write_chunk(f: IO, digest, chunk: bytes):
+        f.write(chunk)
+        digest.update(chunk)
+
+    async def _fetch(self, url: str, key: str, entry: Optional[dict]) -> dict:
+        """Return the entry for key's current content, downloading only if it changed."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        client = get_http_client()
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and entry:
+                logger.debug("Download cache hit (not modified): %s", key)
+                record_cache("download", hits=1)
+                return entry
+
+            if response.status_code != 200:
+                raise ValueError(f"Failed to download document: {response.status_code} from {url}")
+
+            record_cache("download", misses=1)
+            started = time.perf_counter()
+            fd, tmp_path = await asyncio.to_thread(tempfile.mkstemp, dir=self.base_dir, suffix=".part")
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        await asyncio.to_thread(self._write_chunk, f, digest, chunk)
+                        size += len(chunk)
+                sha256 = digest.hexdigest()
+                await asyncio.to_thread(self._store, tmp_path, sha256)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            INGEST_STAGE_SECONDS.labels("download").observe(time.perf_counter() - started)
+            logger.debug("Downloaded %s bytes for %s", size, key)
+            return {
+                "url": url,
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "sha256": sha256,
+                "size": size,
+            }
+
+    @asynccontextmanager
+    async def open(self, url: str, key: Optional[str] = None):
+        """
+        Yield a local path for url. The file stays in place (and is never evicted)
+        until the context exits; callers must not delete it.
+        """
+        key = key or url
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            await asyncio.to_thread(self._prepare)
+            entry = (await asyncio.to_thread(self._read_index)).get(key)
+            for _ in range(2):
+                entry = await self._fetch(url, key, entry)
+                pinned = await asyncio.to_thread(self._pin, key, entry)
+                if pinned is not None:
+                    break
+                entry = None  # Evicted after the 304; download it again
+            else:
+                raise FileNotFoundError(f"Downloaded file for {key} was evicted before it could be used")
+
+        try:
+            yield self._path(entry["sha256"])
+        finally:
+            pinned.close()  # Releases the shared lock
+
+    async def prefetch(self, items: List[Tuple[str, Optional[str]]], concurrency: Optional[int] = None) -> List[Optional[Exception]]:
+        """
+        Download (or revalidate) many (url, key) pairs concurrently.
+        Returns one entry per item: None on success, or the exception raised.
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.DOWNLOAD_CONCURRENCY)
+
+        async def fetch_one(url: str, key: Optional[str]):
+            DOWNLOAD_QUEUE_DEPTH.inc()
+            try:
+                await semaphore.acquire()
+            finally:
+                DOWNLOAD_QUEUE_DEPTH.dec()
+            try:
+                async with self.open(url, key):
+                    return None
+            finally:
+                semaphore.release()
+
+        results = await asyncio.gather(*(fetch_one(url, key) for url, key in items), return_exceptions=True)
+        return [r if isinstance(r, Exception) else None for r in results]
+
+
+download_cache = DownloadCache(
+    base_dir=settings.DOWNLOAD_CACHE_DIR or os.path.join(tempfile.gettempdir(), "insydr-download-cache"),
+    max_bytes=settings.DOWNLOAD_CACHE_MAX_MB * 1024 * 1024,
+)
@@ -1,42 +1,147 @@
 
 import os
+import re
+import asyncio
+import logging
 import uuid
-from typing import Optional
+from typing import List, Optional
 from pathlib import Path
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.db.repositories.knowledge_repo import KnowledgeRepository
+from app.services.quota_service import QuotaExceededError, QuotaService
 from app.rag.ingest import IngestionPipeline
+from app.rag.versioning import embedding_reuse_stats
+from app.services.download_cache import download_cache
+from app.core.metrics import INGEST_IN_PROGRESS, INGEST_STAGE_SECONDS, record_cache
 from app.db.models.document import Document
 
+logger = logging.getLogger(__name__)
+
+
+class DocumentNotFoundError(ValueError):
+    """The document doesn't exist or belongs to another workspace."""
+
+
 class KnowledgeService:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, quota: Optional[QuotaService] = None):
         self.repo = KnowledgeRepository(session)
+        self.quota = quota or QuotaService(session)
         self.pipeline = IngestionPipeline()
 
-    async def ingest_file(self, workspace_id: uuid.UUID, collection_id: uuid.UUID, file_path: str, process_embeddings: bool = False, original_filename: str = None):
+    async def _embed_prepared(self, workspace_id: uuid.UUID, prepared: dict, release_connection: bool = False) -> dict:
+        """
+        Embed the chunks of a prepared document in place. Chunks whose content hash
+        already has an embedding in the workspace reuse it instead of calling the
+        embedding API. Returns the reuse stats.
+
+        release_connection: commit right after the lookup so no connection is
+        checked out while the embedding API runs.
+        """
+        chunks = prepared['chunks']
+        known = await self.repo.get_embeddings_by_hashes(workspace_id, [c['content_hash'] for c in chunks])
+        if release_connection:
+            await self.repo.session.commit()
+        reused = await self.pipeline.embed_chunks(chunks, known)
+        stats = embedding_reuse_stats(chunks, reused)
+        record_cache("embedding", hits=stats['embeddings_reused'], misses=stats['embeddings_computed'])
+        logger.debug(
+            "Workspace %s: %s chunks embedded, %s reused (%s%% of embedding calls avoided)",
+            workspace_id, stats['embeddings_computed'], stats['embeddings_reused'], stats['embedding_calls_avoided_pct'],
+        )
+        return stats
+
+    async def _save_processed(self, document: Document, prepared: dict, stats: dict):
+        """Save embedded chunks as the document's current version."""
+        chunks = prepared['chunks']
+        base_meta = {k: v for k, v in (document.meta or {}).items() if k != "ingest_stats"}
+        for chunk in chunks:
+            # Chunk location (pages, offsets, section) on top of the document meta
+            chunk['meta'] = {**base_meta, **chunk.get('meta', {})}
+
+        document.status = "processed"
+        document.meta = {**(document.meta or {}), "ingest_stats": stats}
+        try:
+            with INGEST_STAGE_SECONDS.labels("save").time():
+                await self.repo.save_document_tree(document, chunks, version_content=prepared['text'], version_meta=stats)
+        except Exception:
+            # Keep the previous chunk set; the caller records the error status
+            await self.repo.session.rollback()
+            raise
+
+    async def _process_local_file(self, document: Document, file_path: str) -> dict:
+        """
+        Chunk, embed and save a local file as the document's current version.
+        """
+        prepared = await self.pipeline.prepare_document(file_path)
+        stats = await self._embed_prepared(document.workspace_id, prepared)
+        await self._save_processed(document, prepared, stats)
+        return stats
+
+    async def _prepare_for_upload(self, workspace_id: uuid.UUID, file_path: str, upload_task: asyncio.Task) -> tuple:
+        """
+        Chunk and embed a file while it is being uploaded.
+        Skips embedding if the upload has already failed.
+        """
+        prepared = await self.pipeline.prepare_document(file_path)
+        if upload_task.done() and (upload_task.cancelled() or upload_task.exception()):
+            raise ValueError("Upload failed; skipping embedding")
+        stats = await self._embed_prepared(workspace_id, prepared, release_connection=True)
+        return prepared, stats
+
+    async def ingest_file(self, workspace_id: uuid.UUID, collection_id: uuid.UUID, file_path: str, process_embeddings: bool = False, original_filename: str = None, document_id: Optional[uuid.UUID] = None):
         """
         Ingests a file: 
         1. Always uploads to Cloudinary + DB.
-        2. If process_embeddings=True, process vectors.
+        2. If process_embeddings=True, process vectors (concurrently with the upload).
         3. Deletes local file.
+
+        If document_id is given, the file is a revised version of that document:
+        it replaces the stored file and, when processed, only new or changed
+        chunks are embedded.
         """
+        INGEST_IN_PROGRESS.inc()
         try:
-             # 1. Upload to Cloudinary First
-            from app.services.cloudinary_service import upload_file
+             # 1. Upload to Cloudinary
+            from app.services.cloudinary_service import delete_file, upload_file
             
-            # Create a shell document first to get an ID? Or just use a random one?
-            # We need an ID for the public_id ideally. 
-            # Let's generate a UUID manually for the public_id path if we haven't saved doc yet.
-            doc_id = uuid.uuid4()
+            existing = None
+            if document_id:
+                existing = await self.repo.get_document(document_id)
+                if not existing or existing.workspace_id != workspace_id:
+                    raise DocumentNotFoundError("Document not found")
+                doc_id = existing.id
+            else:
+                # Before uploading anything: a new document must fit the tier
+                await self.quota.check(workspace_id, "documents")
+                # Create a shell document first to get an ID? Or just use a random one?
+                # We need an ID for the public_id ideally. 
+                # Let's generate a UUID manually for the public_id path if we haven't saved doc yet.
+                doc_id = uuid.uuid4()
             
-            try:
-                upload_result = await upload_file(file_path, public_id=f"workspaces/{workspace_id}/docs/{doc_id}")
-                print(f"[DEBUG] Cloudinary Upload Result: {upload_result}")
-            except Exception as e:
-                print(f"Cloudinary upload failed: {e}")
-                raise e
+            # End the transaction of the lookups above, so no pooled connection
+            # is held for the length of the upload
+            await self.repo.session.commit()
+
+            # Upload and local processing only share the file on disk, so run
+            # them concurrently. The document record is written once the upload
+            # succeeds; chunks are saved only after that.
+            upload_task = asyncio.create_task(
+                upload_file(file_path, public_id=f"workspaces/{workspace_id}/docs/{doc_id}")
+            )
+            tasks = [upload_task]
+            if process_embeddings:
+                tasks.append(asyncio.create_task(self._prepare_for_upload(workspace_id, file_path, upload_task)))
+
+            # Wait for both before touching the DB or removing the local file
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            upload_result = results[0]
+            if isinstance(upload_result, BaseException):
+                logger.warning("Cloudinary upload failed: %s", upload_result)
+                raise upload_result
+            logger.debug("Cloudinary upload result: %s", upload_result)
             
             # 2. Extract Title (lazy way: filename)
             # If processing, we might get a better title, but having a record is priority.
@@ -54,43 +159,57 @@ class KnowledgeService:
             #    import re
             #    secure_url = re.sub(r"/s--[^/]+--/", "/", secure_url)
 
-            document = Document(
-                id=doc_id,
-                workspace_id=workspace_id,
-                collection_id=collection_id,
-                title=title,
-                source_type="file",
-                source_url=secure_url,
-                file_path=None,
-                status="uploaded", # Initial status
-                version_number=1,
-                meta={
+            if existing:
+                document = existing
+                document.title = title
+                document.source_url = secure_url
+                document.status = "uploaded"
+                document.meta = {
+                    **(document.meta or {}),
                     "original_filename": real_filename,
                     "cloudinary_public_id": upload_result.get("public_id"),
-                },
-                language="en"
-            )
+                }
+                document.updated_at = datetime.utcnow()
+                await self.repo.session.commit()
+            else:
+                document = Document(
+                    id=doc_id,
+                    workspace_id=workspace_id,
+                    collection_id=collection_id,
+                    title=title,
+                    source_type="file",
+                    source_url=secure_url,
+                    file_path=None,
+                    status="uploaded", # Initial status
+                    version_number=1,
+                    meta={
+                        "original_filename": real_filename,
+                        "cloudinary_public_id": upload_result.get("public_id"),
+                    },
+                    language="en"
+                )
             
-            # Save Document Record
-            await self.repo.create_document(document)
+                # Save Document Record; a concurrent upload may have used the last slot
+                try:
+                    await self.quota.reserve(workspace_id, "documents")
+                except QuotaExceededError:
+                    try:
+                        delete_file(upload_result.get("public_id"))
+                    except Exception as e:
+                        logger.warning("Failed to delete from Cloudinary: %s", e)
+                    raise
+                await self.repo.create_document(document)
             
             # 3. Process Embeddings if requested
             if process_embeddings:
                 try:
-                    # Pipeline stuff
-                    result = await self.pipeline.process_document(file_path)
-                    
-                    # Update status and save tree
-                    document.status = "processed"
-                    # If title extraction improved:
-                    # document.title = result['title'] 
-                    
-                    # Save Chunks/Embeddings
-                    # Note: save_document_tree expects document to be passed, it might re-add it to session
-                    # ensure we attach chunks to this existing doc
-                    await self.repo.save_document_tree(document, result['chunks'])
+                    processed = results[1]
+                    if isinstance(processed, BaseException):
+                        raise processed
+                    # Swap in the new chunk set (embedded while uploading)
+                    await self._save_processed(document, *processed)
                 except Exception as process_error:
-                    print(f"Embedding generation failed: {process_error}")
+                    logger.warning("Embedding generation failed: %s", process_error)
                     # We don't fail the whole request, but leave status as 'uploaded' (or 'error'?)
                     document.status = "error_embedding"
                     await self.repo.session.commit()
@@ -110,72 +229,70 @@ class KnowledgeService:
             if os.path.exists(file_path):
                 os.remove(file_path)
             raise e
+        finally:
+            INGEST_IN_PROGRESS.dec()
+
+    @staticmethod
+    def _download_source(document: Document) -> tuple:
+        """Public download URL and cache key for a stored document."""
+        download_url = document.source_url
+        # ensure public
+        if "/s--" in download_url:
+            download_url = re.sub(r"/s--[^/]+--/", "/", download_url)
+        cache_key = (document.meta or {}).get("cloudinary_public_id") or str(document.id)
+        return download_url, cache_key
+
+    async def prefetch_documents(self, document_ids: List[uuid.UUID]) -> None:
+        """
+        Download the source files of several documents concurrently (bounded by
+        DOWNLOAD_CONCURRENCY) into the download cache, so processing them one by
+        one afterwards doesn't wait on the network. Failures are left for
+        process_existing_document to report.
+        """
+        if not document_ids:
+            return
+        stmt = select(Document).where(Document.id.in_(document_ids), Document.status != "processed")
+        result = await self.repo.session.execute(stmt)
+        sources = [self._download_source(doc) for doc in result.scalars().all() if doc.source_url]
+        errors = await download_cache.prefetch(sources)
+        for (url, key), error in zip(sources, errors):
+            if error:
+                logger.warning("Prefetch failed for %s: %s", key, error)
 
     async def process_existing_document(self, document_id: uuid.UUID):
         """
         Process a document that is already in DB/Cloudinary but needs embeddings.
         """
-        print(f"[DEBUG] Processing existing document: {document_id}")
+        logger.debug("Processing existing document: %s", document_id)
         # Fetch document
         stmt = select(Document).where(Document.id == document_id)
         result = await self.repo.session.execute(stmt)
         document = result.scalar_one_or_none()
         
         if not document or not document.source_url:
-             print(f"[ERROR] Document {document_id} not found or has no source URL")
+             logger.error("Document %s not found or has no source URL", document_id)
              raise ValueError("Document not found or has no source URL")
              
         if document.status == "processed":
-            print(f"[DEBUG] Document {document_id} already processed")
+            logger.debug("Document %s already processed", document_id)
             return document
 
-        # Download URL
-        download_url = document.source_url
-        print(f"[DEBUG] Downloading from {download_url}")
-        
-        # ensure public
-        import re
-        if "/s--" in download_url:
-            download_url = re.sub(r"/s--[^/]+--/", "/", download_url)
+        download_url, cache_key = self._download_source(document)
+        logger.debug("Downloading from %s", download_url)
 
-        # Download file to temp
-        import httpx
-        import tempfile
-        
-        suffix = ".pdf" # Assume PDF
-        tmp_path = None
+        INGEST_IN_PROGRESS.inc()
         try:
-            # Create temp file
-            # We close it immediately so we can write to it in chunks or via httpx
-            fd, tmp_path = tempfile.mkstemp(suffix=suffix)
-            os.close(fd)
-            
-            async with httpx.AsyncClient() as client:
-                async with client.stream('GET', download_url, follow_redirects=True) as response:
-                    if response.status_code != 200:
-                         raise ValueError(f"Failed to download document: {response.status_code} from {download_url}")
-                    
-                    with open(tmp_path, 'wb') as f:
-                        async for chunk in response.aiter_bytes():
-                            f.write(chunk)
-            
-            print(f"[DEBUG] Downloaded to {tmp_path}. Processing...")
-            
-            # Process in pipeline
-            result = await self.pipeline.process_document(tmp_path)
-            
-            # Save chunks
-            await self.repo.save_document_tree(document, result['chunks'])
-            
-            document.status = "processed"
-            # document.title = result['title'] # Optional update
-            await self.repo.session.commit()
-            print(f"[DEBUG] Document {document_id} processed successfully")
+            # Cached by public_id and revalidated with a conditional GET, so
+            # re-processing an unchanged document doesn't download it again
+            async with download_cache.open(download_url, key=cache_key) as local_path:
+                logger.debug("Downloaded to %s. Processing...", local_path)
+
+                # Process in pipeline and save chunks
+                await self._process_local_file(document, local_path)
+            logger.debug("Document %s processed successfully", document_id)
             
         except Exception as e:
-            print(f"[ERROR] Failed to process document {document_id}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to process document %s", document_id)
             document.status = "error_processing"
             # Try to commit the error status so we don't retry endlessly or leave it hanging
             try:
@@ -183,10 +300,8 @@ class KnowledgeService:
             except:
                 pass 
             raise ValueError(f"Processing failed: {str(e)}")
-            
         finally:
-            if tmp_path and os.path.exists(tmp_path):
-                os.remove(tmp_path)
+            INGEST_IN_PROGRESS.dec()
                 
         return document
 
@@ -203,6 +318,6 @@ class KnowledgeService:
             try:
                 delete_file(document.meta["cloudinary_public_id"])
             except Exception as e:
-                print(f"Failed to delete from Cloudinary: {e}")
+                logger.warning("Failed to delete from Cloudinary: %s", e)
                 
         return document
@@ -1,24 +1,152 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
 import google.generativeai as genai
 from app.core.config import settings
+from app.core.metrics import (
+    LLM_CIRCUIT_STATE, LLM_CONCURRENCY_LIMIT, LLM_IN_FLIGHT, LLM_QUEUE_WAIT_SECONDS, LLM_REQUESTS,
+)
+from app.core.resilience import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, OverloadedError
+from app.core.tracing import tracer
+
+# Shared across LLMService instances (one is created per chat turn)
+_global_limiter = AdaptiveLimiter(
+    initial=settings.LLM_CONCURRENCY,
+    min_limit=settings.LLM_MIN_CONCURRENCY,
+    max_limit=settings.LLM_MAX_CONCURRENCY,
+    target_latency=settings.LLM_TARGET_LATENCY_SECONDS,
+)
+_workspace_limiters: Dict[str, AdaptiveLimiter] = {}
+_breaker = CircuitBreaker(
+    failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.LLM_BREAKER_RESET_SECONDS,
+    half_open_max_calls=settings.LLM_BREAKER_HALF_OPEN_CALLS,
+)
+_CIRCUIT_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+def _workspace_limiter(workspace_id) -> AdaptiveLimiter:
+    key = str(workspace_id)
+    limiter = _workspace_limiters.get(key)
+    if limiter is None:
+        if len(_workspace_limiters) > 10000:
+            for idle in [k for k, l in _workspace_limiters.items() if not l.in_flight and not l.queued]:
+                del _workspace_limiters[idle]
+        limiter = AdaptiveLimiter(
+            initial=settings.LLM_WORKSPACE_MAX_CONCURRENCY,
+            min_limit=settings.LLM_WORKSPACE_MIN_CONCURRENCY,
+            max_limit=settings.LLM_WORKSPACE_MAX_CONCURRENCY,
+            target_latency=settings.LLM_TARGET_LATENCY_SECONDS,
+        )
+        _workspace_limiters[key] = limiter
+    return limiter
+
+
+def llm_available() -> bool:
+    """False while the circuit breaker is rejecting calls (callers can skip straight to a fallback)."""
+    return _breaker.allow()
+
+
+def _update_gauges():
+    LLM_CONCURRENCY_LIMIT.set(int(_global_limiter.limit))
+    LLM_IN_FLIGHT.set(_global_limiter.in_flight)
+    LLM_CIRCUIT_STATE.set(_CIRCUIT_STATE_VALUES[_breaker.state])
+
+
+def _reported_usage(response) -> Dict[str, int]:
+    """Token counts from the response's usage_metadata (empty if it has none)."""
+    metadata = getattr(response, "usage_metadata", None)
+    counts = {
+        "prompt_tokens": getattr(metadata, "prompt_token_count", 0),
+        "completion_tokens": getattr(metadata, "candidates_token_count", 0),
+    }
+    return {key: value for key, value in counts.items() if value}
+
 
 class LLMService:
     def __init__(self):
         api_key = settings.GOOGLE_API_KEY
         if not api_key:
             raise ValueError("GOOGLE_API_KEY is not set")
-            
+
         genai.configure(api_key=api_key)
         # print available models for debug if needed, but let's stick to a known working one "gemini-pro"
-        # If 'gemini-pro' failed, it might be an API key issue or region issue. 
+        # If 'gemini-pro' failed, it might be an API key issue or region issue.
         # But 'gemini-1.5-flash' is standard.
         # Let's try 'gemini-1.0-pro'
         # Available models: gemini-2.5-flash, gemini-2.5-pro, etc.
         self.model = genai.GenerativeModel('gemini-2.5-flash')
 
-    async def generate(self, prompt: str) -> str:
+    async def _call_model(self, prompt: str):
+        return await self.model.generate_content_async(prompt)
+
+    async def generate(self, prompt: str, workspace_id=None, usage: Optional[Dict[str, int]] = None) -> str:
+        """
+        Generate a completion, within the global and per-workspace concurrency
+        limits, LLM_TIMEOUT_SECONDS and the circuit breaker. If given, usage
+        receives the prompt_tokens and completion_tokens the model reported.
+
+        Raises CircuitOpenError, OverloadedError or asyncio.TimeoutError instead
+        of waiting on a degraded upstream; callers should fall back.
+        """
         try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
+            _breaker.before_call()
+        except CircuitOpenError:
+            LLM_REQUESTS.labels("circuit_open").inc()
+            raise
+
+        limiters = []
+        try:
+            queue_deadline = time.perf_counter() + settings.LLM_QUEUE_TIMEOUT_SECONDS
+            if workspace_id is not None:
+                limiter = _workspace_limiter(workspace_id)
+                LLM_QUEUE_WAIT_SECONDS.labels("workspace").observe(await limiter.acquire(settings.LLM_QUEUE_TIMEOUT_SECONDS))
+                limiters.append(limiter)
+            waited = await _global_limiter.acquire(max(0.0, queue_deadline - time.perf_counter()))
+            LLM_QUEUE_WAIT_SECONDS.labels("global").observe(waited)
+            limiters.append(_global_limiter)
+        except BaseException as e:
+            for limiter in limiters:
+                limiter.release()
+            _breaker.record_abandoned()
+            if isinstance(e, OverloadedError):
+                LLM_REQUESTS.labels("overloaded").inc()
+                print(f"[DEBUG] LLM overloaded: {e}")
+            raise
+        _update_gauges()
+
+        start = time.perf_counter()
+        latency, timed_out = None, False
+        try:
+            with tracer.start_as_current_span("llm.generate") as span:
+                if span.is_recording():
+                    span.set_attribute("gen_ai.system", "gemini")
+                    span.set_attribute("gen_ai.request.model", self.model.model_name)
+                    span.set_attribute("llm.prompt_chars", len(prompt))
+                response = await asyncio.wait_for(self._call_model(prompt), settings.LLM_TIMEOUT_SECONDS)
+            latency = time.perf_counter() - start
+            _breaker.record_success()
+            LLM_REQUESTS.labels("success").inc()
+        except asyncio.TimeoutError:
+            timed_out = True
+            _breaker.record_failure()
+            LLM_REQUESTS.labels("timeout").inc()
+            print(f"Gemini call timed out after {settings.LLM_TIMEOUT_SECONDS}s")
+            raise
+        except asyncio.CancelledError:
+            _breaker.record_abandoned()
+            raise
         except Exception as e:
+            _breaker.record_failure()
+            LLM_REQUESTS.labels("error").inc()
             print(f"Error generating content with Gemini: {e}")
             raise e
+        finally:
+            for limiter in limiters:
+                limiter.release(latency=latency, timed_out=timed_out)
+            _update_gauges()
+
+        if usage is not None:
+            usage.update(_reported_usage(response))
+        return response.text
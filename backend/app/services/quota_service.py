@@ -0,0 +1,103 @@
+"""
+Subscription tier quotas.
+
+Usage comes from the workspace_usage counters, which app.workers.cleanup
+reconciles against the source tables every QUOTA_RECONCILE_INTERVAL_SECONDS.
+Creating a member, agent or document reserves it with reserve(): one atomic
+conditional increment in the same transaction as the new row, so the counter
+and the rows change together and concurrent creates can't exceed the limit.
+Chat messages are the exception (consume_message()): they are counted in a
+short transaction of their own, so busy workspaces don't queue on their
+counter row for the length of a chat request. Deletions decrement in their own transaction (the repositories).
+check() is a cheap read-only pre-check, for work that should be skipped
+before anything is created (uploads, invitations).
+"""
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.ttl_cache import TTLCache
+from app.db.models.workspace import Workspace
+from app.db.repositories.usage_repository import UsageCounterRepository
+from app.db.session import AsyncSessionLocal
+
+# members counts the owner and pending invitations too
+TIER_LIMITS = {
+    "FREE": {"members": 2, "agents": 3, "documents": 25, "messages": 1000},
+    "PRO": {"members": 5, "agents": 10, "documents": 500, "messages": 25000},
+    "BUSINESS": {"members": 1000, "agents": 100, "documents": 10000, "messages": 500000},
+}
+
+_LABELS = {"members": "members", "agents": "agents", "documents": "documents", "messages": "messages this month"}
+
+_tier_cache = TTLCache("workspace_tier", settings.TIER_CACHE_SECONDS)
+
+
+class QuotaExceededError(ValueError):
+    """The workspace's subscription tier doesn't allow more of this."""
+
+    def __init__(self, metric: str, tier: str, limit: int):
+        self.metric, self.tier, self.limit = metric, tier, limit
+        super().__init__(
+            f"{tier.title()} plan limit reached ({limit} {_LABELS.get(metric, metric)}). Upgrade your plan for more."
+        )
+
+
+def tier_limit(tier: str, metric: str) -> int:
+    return TIER_LIMITS.get(tier, TIER_LIMITS["FREE"])[metric]
+
+
+class QuotaService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.counters = UsageCounterRepository(session)
+
+    async def get_tier(self, workspace_id: UUID) -> str:
+        tier = _tier_cache.get(workspace_id)
+        if tier is None:
+            result = await self.session.execute(select(Workspace.subscription_tier).where(Workspace.id == workspace_id))
+            tier = result.scalar_one_or_none() or "FREE"
+            _tier_cache.set(workspace_id, tier)
+        return tier
+
+    async def check(self, workspace_id: UUID, metric: str, adding: int = 1, tier: Optional[str] = None, extra: int = 0):
+        """
+        Raise QuotaExceededError unless the workspace can take `adding` more of
+        metric. extra is usage not held in the counter (e.g. pending invitations).
+        """
+        if not settings.QUOTAS_ENABLED:
+            return
+        tier = tier or await self.get_tier(workspace_id)
+        limit = tier_limit(tier, metric)
+        if await self.counters.get(workspace_id, metric) + extra + adding > limit:
+            raise QuotaExceededError(metric, tier, limit)
+
+    async def reserve(self, workspace_id: UUID, metric: str, tier: Optional[str] = None, uncounted: int = 0):
+        """
+        Count one more of metric in the caller's transaction (commit it with the
+        new row), or raise QuotaExceededError if the tier's limit is reached.
+        uncounted is usage the counter doesn't hold (the owner, for members).
+        """
+        if not settings.QUOTAS_ENABLED:
+            await self.counters.increment(workspace_id, metric, commit=False)
+            return
+        tier = tier or await self.get_tier(workspace_id)
+        limit = tier_limit(tier, metric)
+        if not await self.counters.increment_if_below(workspace_id, metric, limit - uncounted):
+            raise QuotaExceededError(metric, tier, limit)
+
+    async def consume_message(self, workspace_id: UUID):
+        """
+        Count one chat message against the monthly quota, or raise
+        QuotaExceededError. Commits right away in its own session: in the
+        caller's transaction the increment would lock the workspace's counter
+        row until the chat request commits. A message that is then not saved
+        stays counted until the next reconciliation.
+        """
+        tier = await self.get_tier(workspace_id)
+        async with AsyncSessionLocal() as session:
+            await QuotaService(session).reserve(workspace_id, "messages", tier=tier)
+            await session.commit()
@@ -1,18 +1,49 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from uuid import UUID
 from datetime import datetime
 
 from app.db.models.workspace import Workspace
 from app.db.models.workspace_member import WorkspaceMember
 from app.db.models.user import User
-from app.db.repositories.workspace_repository import WorkspaceRepository, WorkspaceMemberRepository
+from app.db.repositories.workspace_repository import MEMBER_SORT_KEYS, WorkspaceRepository, WorkspaceMemberRepository
 from app.db.repositories.auth_repository import UserRepository
 from app.db.repositories.workspace_invitation_repository import WorkspaceInvitationRepository
 from app.db.models.workspace_invitation import WorkspaceInvitation
+import base64
+import json
 import secrets
 from datetime import timedelta
 
+from app.core.config import settings as app_settings
+from app.core.ttl_cache import TTLCache
 from app.services.email_service import EmailService
+from app.services.quota_service import QuotaService
+
+
+def _encode_member_cursor(sort: str, order: str, value, member_id: UUID) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, order, value, str(member_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_member_cursor(cursor: str, sort: str, order: str):
+    """(sort value, member id) from a cursor issued for the same sort and order."""
+    try:
+        cursor_sort, cursor_order, value, member_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "joined_at":
+            value = datetime.fromisoformat(value)
+        member_id = UUID(member_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, member_id
+
+
+# Dashboard counts may be a few seconds stale
+_stats_cache = TTLCache("workspace_stats", app_settings.WORKSPACE_STATS_CACHE_SECONDS)
+_EMPTY_STATS = {"total_agents": 0, "total_documents": 0, "total_conversations": 0, "total_messages": 0}
 
 class WorkspaceService:
     def __init__(
@@ -21,13 +52,15 @@ class WorkspaceService:
         member_repo: WorkspaceMemberRepository,
         user_repo: UserRepository,
         invitation_repo: WorkspaceInvitationRepository,
-        email_service: EmailService
+        email_service: Optional[EmailService],  # None for read-only (replica) instances
+        quota_service: Optional[QuotaService] = None
     ):
         self.workspace_repo = workspace_repo
         self.member_repo = member_repo
         self.user_repo = user_repo
         self.invitation_repo = invitation_repo
         self.email_service = email_service
+        self.quota = quota_service or QuotaService(workspace_repo.db)
 
     async def create_workspace(
         self,
@@ -48,7 +81,8 @@ class WorkspaceService:
             subscription_tier="FREE"
         )
         
-        created_workspace = await self.workspace_repo.create(workspace)
+        # Committed together with the notification email below
+        created_workspace = await self.workspace_repo.create(workspace, commit=False)
         
         # Send email notification
         owner = await self.user_repo.get_by_id(user_id)
@@ -62,25 +96,43 @@ class WorkspaceService:
                 created_at=created_workspace.created_at.strftime("%Y-%m-%d %H:%M"),
                 dashboard_url=dashboard_url
             )
+        await self.workspace_repo.db.commit()
+        await self.workspace_repo.db.refresh(created_workspace)
             
         return created_workspace
 
+    async def _get_stats(self, workspace_ids: List[UUID]) -> Dict[UUID, dict]:
+        """Workspace stats, from the short-lived cache where possible, else one batched query."""
+        stats = {}
+        missing = []
+        for workspace_id in workspace_ids:
+            cached = _stats_cache.get(workspace_id)
+            if cached is not None:
+                stats[workspace_id] = cached
+            else:
+                missing.append(workspace_id)
+        
+        if missing:
+            fetched = await self.workspace_repo.get_workspaces_stats(missing)
+            for workspace_id in missing:
+                workspace_stats = fetched.get(workspace_id) or dict(_EMPTY_STATS)
+                _stats_cache.set(workspace_id, workspace_stats)
+                stats[workspace_id] = workspace_stats
+        return stats
+
     async def get_user_workspaces(self, user_id: UUID) -> List[dict]:
-        """Get all workspaces for a user with stats and role."""
-        workspaces = await self.workspace_repo.get_user_workspaces(user_id)
+        """Get all workspaces for a user with stats and role (two queries, whatever the count)."""
+        rows = await self.workspace_repo.get_user_workspaces_with_roles(user_id)
+        stats = await self._get_stats([workspace.id for workspace, _ in rows])
         
-        result = []
-        for workspace in workspaces:
-            stats = await self.workspace_repo.get_workspace_stats(workspace.id)
-            role = await self.workspace_repo.get_user_role(workspace.id, user_id)
-            
-            result.append({
+        return [
+            {
                 "workspace": workspace,
-                "stats": stats,
+                "stats": stats[workspace.id],
                 "role": role
-            })
-        
-        return result
+            }
+            for workspace, role in rows
+        ]
 
     async def get_workspace(self, workspace_id: UUID, user_id: UUID) -> dict:
         """Get workspace details if user has access."""
@@ -93,7 +145,7 @@ class WorkspaceService:
         if not has_access:
             raise PermissionError("You don't have access to this workspace")
         
-        stats = await self.workspace_repo.get_workspace_stats(workspace_id)
+        stats = (await self._get_stats([workspace_id]))[workspace_id]
         role = await self.workspace_repo.get_user_role(workspace_id, user_id)
         
         return {
@@ -144,6 +196,7 @@ class WorkspaceService:
         if workspace.owner_id != user_id:
             raise PermissionError("Only the owner can delete the workspace")
         
+        _stats_cache.invalidate(workspace_id)
         return await self.workspace_repo.delete(workspace_id)
 
     async def add_member(
@@ -182,25 +235,47 @@ class WorkspaceService:
             user_id=user.id,
             role=role
         )
-        
+
+        # The owner isn't in the members counter
+        await self.quota.reserve(workspace_id, "members", tier=workspace.subscription_tier, uncounted=1)
         return await self.member_repo.add_member(member)
 
-    async def get_members(self, workspace_id: UUID, user_id: UUID) -> List[dict]:
-        """Get all workspace members with user details."""
-        has_access = await self.workspace_repo.user_has_access(workspace_id, user_id)
-        if not has_access:
+    async def get_members(
+        self,
+        workspace_id: UUID,
+        user_id: UUID,
+        sort: str = "joined_at",
+        order: str = "desc",
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """
+        Get a page of workspace members with user details, the owner first on
+        the first page. Returns members, total and next_cursor (None on the last page).
+        """
+        if sort not in MEMBER_SORT_KEYS:
+            raise ValueError(f"Invalid sort. Must be one of: {', '.join(MEMBER_SORT_KEYS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("Invalid order. Must be 'asc' or 'desc'")
+        after = _decode_member_cursor(cursor, sort, order) if cursor else None
+        
+        row = await self.workspace_repo.get_with_owner(workspace_id)
+        if not row:
+            raise PermissionError("You don't have access to this workspace")
+        workspace, owner = row
+        if not await self.workspace_repo.user_has_access(workspace_id, user_id):
             raise PermissionError("You don't have access to this workspace")
         
-        members = await self.member_repo.get_members(workspace_id)
-        
-        # Get workspace to include owner
-        workspace = await self.workspace_repo.get_by_id(workspace_id)
-        owner = await self.user_repo.get_by_id(workspace.owner_id)
+        rows = await self.member_repo.get_members_page(
+            workspace_id, sort=sort, descending=order == "desc", limit=limit + 1, after=after
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         result = []
         
         # Add owner
-        if owner:
+        if owner and after is None:
             result.append({
                 "id": None,
                 "user_id": owner.id,
@@ -212,19 +287,25 @@ class WorkspaceService:
             })
         
         # Add members
-        for member in members:
-            user = await self.user_repo.get_by_id(member.user_id)
+        for member, email, full_name in rows:
             result.append({
                 "id": member.id,
                 "user_id": member.user_id,
                 "workspace_id": member.workspace_id,
                 "role": member.role,
                 "joined_at": member.joined_at,
-                "user_email": user.email if user else None,
-                "user_name": user.full_name if user else None
+                "user_email": email,
+                "user_name": full_name
             })
         
-        return result
+        next_cursor = None
+        if has_more:
+            member, email, full_name = rows[-1]
+            sort_value = {"joined_at": member.joined_at, "name": full_name or "", "email": email or ""}[sort]
+            next_cursor = _encode_member_cursor(sort, order, sort_value, member.id)
+        
+        total = await self.member_repo.count_members(workspace_id) + (1 if owner else 0)
+        return {"members": result, "total": total, "next_cursor": next_cursor}
 
     async def remove_member(
         self,
@@ -272,34 +353,10 @@ class WorkspaceService:
         if existing_invite:
             raise ValueError("Invitation already sent to this email")
 
-        # Check Plan Limits
-        # Count current members (including owner)
-        members = await self.member_repo.get_members(workspace_id)
-        current_count = len(members) + 1 # +1 for owner (if not in members table, checking get_members logic)
-        
-        # Verify get_members logic: It fetches WorkspaceMember rows. Owner might not be in WorkspaceMember depending on implementation.
-        # Looking at create_workspace, owner is just set on Workspace.owner_id, not added to WorkspaceMember.
-        # So yes, +1 is correct.
-        
-        # Count pending invitations
-        pending_invites = await self.invitation_repo.get_pending_by_workspace(workspace_id)
-        pending_count = len(pending_invites)
-        
-        total_users = current_count + pending_count + 1 # +1 for the new one being added
-        
-        limit = 2 # Default/Free (Owner + 1 member)
-        if workspace.subscription_tier == "PRO":
-            limit = 5 # Owner + 4 members
-        elif workspace.subscription_tier == "BUSINESS":
-            limit = 1000 # Unlimited effectively
-            
-        if total_users > limit:
-            if workspace.subscription_tier == "FREE":
-                raise ValueError("Free tier limit reached (1 member). Upgrade to Pro to invite up to 5 members.")
-            elif workspace.subscription_tier == "PRO":
-                raise ValueError("Pro tier limit reached (5 members). Upgrade to Business for unlimited members.")
-            else:
-                 raise ValueError(f"Workspace limit reached ({limit} members).")
+        # Check Plan Limits: the owner (not in the members table), members,
+        # pending invitations and the new invite all count
+        pending_count = await self.invitation_repo.count_pending(workspace_id)
+        await self.quota.check(workspace_id, "members", tier=workspace.subscription_tier, extra=1 + pending_count)
 
         # Create Invitation
         token = secrets.token_urlsafe(32)
@@ -313,7 +370,8 @@ class WorkspaceService:
             expires_at=datetime.utcnow() + timedelta(days=7)
         )
         
-        await self.invitation_repo.create(invitation)
+        # Committed together with the invitation email below
+        await self.invitation_repo.create(invitation, commit=False)
         
         # Send Email
         inviter = await self.user_repo.get_by_id(inviter_id)
@@ -326,6 +384,8 @@ class WorkspaceService:
             workspace_name=workspace.name,
             invite_url=invite_url
         )
+        await self.invitation_repo.db.commit()
+        await self.invitation_repo.db.refresh(invitation)
         
         return invitation
 
@@ -379,9 +439,9 @@ class WorkspaceService:
             await self.invitation_repo.update(invitation)
             return existing
 
-        # Double check limits (race condition)
-        # ... logic similar to invite ...
-        
+        # Limits were checked at invite time; enforce them again atomically (the owner isn't counted)
+        await self.quota.reserve(invitation.workspace_id, "members", uncounted=1)
+
         # Create Member
         member = WorkspaceMember(
             workspace_id=invitation.workspace_id,
@@ -0,0 +1,49 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.schemas.agent import ChatRequest
+from app.api.v1 import agents
+from app.core.resilience import CircuitOpenError, OverloadedError
+
+AGENT = SimpleNamespace(id=uuid.uuid4(), workspace_id=uuid.uuid4(), configuration=None,
+                        fallback_message="Our assistant is busy, please try again shortly.")
+
+
+class StandInAgentService:
+    async def get_agent(self, agent_id):
+        return AGENT
+
+
+def chat(monkeypatch, error, available=True):
+    calls = []
+
+    class StandInRAG:
+        def __init__(self, session):
+            pass
+
+        async def process_message(self, **kwargs):
+            calls.append(kwargs)
+            raise error
+
+    monkeypatch.setattr(agents, "RAGGraph", StandInRAG)
+    monkeypatch.setattr(agents, "llm_available", lambda: available)
+    response = asyncio.run(agents.chat_agent(
+        AGENT.id, ChatRequest(message="How long do refunds take?", agent_id=AGENT.id),
+        current_user=None, service=StandInAgentService(), db_session=None,
+    ))
+    return response, calls
+
+
+@pytest.mark.parametrize("error", [OverloadedError("queue full"), asyncio.TimeoutError(), CircuitOpenError("open")])
+def test_degraded_llm_returns_the_fallback_message(monkeypatch, error):
+    response, _ = chat(monkeypatch, error)
+    assert response == {"response": AGENT.fallback_message}
+
+
+def test_open_circuit_skips_retrieval(monkeypatch):
+    response, calls = chat(monkeypatch, RuntimeError("unreachable"), available=False)
+    assert response == {"response": AGENT.fallback_message}
+    assert not calls
@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+
+from app.core.config import settings
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/health/db"])
+def test_operational_endpoints_are_hidden_without_a_token(monkeypatch, path):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/health/db"])
+def test_operational_endpoints_require_the_token(monkeypatch, path):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+
+def test_metrics_aggregate_workers_in_multiprocess_mode(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    # Samples written by another worker process
+    other_worker = MmapedDict(str(tmp_path / "counter_12345.db"))
+    key = mmap_key("insydr_email_smtp_connections", "insydr_email_smtp_connections_total", [], [], "")
+    other_worker.write_value(key, 3.0, 0)
+    other_worker.close()
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+    assert response.status_code == 200
+    assert "insydr_email_smtp_connections_total 3.0" in response.text
+    assert "insydr_db_pool_checked_out" in response.text  # This worker's pools
@@ -0,0 +1,57 @@
+from app.rag.chunker import chunk_pages, chunk_text
+from app.rag.tokenizer import count_tokens
+
+PAGES = [
+    "1. Refunds\n\n"
+    "Refunds are issued within 14 days of purchase. Contact support with your order number. "
+    "Refunds go back to the original payment method.\n\n"
+    "2. Shipping\n\n"
+    "Orders ship within two business days. Tracking numbers are sent by email.",
+    "Shipping to remote areas can take up to ten days. Customs fees are paid by the customer.\n\n"
+    "3. Accounts\n\n"
+    "You can delete your account at any time from the settings page.",
+]
+
+
+def words(text: str) -> str:
+    return " ".join(text.split())
+
+
+def test_chunks_respect_the_token_limit():
+    long_paragraph = " ".join(f"Sentence number {i} describes one more policy detail." for i in range(80))
+    chunks = chunk_pages([long_paragraph], max_tokens=60, overlap_tokens=0)
+
+    assert len(chunks) > 1
+    assert all(c["token_count"] <= 60 for c in chunks)
+    assert all(count_tokens(c["content"]) <= 60 for c in chunks)
+
+
+def test_headings_start_chunks_and_label_them():
+    chunks = chunk_pages(PAGES, max_tokens=200, overlap_tokens=0)
+
+    assert [c["meta"].get("section") for c in chunks] == ["1. Refunds", "2. Shipping", "2. Shipping", "3. Accounts"]
+    assert chunks[0]["content"].startswith("1. Refunds\nRefunds are issued")
+
+
+def test_chunks_stay_on_one_page_and_point_at_their_source():
+    document = "".join(page + "\n" for page in PAGES)
+    chunks = chunk_pages(PAGES, max_tokens=200, overlap_tokens=0)
+
+    for chunk in chunks:
+        meta = chunk["meta"]
+        assert meta["page_start"] == meta["page_end"]
+        assert words(document[meta["char_start"]:meta["char_end"]]) == words(chunk["content"])
+    assert [c["meta"]["page_start"] for c in chunks] == [1, 1, 2, 2]
+
+
+def test_split_paragraphs_overlap_by_whole_sentences():
+    text = " ".join(f"Policy {i} applies to every order placed online." for i in range(30))
+    chunks = chunk_text(text, max_tokens=40, overlap_tokens=12)
+
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        assert current.startswith(last_sentence.rstrip(".")), (previous, current)
+
+
+def test_empty_pages_give_no_chunks():
+    assert chunk_pages(["", "   \n\n  "]) == []
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.services import download_cache as download_cache_module
+from app.services.download_cache import DownloadCache
+
+
+class StandInResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code, self.body, self.headers = status_code, body, headers or {}
+
+    async def aiter_bytes(self):
+        for start in range(0, len(self.body), 4):
+            yield self.body[start:start + 4]
+
+
+class StandInServer:
+    """Serves files with ETags and answers matching If-None-Match with 304."""
+
+    def __init__(self, files):
+        self.files = files
+        self.downloads = []
+
+    @asynccontextmanager
+    async def stream(self, method, url, headers=None):
+        body = self.files[url]
+        etag = hashlib.md5(body).hexdigest()
+        if (headers or {}).get("If-None-Match") == etag:
+            yield StandInResponse(304)
+        else:
+            self.downloads.append(url)
+            yield StandInResponse(200, body, {"etag": etag})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = StandInServer({"https://files/a": b"aaaaaaaaaa", "https://files/b": b"bbbbbbbbbb", "https://files/c": b"cccccccccc"})
+    monkeypatch.setattr(download_cache_module, "get_http_client", lambda: server)
+    return server
+
+
+def read(cache, url):
+    async def run():
+        async with cache.open(url) as path:
+            with open(path, "rb") as f:
+                return f.read()
+    return asyncio.run(run())
+
+
+def test_workers_share_the_cache_across_restarts(server, tmp_path):
+    first_worker = DownloadCache(str(tmp_path), max_bytes=1000)
+    assert read(first_worker, "https://files/a") == b"aaaaaaaaaa"
+
+    restarted_worker = DownloadCache(str(tmp_path), max_bytes=1000)
+    assert read(restarted_worker, "https://files/a") == b"aaaaaaaaaa"
+
+    assert server.downloads == ["https://files/a"]
+
+
+def test_eviction_skips_files_open_in_another_worker(server, tmp_path):
+    holder = DownloadCache(str(tmp_path), max_bytes=20)
+    other = DownloadCache(str(tmp_path), max_bytes=20)
+
+    async def run():
+        async with holder.open("https://files/a") as held_path:
+            async with other.open("https://files/b"):
+                pass
+            async with other.open("https://files/c"):
+                pass
+            with open(held_path, "rb") as f:
+                return f.read()
+
+    assert asyncio.run(run()) == b"aaaaaaaaaa"
+    # b was the least recently used file that nobody had open
+    assert set(other._read_index()) == {"https://files/a", "https://files/c"}
+    assert len(list(tmp_path.glob("*.bin"))) == 2
+
+
+def test_failed_download_leaves_no_partial_file(server, tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=1000)
+
+    async def failing_chunks():
+        yield b"aaaa"
+        raise ConnectionError("connection reset")
+
+    @asynccontextmanager
+    async def stream(method, url, headers=None):
+        response = StandInResponse(200)
+        response.aiter_bytes = failing_chunks
+        yield response
+
+    server.stream = stream
+    with pytest.raises(ConnectionError):
+        read(cache, "https://files/a")
+    assert not list(tmp_path.glob("*.part")) and not list(tmp_path.glob("*.bin"))
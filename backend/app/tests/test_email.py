@@ -0,0 +1,246 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.email_outbox import EmailOutbox
+from app.services.email_service import EmailService
+from app.workers import email_outbox
+from app.workers.email_outbox import EmailOutboxSender, SmtpTransport
+
+
+class SmtpStandIn:
+    """Local SMTP server. rcpt_replies maps a recipient to the reply its RCPT gets (default 250)."""
+
+    def __init__(self):
+        self.rcpt_replies = {}
+        self.connections = 0
+        self.messages = []
+        self.server = None
+        self._writers = set()
+
+    async def start(self):
+        """Listen on a free port and point the mail settings at it."""
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        settings.MAIL_PORT = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop_connections()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop_connections(self):
+        for writer in list(self._writers):
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+
+        def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+
+        try:
+            reply("220 stand-in ESMTP")
+            while line := await reader.readline():
+                command = line.decode().strip()
+                verb = command.upper()
+                if verb.startswith(("EHLO", "HELO")):
+                    reply("250 stand-in")
+                elif verb.startswith("RCPT"):
+                    recipient = command.split(":", 1)[1].strip(" <>")
+                    reply(self.rcpt_replies.get(recipient, "250 ok"))
+                elif verb == "DATA":
+                    reply("354 end with .")
+                    await writer.drain()
+                    data = []
+                    while (chunk := await reader.readline()) not in (b".\r\n", b""):
+                        data.append(chunk)
+                    self.messages.append(b"".join(data))
+                    reply("250 queued")
+                elif verb == "QUIT":
+                    reply("221 bye")
+                    await writer.drain()
+                    return
+                else:  # MAIL, RSET, NOOP
+                    reply("250 ok")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+class StandInResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class StandInSession:
+    """Serves the due PENDING rows of an in-memory outbox to process_batch."""
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        now = datetime.utcnow()
+        due = [e for e in self.outbox if e.status == "PENDING" and e.next_attempt_at <= now]
+        return StandInResult(due[:settings.EMAIL_OUTBOX_BATCH_SIZE])
+
+    async def commit(self):
+        pass
+
+
+def queued(to_email: str) -> EmailOutbox:
+    return EmailOutbox(
+        to_email=to_email, subject="Verify your Insydr Account", template_name="verification.html",
+        template_body={"name": "Test", "otp_code": "123456", "expiry_minutes": 10},
+        status="PENDING", attempts=0, next_attempt_at=datetime.utcnow(),
+    )
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "MAIL_PORT", settings.MAIL_PORT)  # Restored after the test
+    monkeypatch.setattr(settings, "MAIL_STARTTLS", False)
+    monkeypatch.setattr(settings, "MAIL_SSL_TLS", False)
+    monkeypatch.setattr(settings, "USE_CREDENTIALS", False)
+    return SmtpStandIn()
+
+
+def deliver(smtp, outbox, rounds):
+    """Start the stand-in, then for each round call it and process one batch."""
+    async def run():
+        await smtp.start()
+        sender = EmailOutboxSender(lambda: StandInSession(outbox))
+        try:
+            for before in rounds:
+                before()
+                await sender.process_batch()
+        finally:
+            await sender.transport.close()
+            await smtp.stop()
+    asyncio.run(run())
+
+
+def make_due(email: EmailOutbox):
+    email.next_attempt_at = datetime.utcnow()
+
+
+def test_temporary_failure_is_retried_with_backoff(smtp, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 3)
+    email = queued("busy@example.com")
+    smtp.rcpt_replies["busy@example.com"] = "451 try again later"
+    history = []
+
+    def record():
+        if email.attempts:
+            history.append((email.status, email.attempts))
+            make_due(email)
+
+    deliver(smtp, [email], [record, record, record])
+    history.append((email.status, email.attempts))
+
+    assert history == [("PENDING", 1), ("PENDING", 2), ("FAILED", 3)]
+    assert "451" in email.last_error
+    assert not smtp.messages
+
+
+def test_backoff_doubles_up_to_the_maximum(smtp, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_RETRY_MAX_SECONDS", 100.0)
+    email = queued("busy@example.com")
+    smtp.rcpt_replies["busy@example.com"] = "451 try again later"
+    delays = []
+
+    def record():
+        if email.attempts:
+            delays.append((email.next_attempt_at - datetime.utcnow()).total_seconds())
+            make_due(email)
+
+    deliver(smtp, [email], [record, record, record, record])
+    delays.append((email.next_attempt_at - datetime.utcnow()).total_seconds())
+
+    assert [round(d, -1) for d in delays] == [30, 60, 100, 100]
+
+
+def test_permanent_rejection_is_not_retried(smtp):
+    rejected, accepted = queued("nobody@example.com"), queued("someone@example.com")
+    smtp.rcpt_replies["nobody@example.com"] = "550 no such user"
+
+    deliver(smtp, [rejected, accepted], [lambda: None])
+
+    assert (rejected.status, rejected.attempts) == ("FAILED", 1)
+    assert "550" in rejected.last_error
+    assert accepted.status == "SENT"
+    assert len(smtp.messages) == 1
+
+
+def test_reconnects_after_dropped_connection(smtp):
+    first, second = queued("first@example.com"), queued("second@example.com")
+    outbox = [first]
+
+    def drop_and_queue():
+        smtp.drop_connections()
+        outbox.append(second)
+
+    deliver(smtp, outbox, [lambda: None, drop_and_queue])
+
+    assert first.status == "SENT" and second.status == "SENT"
+    assert second.attempts == 1
+    assert len(smtp.messages) == 2
+    assert smtp.connections == 2
+
+
+def test_transport_reuses_one_connection(smtp):
+    async def run():
+        await smtp.start()
+        transport = SmtpTransport()
+        try:
+            for i in range(5):
+                await transport.send(email_outbox.build_message(f"user{i}@example.com", "Hi", "welcome.html", {"name": "Test"}))
+        finally:
+            await transport.close()
+            await smtp.stop()
+
+    asyncio.run(run())
+    assert len(smtp.messages) == 5
+    assert smtp.connections == 1
+
+
+def test_send_email_queues_in_the_callers_transaction(monkeypatch):
+    class Sender:
+        wakeup = asyncio.Event()
+
+    monkeypatch.setattr(email_outbox, "_sender", Sender)
+
+    async def run():
+        session = AsyncSession()
+        await EmailService(session).send_welcome_email("new@example.com", "New User")
+        pending = [obj for obj in session.new if isinstance(obj, EmailOutbox)]
+        woken_before_commit = Sender.wakeup.is_set()
+        session.expunge_all()  # No database here; commit the (now empty) transaction
+        await session.commit()
+        return pending, woken_before_commit
+
+    pending, woken_before_commit = asyncio.run(run())
+
+    assert [e.to_email for e in pending] == ["new@example.com"]
+    assert not woken_before_commit
+    assert Sender.wakeup.is_set()
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+import pytest
+
+import app.services.cloudinary_service as cloudinary_service
+from app.services.knowledge_service import KnowledgeService
+
+PAGES = [
+    "Refund policy\n\nRefunds are issued within 14 days of purchase. Contact support with your order number.",
+    "Shipping\n\nOrders ship within two business days. Tracking numbers are sent by email.",
+]
+
+
+class StandInSession:
+    """Tracks whether a transaction is open (a pooled connection checked out)."""
+
+    def __init__(self):
+        self.in_transaction = False
+
+    async def commit(self):
+        self.in_transaction = False
+
+    async def rollback(self):
+        self.in_transaction = False
+
+
+class StandInRepository:
+    def __init__(self):
+        self.session = StandInSession()
+        self.documents = {}
+        self.saved_chunks = {}
+
+    async def get_document(self, document_id):
+        self.session.in_transaction = True
+        return self.documents.get(document_id)
+
+    async def create_document(self, document):
+        self.documents[document.id] = document
+        return document
+
+    async def get_embeddings_by_hashes(self, workspace_id, content_hashes):
+        self.session.in_transaction = True
+        return {}
+
+    async def save_document_tree(self, document, chunks_data, version_content=None, version_meta=None):
+        self.saved_chunks[document.id] = chunks_data
+        return document
+
+
+class StandInQuota:
+    def __init__(self, session):
+        self.session = session
+
+    async def check(self, workspace_id, metric, **kwargs):
+        self.session.in_transaction = True
+
+    async def reserve(self, workspace_id, metric, **kwargs):
+        self.session.in_transaction = True
+
+
+class StandInEmbeddings:
+    def __init__(self, session, seconds: float, fail: bool = False):
+        self.session, self.seconds, self.fail = session, seconds, fail
+        self.calls = []  # (start, end, transaction open)
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        time.sleep(self.seconds)
+        self.calls.append((start, time.perf_counter(), self.session.in_transaction))
+        if self.fail:
+            raise RuntimeError("embedding API unavailable")
+        return [[0.0] * 384 for _ in texts]
+
+
+class StandInUpload:
+    def __init__(self, session, seconds: float, fail: bool = False):
+        self.session, self.seconds, self.fail = session, seconds, fail
+        self.calls = []
+
+    async def __call__(self, file_path, public_id=None):
+        start = time.perf_counter()
+        in_transaction = self.session.in_transaction
+        await asyncio.sleep(self.seconds)
+        self.calls.append((start, time.perf_counter(), in_transaction))
+        if self.fail:
+            raise RuntimeError("upload failed")
+        return {"public_id": public_id, "secure_url": f"https://example.invalid/{public_id}"}
+
+
+@pytest.fixture
+def source_file():
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    yield path
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def make_service(monkeypatch, upload_seconds=0.3, upload_fail=False, embed_seconds=0.3, embed_fail=False):
+    repo = StandInRepository()
+    service = KnowledgeService(None, quota=StandInQuota(repo.session))
+    service.repo = repo
+    service.pipeline._extract_pages = lambda file_path: PAGES
+    service.pipeline.embedding_service = StandInEmbeddings(repo.session, embed_seconds, embed_fail)
+    upload = StandInUpload(repo.session, upload_seconds, upload_fail)
+    monkeypatch.setattr(cloudinary_service, "upload_file", upload)
+    monkeypatch.setattr(cloudinary_service, "delete_file", lambda public_id: None)
+    return service, upload
+
+
+def ingest(service, path):
+    return asyncio.run(service.ingest_file(uuid.uuid4(), uuid.uuid4(), path, process_embeddings=True))
+
+
+def test_upload_overlaps_embedding(monkeypatch, source_file):
+    service, upload = make_service(monkeypatch)
+    embeddings = service.pipeline.embedding_service
+
+    start = time.perf_counter()
+    document = ingest(service, source_file)
+    elapsed = time.perf_counter() - start
+
+    (upload_start, upload_end, _), = upload.calls
+    embed_start = embeddings.calls[0][0]
+    assert embed_start < upload_end
+    assert elapsed < upload.seconds + embeddings.seconds * len(embeddings.calls) * 0.8
+    assert document.status == "processed"
+    assert service.repo.saved_chunks[document.id]
+    assert not os.path.exists(source_file)
+
+
+def test_no_transaction_open_during_upload_or_embedding(monkeypatch, source_file):
+    service, upload = make_service(monkeypatch, upload_seconds=0.05, embed_seconds=0.05)
+    ingest(service, source_file)
+
+    assert not any(in_transaction for _, _, in_transaction in upload.calls)
+    assert not any(in_transaction for _, _, in_transaction in service.pipeline.embedding_service.calls)
+
+
+def test_failed_upload_leaves_no_document(monkeypatch, source_file):
+    service, _ = make_service(monkeypatch, upload_seconds=0.05, upload_fail=True, embed_seconds=0.05)
+
+    with pytest.raises(RuntimeError, match="upload failed"):
+        ingest(service, source_file)
+    assert not service.repo.documents
+    assert not service.repo.saved_chunks
+    assert not os.path.exists(source_file)
+
+
+def test_failed_embedding_marks_document(monkeypatch, source_file):
+    service, _ = make_service(monkeypatch, upload_seconds=0.05, embed_seconds=0.05, embed_fail=True)
+
+    with pytest.raises(RuntimeError, match="embedding API unavailable"):
+        ingest(service, source_file)
+    assert [d.status for d in service.repo.documents.values()] == ["error_embedding"]
+    assert not service.repo.saved_chunks
+    assert not os.path.exists(source_file)
+
+
+def test_cancelled_upload_skips_embedding(monkeypatch, source_file):
+    service, _ = make_service(monkeypatch, embed_seconds=0.05)
+
+    async def run():
+        upload_task = asyncio.create_task(asyncio.sleep(10))
+        await asyncio.sleep(0)
+        upload_task.cancel()
+        await asyncio.gather(upload_task, return_exceptions=True)
+        return await service._prepare_for_upload(uuid.uuid4(), source_file, upload_task)
+
+    with pytest.raises(ValueError, match="Upload failed"):
+        asyncio.run(run())
+    assert not service.pipeline.embedding_service.calls
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+
+from app.security import permissions
+from app.security.permissions import SESSION_KEY, invalidate_workspace_access, resolve_access
+
+
+class StandInResult:
+    def __init__(self, row):
+        self.row = row
+
+    def first(self):
+        return self.row
+
+
+class StandInSession:
+    """Answers the access query with (owner_id, member role) and records the statements."""
+
+    def __init__(self, row, info=None):
+        self.row = row
+        self.info = info if info is not None else {}
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return StandInResult(self.row)
+
+
+def test_access_is_resolved_on_the_primary():
+    owner, user, workspace = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    db = StandInSession((owner, "ADMIN"))
+
+    access = asyncio.run(resolve_access(db, workspace, user))
+
+    assert access.exists and access.role == "ADMIN" and access.is_admin
+    (stmt,) = db.statements
+    assert stmt.get_execution_options().get("use_primary") is True
+
+
+def test_sessions_of_a_request_share_resolved_access():
+    owner, user, workspace = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    request_memo = {}
+    primary = StandInSession((owner, "MEMBER"), info={SESSION_KEY: request_memo})
+    replica = StandInSession((owner, "MEMBER"), info={SESSION_KEY: request_memo})
+
+    first = asyncio.run(resolve_access(primary, workspace, user))
+    second = asyncio.run(resolve_access(replica, workspace, user))
+
+    assert first == second
+    assert len(primary.statements) == 1
+    assert not replica.statements
+
+
+def test_owner_missing_workspace_and_invalidation(monkeypatch):
+    monkeypatch.setattr(permissions._access_cache, "ttl", 0)
+    owner, workspace = uuid.uuid4(), uuid.uuid4()
+    db = StandInSession((owner, None))
+
+    assert asyncio.run(resolve_access(db, workspace, owner)).role == "OWNER"
+
+    outsider = uuid.uuid4()
+    access = asyncio.run(resolve_access(db, workspace, outsider))
+    assert access.exists and not access.has_access
+
+    db.row = None
+    asyncio.run(invalidate_workspace_access(workspace, db))
+    access = asyncio.run(resolve_access(db, workspace, owner))
+    assert not access.exists
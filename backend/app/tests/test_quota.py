@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services import quota_service
+from app.services.quota_service import QuotaExceededError, QuotaService, tier_limit
+
+
+class StandInResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+
+class StandInSession:
+    """Holds one workspace's messages counter; tracks open transactions."""
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.in_transaction = False
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_transaction = False  # Closing rolls back anything uncommitted
+        return False
+
+    async def execute(self, stmt):
+        self.in_transaction = True
+        if self.counter["value"] >= self.counter["limit"]:
+            return StandInResult(None)
+        self.counter["value"] += 1
+        return StandInResult(self.counter["value"])
+
+    async def commit(self):
+        self.in_transaction = False
+        self.commits += 1
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    monkeypatch.setattr(settings, "QUOTAS_ENABLED", True)
+    counter = {"value": 0, "limit": tier_limit("FREE", "messages")}
+    sessions = []
+
+    def session_factory():
+        sessions.append(StandInSession(counter))
+        return sessions[-1]
+
+    monkeypatch.setattr(quota_service, "AsyncSessionLocal", session_factory)
+    counter["sessions"] = sessions
+    return counter
+
+
+def consume(counter):
+    request_session = StandInSession(counter)
+    quota = QuotaService(request_session)
+    quota.get_tier = lambda workspace_id: asyncio.sleep(0, result="FREE")
+    asyncio.run(quota.consume_message(uuid.uuid4()))
+    return request_session
+
+
+def test_message_is_counted_outside_the_request_transaction(counter):
+    request_session = consume(counter)
+
+    assert counter["value"] == 1
+    assert not request_session.in_transaction  # The counter row isn't held by the chat request
+    (own_session,) = counter["sessions"]
+    assert own_session.commits == 1 and not own_session.in_transaction
+
+
+def test_message_over_the_limit_is_rejected(counter):
+    counter["value"] = counter["limit"]
+
+    with pytest.raises(QuotaExceededError):
+        consume(counter)
+    assert counter["value"] == counter["limit"]
+    assert not counter["sessions"][0].commits
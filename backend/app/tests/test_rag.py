@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from app.rag.context import build_context, truncate_to_tokens
+from app.rag.graph import generate_node
+from app.rag.tokenizer import count_tokens
+from app.services.llm_service import _reported_usage
+
+LONG_SENTENCE = "Refunds are issued " + " ".join(f"item{i}" for i in range(200)) + " within 14 days."
+
+
+def test_truncation_keeps_whole_sentences():
+    text = "Refunds take 14 days. Shipping takes two days. Invoices are emailed."
+    budget = count_tokens("Refunds take 14 days. Shipping takes two days.")
+
+    assert truncate_to_tokens(text, budget) == "Refunds take 14 days. Shipping takes two days."
+
+
+def test_oversized_first_sentence_is_cut_by_tokens():
+    truncated = truncate_to_tokens(LONG_SENTENCE + " Short one.", 20)
+
+    assert truncated.startswith("Refunds are issued")
+    assert 0 < count_tokens(truncated) <= 20
+    assert truncate_to_tokens(LONG_SENTENCE, 0) == ""
+
+
+def test_context_keeps_a_chunk_made_of_one_long_sentence():
+    context = build_context([{"content": LONG_SENTENCE, "distance": 0.1}], token_budget=50)
+
+    assert context["truncated"] == 1
+    assert context["text"].startswith("Refunds are issued")
+    assert 0 < context["tokens"] <= 50
+
+
+class StandInLLM:
+    def __init__(self, reported):
+        self.reported = reported
+
+    async def generate(self, prompt, workspace_id=None, usage=None):
+        usage.update(self.reported)
+        return "Refunds take 14 days."
+
+
+def usage_for(reported):
+    state = {
+        "question": "How long do refunds take?",
+        "workspace_id": uuid.uuid4(),
+        "context": [{"chunk_id": "c1", "content": "Refunds take 14 days.", "distance": 0.1}],
+        "context_token_budget": None,
+        "timings": {},
+    }
+    return asyncio.run(generate_node(state, StandInLLM(reported)))["usage"]
+
+
+def test_usage_prefers_the_models_token_counts():
+    usage = usage_for({"prompt_tokens": 321, "completion_tokens": 7})
+
+    assert (usage["prompt_tokens"], usage["completion_tokens"]) == (321, 7)
+    assert usage["token_counts"] == "reported"
+
+
+def test_usage_is_labelled_approximate_without_model_counts():
+    usage = usage_for({})
+
+    assert usage["completion_tokens"] == count_tokens("Refunds take 14 days.")
+    assert usage["token_counts"] == "approximate"
+
+
+def test_reported_usage_reads_gemini_usage_metadata():
+    response = SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=321, candidates_token_count=7))
+
+    assert _reported_usage(response) == {"prompt_tokens": 321, "completion_tokens": 7}
+    assert _reported_usage(SimpleNamespace(text="ok")) == {}
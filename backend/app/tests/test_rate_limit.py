@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.security import rate_limit
+from app.security.rate_limit import _take_local, client_ip
+
+
+def request_from(peer: str, forwarded_for: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.mark.parametrize("hops, forwarded_for, expected", [
+    (0, "203.0.113.7", "10.0.0.1"),  # No proxies: the header is client-supplied
+    (1, "203.0.113.7", "203.0.113.7"),
+    (1, "198.51.100.9, 203.0.113.7", "203.0.113.7"),  # Spoofed entry on the left
+    (2, "198.51.100.9, 203.0.113.7, 10.0.0.2", "203.0.113.7"),
+    (2, "203.0.113.7", "10.0.0.1"),  # Too few entries: didn't pass every proxy
+    (1, None, "10.0.0.1"),
+])
+def test_client_ip(monkeypatch, hops, forwarded_for, expected):
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", hops)
+    assert client_ip(request_from("10.0.0.1", forwarded_for)) == expected
+
+
+@pytest.fixture
+def local_buckets(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_local_buckets", type(rate_limit._local_buckets)())
+    return rate_limit._local_buckets
+
+
+def test_local_bucket_allows_the_burst_then_reports_the_wait(local_buckets):
+    bucket = [("ip", "chat:ip:203.0.113.7", 60.0, 3)]  # One token per second
+
+    assert [_take_local(bucket, 1) for _ in range(3)] == [(0.0, None)] * 3
+    wait, blocking = _take_local(bucket, 1)
+    assert blocking == "ip"
+    assert 0.9 < wait <= 1.0
+
+
+def test_local_bucket_refills_over_time(local_buckets):
+    bucket = [("ip", "chat:ip:203.0.113.7", 600.0, 1)]  # Ten tokens per second
+
+    assert _take_local(bucket, 1) == (0.0, None)
+    assert _take_local(bucket, 1)[1] == "ip"
+    time.sleep(0.11)
+    assert _take_local(bucket, 1) == (0.0, None)
+
+
+def test_rejected_request_takes_from_no_bucket(local_buckets):
+    buckets = [("ip", "ip-key", 60.0, 5), ("session", "session-key", 60.0, 1)]
+
+    assert _take_local(buckets, 1) == (0.0, None)
+    wait, blocking = _take_local(buckets, 1)
+
+    assert blocking == "session"
+    assert 3.9 < local_buckets["ip-key"][0] <= 4.0  # Still 4 left: the rejected request wasn't charged
+
+
+def test_local_buckets_are_bounded(local_buckets, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOCAL_MAX_KEYS", 2)
+    for i in range(3):
+        _take_local([("ip", f"ip-{i}", 60.0, 5)], 1)
+
+    assert list(local_buckets) == ["ip-1", "ip-2"]
@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.resilience import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, OverloadedError
+
+
+def limiter(**kwargs) -> AdaptiveLimiter:
+    options = dict(initial=4, min_limit=1, max_limit=8, target_latency=1.0, backoff=0.5)
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+
+def test_limiter_shrinks_on_slow_calls_and_timeouts():
+    lim = limiter()
+
+    async def run():
+        for _ in range(2):
+            await lim.acquire(1)
+        lim.release(latency=2.0)
+        assert lim.limit == 2
+        lim.release(timed_out=True)
+        assert lim.limit == 1
+        await lim.acquire(1)
+        lim.release(latency=5.0)
+        assert lim.limit == 1  # Never below min_limit
+
+    asyncio.run(run())
+    assert lim.in_flight == 0
+
+
+def test_limiter_regrows_quickly_to_the_last_good_limit():
+    lim = limiter(initial=8)
+
+    async def run():
+        await lim.acquire(1)
+        lim.release(latency=2.0)  # 8 -> 4 (8 stays the last good limit)
+        for expected in (5, 6, 7, 8):
+            await lim.acquire(1)
+            lim.release(latency=0.1)
+            assert lim.limit == expected
+        await lim.acquire(1)
+        lim.release(latency=0.1)
+        assert lim.limit == 8  # At max_limit
+
+    asyncio.run(run())
+
+
+def test_limiter_queues_callers_and_times_them_out():
+    lim = limiter(initial=1, max_limit=1)
+
+    async def run():
+        await lim.acquire(1)
+        waiter = asyncio.create_task(lim.acquire(1))
+        await asyncio.sleep(0)
+        assert lim.queued == 1
+        with pytest.raises(OverloadedError):
+            await lim.acquire(0.01)
+        lim.release()
+        queued_for = await waiter  # The slot went to the queued caller
+        assert queued_for > 0 and lim.in_flight == 1
+        lim.release()
+
+    asyncio.run(run())
+    assert lim.in_flight == 0 and lim.queued == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    lim = limiter(initial=1, max_limit=1)
+
+    async def run():
+        await lim.acquire(1)
+        waiter = asyncio.create_task(lim.acquire(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        lim.release()
+        assert await lim.acquire(0.01) == 0.0
+        lim.release()
+
+    asyncio.run(run())
+    assert lim.in_flight == 0
+
+
+def open_breaker(reset_timeout=0.05, half_open_max_calls=1) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=reset_timeout, half_open_max_calls=half_open_max_calls)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()  # Resets the streak
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_probes_after_the_reset_timeout():
+    breaker = open_breaker()
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # One probe at a time
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abandoned_probe_frees_its_slot():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_abandoned()
+
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.security.auth import hash_password, verify_and_update_password
+
+PASSWORD = "correct horse battery staple"
+
+
+async def _ticker(stop: asyncio.Event, tick: float, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - start - tick)
+
+
+def test_login_burst_keeps_event_loop_responsive():
+    stored = hash_password(PASSWORD)
+    start = time.perf_counter()
+    hash_password(PASSWORD)
+    one_hash = time.perf_counter() - start
+
+    async def burst():
+        lags, stop = [], asyncio.Event()
+        tick_task = asyncio.create_task(_ticker(stop, 0.01, lags))
+        results = await asyncio.gather(
+            *(verify_and_update_password(PASSWORD, stored) for _ in range(settings.PASSWORD_HASH_WORKERS * 4))
+        )
+        stop.set()
+        await tick_task
+        return results, lags
+
+    results, lags = asyncio.run(burst())
+
+    assert all(valid and new_hash is None for valid, new_hash in results)
+    # Inline bcrypt would stall the ticker for a whole hash per login
+    assert len(lags) > 10
+    assert max(lags) < min(0.1, one_hash / 2)
+
+
+def test_rehashes_only_cheaper_hashes():
+    cheaper = CryptContext(schemes=["bcrypt"], bcrypt__rounds=settings.BCRYPT_ROUNDS - 1).hash(PASSWORD)
+    costlier = CryptContext(schemes=["bcrypt"], bcrypt__rounds=settings.BCRYPT_ROUNDS + 1).hash(PASSWORD)
+
+    valid, new_hash = asyncio.run(verify_and_update_password(PASSWORD, cheaper))
+    assert valid
+    assert new_hash is not None and f"${settings.BCRYPT_ROUNDS:02d}$" in new_hash
+
+    valid, new_hash = asyncio.run(verify_and_update_password(PASSWORD, costlier))
+    assert valid
+    assert new_hash is None
+
+
+def test_wrong_password_is_rejected():
+    valid, new_hash = asyncio.run(verify_and_update_password("wrong", hash_password(PASSWORD)))
+    assert not valid
+    assert new_hash is None
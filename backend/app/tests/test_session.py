@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import delete, insert, select, update
+
+from app.db import session as db_session
+from app.db.models.workspace import Workspace
+from app.db.session import ReadSession, build_engine
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    read_engine = build_engine("postgresql+asyncpg://u:p@replica.invalid/db")
+    monkeypatch.setattr(db_session, "read_engine", read_engine)
+    return read_engine.sync_engine
+
+
+def bind_for(stmt, **info):
+    session = ReadSession()
+    session.info.update(info)
+    return session.get_bind(clause=stmt)
+
+
+def test_reads_go_to_the_replica(replica):
+    assert bind_for(select(Workspace)) is replica
+
+
+@pytest.mark.parametrize("stmt", [
+    insert(Workspace).values(name="w"),
+    update(Workspace).values(name="w"),
+    delete(Workspace),
+    select(Workspace).execution_options(use_primary=True),
+])
+def test_writes_and_use_primary_go_to_the_primary(replica, stmt):
+    assert bind_for(stmt) is db_session.engine.sync_engine
+
+
+def test_recent_writer_reads_from_the_primary(replica, monkeypatch):
+    monkeypatch.setitem(db_session._last_write, "client", db_session.time.monotonic())
+    assert bind_for(select(Workspace), write_scope="client") is db_session.engine.sync_engine
+    assert bind_for(select(Workspace), write_scope="other") is replica
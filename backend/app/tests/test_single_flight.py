@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("question", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+
+
+def test_calls_after_completion_run_again():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        return [await flight.do("question", work) for _ in range(2)]
+
+    assert asyncio.run(run()) == [(1, False), (2, False)]
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("a", lambda: asyncio.sleep(0.01, result="a")),
+            flight.do("b", lambda: asyncio.sleep(0.01, result="b")),
+        )
+
+    assert asyncio.run(run()) == [("a", False), ("b", False)]
+
+
+def test_failure_reaches_every_caller():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("LLM failed")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("question", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not flight._inflight
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_run():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        first = asyncio.create_task(flight.do("question", work))
+        second = asyncio.create_task(flight.do("question", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == ("answer", True)
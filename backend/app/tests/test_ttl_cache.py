@@ -0,0 +1,50 @@
+import time
+
+from app.core.ttl_cache import TTLCache
+
+
+def test_entries_expire():
+    cache = TTLCache("test", ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=10)
+
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.get("a", "missing") == "missing"
+    assert cache.get("b") == 2
+
+
+def test_least_recently_set_entries_are_dropped_at_maxsize():
+    cache = TTLCache("test", ttl=10, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 3)  # Refreshes a
+    cache.set("c", 4)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (3, 4)
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = TTLCache("test", ttl=0)
+    cache.set("a", 1)
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+def test_invalidation():
+    cache = TTLCache("test", ttl=10)
+    for key in [("ws1", "u1"), ("ws1", "u2"), ("ws2", "u1")]:
+        cache.set(key, True)
+
+    cache.invalidate(("ws2", "u1"))
+    assert cache.get(("ws2", "u1")) is None
+
+    cache.invalidate_where(lambda key: key[0] == "ws1")
+    assert cache.get(("ws1", "u1")) is None and cache.get(("ws1", "u2")) is None
+
+    cache.set("x", 1)
+    cache.clear()
+    assert cache.get("x") is None
@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.services.workspace_service import _decode_member_cursor, _encode_member_cursor
+
+
+@pytest.mark.parametrize("sort, value", [
+    ("joined_at", datetime(2026, 3, 1, 12, 30, 15, 123456)),
+    ("name", "Ada Lovelace"),
+    ("email", "ada@example.com"),
+])
+def test_member_cursor_round_trip(sort, value):
+    member_id = uuid.uuid4()
+    cursor = _encode_member_cursor(sort, "desc", value, member_id)
+
+    assert _decode_member_cursor(cursor, sort, "desc") == (value, member_id)
+
+
+def test_cursor_for_another_sort_order_is_rejected():
+    cursor = _encode_member_cursor("name", "asc", "Ada", uuid.uuid4())
+
+    with pytest.raises(ValueError, match="different sort order"):
+        _decode_member_cursor(cursor, "name", "desc")
+    with pytest.raises(ValueError, match="different sort order"):
+        _decode_member_cursor(cursor, "email", "asc")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24=", "WzEsIDJd"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        _decode_member_cursor(cursor, "name", "asc")
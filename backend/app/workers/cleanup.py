@@ -0,0 +1,219 @@
+"""
+Scheduled maintenance: ends idle conversations, expires and purges stale
+invitations, purges expired OTPs and delivered outbox emails, and every
+QUOTA_RECONCILE_INTERVAL_SECONDS recounts the workspace usage counters.
+
+Every task works in batches of MAINTENANCE_BATCH_SIZE rows, one short
+transaction each (ids picked with FOR UPDATE SKIP LOCKED, so it never waits on
+request traffic and several processes can run it at once), up to
+MAINTENANCE_MAX_BATCHES per run. Each run records rows processed and run time
+per task in metrics and the log.
+
+Runs every MAINTENANCE_INTERVAL_SECONDS from the app lifespan, or once from
+the command line (e.g. cron):
+    python -m app.workers.cleanup
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete, exists, func, select, update
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.metrics import MAINTENANCE_ROWS, MAINTENANCE_RUN_SECONDS
+from app.db.models.conversation import Conversation
+from app.db.models.email_outbox import EmailOutbox
+from app.db.models.message import Message
+from app.db.models.otp import OTP
+from app.db.models.workspace_invitation import WorkspaceInvitation
+from app.db.repositories.usage_repository import UsageCounterRepository
+
+
+def _close_idle_conversations(now: datetime, limit: int):
+    cutoff = now - timedelta(minutes=settings.CONVERSATION_IDLE_TIMEOUT_MINUTES)
+    candidate = aliased(Conversation)
+    idle_ids = (
+        select(candidate.id)
+        .where(
+            candidate.status == "active",
+            candidate.started_at < cutoff,
+            ~exists().where(Message.conversation_id == candidate.id, Message.created_at >= cutoff),
+        )
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    last_message_at = (
+        select(func.max(Message.created_at))
+        .where(Message.conversation_id == Conversation.id)
+        .scalar_subquery()
+    )
+    return (
+        update(Conversation)
+        .where(Conversation.id.in_(idle_ids))
+        .values(status="ended", ended_at=func.coalesce(last_message_at, Conversation.started_at))
+    )
+
+
+def _expire_invitations(now: datetime, limit: int):
+    due_ids = (
+        select(WorkspaceInvitation.id)
+        .where(WorkspaceInvitation.status == "PENDING", WorkspaceInvitation.expires_at < now)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return update(WorkspaceInvitation).where(WorkspaceInvitation.id.in_(due_ids)).values(status="EXPIRED")
+
+
+def _purge_invitations(now: datetime, limit: int):
+    # Accepted invitations are kept as the record of who invited whom
+    cutoff = now - timedelta(days=settings.INVITATION_RETENTION_DAYS)
+    stale_ids = (
+        select(WorkspaceInvitation.id)
+        .where(WorkspaceInvitation.status == "EXPIRED", WorkspaceInvitation.expires_at < cutoff)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return delete(WorkspaceInvitation).where(WorkspaceInvitation.id.in_(stale_ids))
+
+
+def _purge_otps(now: datetime, limit: int):
+    cutoff = now - timedelta(hours=settings.OTP_RETENTION_HOURS)
+    stale_ids = select(OTP.id).where(OTP.expires_at < cutoff).limit(limit).with_for_update(skip_locked=True)
+    return delete(OTP).where(OTP.id.in_(stale_ids))
+
+
+def _purge_email_outbox(now: datetime, limit: int):
+    # next_attempt_at is when a finished row was last claimed, i.e. about when it was sent
+    # or given up on; filtering on it uses the sender's (status, next_attempt_at) index
+    cutoff = now - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+    stale_ids = (
+        select(EmailOutbox.id)
+        .where(EmailOutbox.status.in_(("SENT", "FAILED")), EmailOutbox.next_attempt_at < cutoff)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return delete(EmailOutbox).where(EmailOutbox.id.in_(stale_ids))
+
+
+# Run in this order: invitations are expired before the purge looks at them
+TASKS: Dict[str, Callable] = {
+    "close_idle_conversations": _close_idle_conversations,
+    "expire_invitations": _expire_invitations,
+    "purge_invitations": _purge_invitations,
+    "purge_otps": _purge_otps,
+    "purge_email_outbox": _purge_email_outbox,
+}
+
+
+async def run_task(session_factory, name: str, build_statement: Callable) -> int:
+    """Run one task to completion (or MAINTENANCE_MAX_BATCHES); returns rows processed."""
+    batch_size = settings.MAINTENANCE_BATCH_SIZE
+    start = time.perf_counter()
+    total = 0
+    try:
+        for _ in range(settings.MAINTENANCE_MAX_BATCHES):
+            async with session_factory() as session:
+                result = await session.execute(
+                    build_statement(datetime.utcnow(), batch_size).execution_options(synchronize_session=False)
+                )
+                await session.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+            await asyncio.sleep(settings.MAINTENANCE_BATCH_PAUSE_SECONDS)
+    finally:
+        elapsed = time.perf_counter() - start
+        MAINTENANCE_RUN_SECONDS.labels(task=name).observe(elapsed)
+        MAINTENANCE_ROWS.labels(task=name).inc(total)
+    return total
+
+
+async def run_maintenance(session_factory=None) -> Dict[str, dict]:
+    """Run every task once. A failing task is logged and doesn't stop the others."""
+    if session_factory is None:
+        from app.db.session import AsyncSessionLocal
+        session_factory = AsyncSessionLocal
+
+    report = {}
+    for name, build_statement in TASKS.items():
+        start = time.perf_counter()
+        try:
+            rows = await run_task(session_factory, name, build_statement)
+            report[name] = {"rows": rows, "seconds": round(time.perf_counter() - start, 3)}
+        except Exception as e:
+            report[name] = {"error": str(e), "seconds": round(time.perf_counter() - start, 3)}
+            print(f"[DEBUG] Maintenance task {name} failed: {e}")
+    print(f"[DEBUG] Maintenance run: {report}")
+    return report
+
+
+async def reconcile_usage(session_factory=None) -> Dict[str, dict]:
+    """
+    Recount every usage counter from its source table (one statement per
+    metric), correcting drift from missed or concurrent increments.
+    """
+    if session_factory is None:
+        from app.db.session import AsyncSessionLocal
+        session_factory = AsyncSessionLocal
+
+    report = {}
+    for metric in ("members", "agents", "documents", "messages"):
+        start = time.perf_counter()
+        try:
+            async with session_factory() as session:
+                rows = await UsageCounterRepository(session).reconcile(metric)
+            report[metric] = {"rows": rows, "seconds": round(time.perf_counter() - start, 3)}
+            MAINTENANCE_ROWS.labels(task=f"reconcile_{metric}").inc(rows)
+        except Exception as e:
+            report[metric] = {"error": str(e), "seconds": round(time.perf_counter() - start, 3)}
+            print(f"[DEBUG] Usage reconciliation for {metric} failed: {e}")
+        MAINTENANCE_RUN_SECONDS.labels(task=f"reconcile_{metric}").observe(time.perf_counter() - start)
+    print(f"[DEBUG] Usage reconciliation: {report}")
+    return report
+
+
+_scheduler_task: Optional[asyncio.Task] = None
+
+
+async def _schedule():
+    last_reconcile = time.monotonic()
+    while True:
+        await asyncio.sleep(settings.MAINTENANCE_INTERVAL_SECONDS)
+        await run_maintenance()
+        if time.monotonic() - last_reconcile >= settings.QUOTA_RECONCILE_INTERVAL_SECONDS:
+            await reconcile_usage()
+            last_reconcile = time.monotonic()
+
+
+def start_maintenance():
+    """Start the maintenance scheduler (on app startup); the first run is one interval in."""
+    global _scheduler_task
+    if settings.MAINTENANCE_ENABLED and _scheduler_task is None:
+        _scheduler_task = asyncio.create_task(_schedule())
+
+
+async def stop_maintenance():
+    """Stop the scheduler (on app shutdown), abandoning a run in progress; each batch is its own transaction."""
+    global _scheduler_task
+    if _scheduler_task is None:
+        return
+    _scheduler_task.cancel()
+    try:
+        await _scheduler_task
+    except asyncio.CancelledError:
+        pass
+    _scheduler_task = None
+
+
+if __name__ == "__main__":
+    async def _main():
+        from app.db.session import engine
+        try:
+            await run_maintenance()
+            await reconcile_usage()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(_main())
@@ -0,0 +1,226 @@
+"""
+Background sender for the email outbox.
+
+Every EMAIL_OUTBOX_POLL_SECONDS (or as soon as this process queues an email)
+the sender claims a batch of due PENDING rows with FOR UPDATE SKIP LOCKED, so
+several app processes can run it side by side, and leases them for
+EMAIL_OUTBOX_LEASE_SECONDS. It then delivers the batch over one long-lived SMTP
+connection. Failures are retried with exponential backoff up to
+EMAIL_OUTBOX_MAX_ATTEMPTS; permanent SMTP rejections (5xx) are not retried.
+Delivery is at-least-once: a sender that dies mid-batch leaves its rows to be
+picked up again when the lease runs out.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+from pathlib import Path
+from typing import List, Optional
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import EMAIL_DELIVERIES, EMAIL_SMTP_CONNECTIONS
+from app.db.models.email_outbox import EmailOutbox
+
+TEMPLATE_FOLDER = Path(__file__).parent.parent / "templates" / "email"
+
+# Set in session.info by EmailService when it queues rows in the session's transaction
+QUEUED_FLAG = "email_queued"
+
+# Compiled templates stay cached in the environment for the life of the process
+_templates = Environment(
+    loader=FileSystemLoader(str(TEMPLATE_FOLDER)),
+    autoescape=select_autoescape(["html", "xml"]),
+)
+
+
+def precompile_templates():
+    for name in _templates.list_templates():
+        _templates.get_template(name)
+
+
+def build_message(to_email: str, subject: str, template_name: str, template_body: dict) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(_templates.get_template(template_name).render(**(template_body or {})), subtype="html")
+    return message
+
+
+class SmtpTransport:
+    """One SMTP connection kept open across sends, reopened when the server drops it."""
+
+    def __init__(self):
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=settings.MAIL_STARTTLS,
+            validate_certs=settings.VALIDATE_CERTS,
+            timeout=settings.MAIL_TIMEOUT_SECONDS,
+        )
+        await smtp.connect()
+        if settings.USE_CREDENTIALS:
+            await smtp.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+        EMAIL_SMTP_CONNECTIONS.inc()
+        self._smtp = smtp
+        return smtp
+
+    async def send(self, message: EmailMessage):
+        smtp = self._smtp if self._smtp is not None and self._smtp.is_connected else await self._connect()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # Idle connection closed by the server; retry once on a fresh one
+            self._smtp = None
+            smtp = await self._connect()
+            await smtp.send_message(message)
+
+    async def close(self):
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+        self._smtp = None
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Whether the server rejected the message for good (5xx), so retrying can't help."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(r.code >= 500 for r in error.recipients)
+    return isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS, settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+class EmailOutboxSender:
+    def __init__(self, session_factory, transport: Optional[SmtpTransport] = None):
+        self.session_factory = session_factory
+        self.transport = transport or SmtpTransport()
+        self.wakeup = asyncio.Event()
+        self._stopping = False
+
+    async def process_batch(self) -> int:
+        """Claim and deliver one batch of due emails. Returns how many were claimed."""
+        async with self.session_factory() as session:
+            now = datetime.utcnow()
+            result = await session.execute(
+                select(EmailOutbox)
+                .where(EmailOutbox.status == "PENDING", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            batch: List[EmailOutbox] = list(result.scalars().all())
+            if not batch:
+                return 0
+            lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+            for email in batch:
+                email.attempts += 1
+                email.next_attempt_at = lease_until
+            await session.commit()
+
+            # No transaction is open while talking to the SMTP server
+            unreachable = False
+            for email in batch:
+                if unreachable:
+                    # Not attempted; try again after the backoff without using up an attempt
+                    email.attempts -= 1
+                    email.next_attempt_at = datetime.utcnow() + timedelta(seconds=_retry_delay(max(email.attempts, 1)))
+                    continue
+                try:
+                    await self.transport.send(build_message(email.to_email, email.subject, email.template_name, email.template_body))
+                except Exception as e:
+                    permanent = _is_permanent(e)
+                    email.last_error = str(e)[:1000]
+                    if permanent or email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                        email.status = "FAILED"
+                        EMAIL_DELIVERIES.labels(outcome="failed").inc()
+                        print(f"[DEBUG] Giving up on email {email.id} to {email.to_email}: {e}")
+                    else:
+                        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=_retry_delay(email.attempts))
+                        EMAIL_DELIVERIES.labels(outcome="retry").inc()
+                    if isinstance(e, OSError):
+                        # Connection-level failure (includes SMTP disconnects and timeouts)
+                        unreachable = True
+                        await self.transport.close()
+                else:
+                    email.status = "SENT"
+                    email.sent_at = datetime.utcnow()
+                    email.last_error = None
+                    EMAIL_DELIVERIES.labels(outcome="sent").inc()
+            await session.commit()
+            return len(batch)
+
+    async def run(self):
+        precompile_templates()
+        while not self._stopping:
+            # Cleared before the batch, so an email queued during it wakes us right after
+            self.wakeup.clear()
+            try:
+                claimed = await self.process_batch()
+            except Exception as e:
+                print(f"[DEBUG] Email outbox batch failed: {e}")
+                claimed = 0
+            if claimed >= settings.EMAIL_OUTBOX_BATCH_SIZE:
+                continue  # More may be due right away
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), settings.EMAIL_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        self._stopping = True
+        self.wakeup.set()
+
+
+_sender: Optional[EmailOutboxSender] = None
+_sender_task: Optional[asyncio.Task] = None
+
+
+def notify_email_sender():
+    """Wake this process's sender after queueing an email."""
+    if _sender is not None:
+        _sender.wakeup.set()
+
+
+# A rolled-back flag only costs one early wakeup, on the session's next commit
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop(QUEUED_FLAG, False):
+        notify_email_sender()
+
+
+def start_email_sender():
+    """Start the background sender (on app startup)."""
+    global _sender, _sender_task
+    if not settings.EMAIL_SENDER_ENABLED or _sender_task is not None:
+        return
+    from app.db.session import AsyncSessionLocal
+    _sender = EmailOutboxSender(AsyncSessionLocal)
+    _sender_task = asyncio.create_task(_sender.run())
+
+
+async def stop_email_sender():
+    """Let the current batch finish, then close the SMTP connection (on app shutdown)."""
+    global _sender, _sender_task
+    if _sender_task is None:
+        return
+    await _sender.stop()
+    try:
+        await asyncio.wait_for(_sender_task, settings.MAIL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _sender_task.cancel()
+    await _sender.transport.close()
+    _sender, _sender_task = None, None
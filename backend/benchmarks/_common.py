@@ -0,0 +1,25 @@
+"""Helpers shared by the benchmark scripts: results files tagged with the git commit."""
+import json
+import subprocess
+from typing import Optional
+
+
+def git_commit() -> str:
+    """Short hash of HEAD, or "unknown" outside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def result_record(benchmark: str, **fields) -> dict:
+    """A results document: the benchmark name and the commit it ran on, then fields."""
+    return {"benchmark": benchmark, "commit": git_commit(), **fields}
+
+
+def write_json(path: Optional[str], record: dict):
+    """Write record to path as JSON; does nothing without a path (no --json)."""
+    if not path:
+        return
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
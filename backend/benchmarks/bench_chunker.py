@@ -0,0 +1,119 @@
+"""
+Chunker throughput benchmark.
+
+Compares the token-aware chunker (app.rag.chunker) against the previous
+LangChain RecursiveCharacterTextSplitter (1000/200 characters) on the same
+document, and reports MB/s plus how many chunks overflow the embedding
+model's token window.
+
+Usage (from backend/):
+    python -m benchmarks.bench_chunker --mb 5
+    python -m benchmarks.bench_chunker --pdf path/to/file.pdf --json results.json
+"""
+import argparse
+import random
+import time
+
+from app.rag.chunker import iter_chunks
+from app.rag.tokenizer import count_tokens_batch, load_tokenizer
+from benchmarks._common import result_record, write_json
+
+EMBEDDING_WINDOW = 126  # MiniLM max_seq_length (128) minus [CLS]/[SEP]
+
+_WORDS = (
+    "agent workspace document answer customer support pricing refund order account "
+    "shipping policy invoice subscription widget knowledge search upload billing plan "
+    "team member invitation security password analytics conversation message"
+).split()
+
+
+def synthetic_pages(target_mb: float, seed: int = 42) -> list[str]:
+    """Build pages of headings and paragraphs totalling roughly target_mb."""
+    rng = random.Random(seed)
+    target = int(target_mb * 1024 * 1024)
+    pages, size, section = [], 0, 1
+
+    while size < target:
+        lines = []
+        for _ in range(rng.randint(2, 5)):
+            lines.append(f"{section}. {' '.join(rng.choice(_WORDS) for _ in range(3)).title()}")
+            section += 1
+            for _ in range(rng.randint(1, 4)):
+                sentences = [
+                    " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 30))).capitalize() + "."
+                    for _ in range(rng.randint(1, 12))
+                ]
+                # Wrap like extracted PDF text (~80 chars per line)
+                paragraph, line = [], ""
+                for word in " ".join(sentences).split():
+                    if len(line) + len(word) > 80:
+                        paragraph.append(line)
+                        line = ""
+                    line = f"{line} {word}".strip()
+                paragraph.append(line)
+                lines.extend(paragraph)
+                lines.append("")
+        page = "\n".join(lines)
+        pages.append(page)
+        size += len(page.encode("utf-8"))
+
+    return pages
+
+
+def pdf_pages(path: str) -> list[str]:
+    from pypdf import PdfReader
+    return [page.extract_text() or "" for page in PdfReader(path).pages]
+
+
+def summarize(name: str, contents: list[str], seconds: float, size_bytes: int) -> dict:
+    tokens = count_tokens_batch(contents) if contents else []
+    over = sum(1 for t in tokens if t > EMBEDDING_WINDOW)
+    return {
+        "splitter": name,
+        "seconds": round(seconds, 4),
+        "mb_per_s": round(size_bytes / (1024 * 1024) / seconds, 2) if seconds else None,
+        "chunks": len(contents),
+        "avg_tokens": round(sum(tokens) / len(tokens), 1) if tokens else 0,
+        "max_tokens": max(tokens) if tokens else 0,
+        "over_window_pct": round(over / len(tokens) * 100, 1) if tokens else 0,
+    }
+
+
+def run(pages: list[str]) -> list[dict]:
+    text = "".join(page + "\n" for page in pages)
+    size_bytes = len(text.encode("utf-8"))
+    results = []
+    load_tokenizer()  # Load outside the timed sections
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    start = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", " ", ""])
+    baseline = splitter.split_text(text)
+    results.append(summarize("recursive_character_1000_200", baseline, time.perf_counter() - start, size_bytes))
+
+    start = time.perf_counter()
+    chunks = [chunk["content"] for chunk in iter_chunks(pages)]
+    results.append(summarize("token_aware", chunks, time.perf_counter() - start, size_bytes))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=2.0, help="Size of the synthetic document in MB")
+    parser.add_argument("--pdf", help="Benchmark a real PDF instead of synthetic text")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdf) if args.pdf else synthetic_pages(args.mb)
+    results = run(pages)
+
+    for r in results:
+        print(f"{r['splitter']:<32} {r['mb_per_s']:>8} MB/s  {r['chunks']:>7} chunks  "
+              f"avg {r['avg_tokens']:>6} tok  max {r['max_tokens']:>5} tok  {r['over_window_pct']:>5}% over window")
+
+    write_json(args.json, result_record("chunker", pages=len(pages), results=results))
+
+
+if __name__ == "__main__":
+    main()
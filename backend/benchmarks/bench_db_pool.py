@@ -0,0 +1,119 @@
+"""
+Database engine load test.
+
+Runs the same concurrent workload against two engines pointed at
+DATABASE_URL (or --url):
+
+  baseline    the previous engine: create_async_engine(url, echo=True) with
+              SQLAlchemy's default pool (5 + 10 overflow)
+  configured  app.db.session.build_engine(), i.e. the Settings-driven pool,
+              statement cache and timeouts
+
+Each request opens a session, runs a short read and a short pg_sleep (to
+hold the connection like a real request would), and closes it. Reports
+requests/s, latency percentiles and pool checkout wait times.
+
+Needs a reachable Postgres. Usage (from backend/):
+    python -m benchmarks.bench_db_pool --concurrency 50 --requests 2000
+    python -m benchmarks.bench_db_pool --url postgresql+asyncpg://... --json results.json
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.session import build_engine, pool_status
+from benchmarks._common import result_record, write_json
+
+
+async def load(engine, concurrency: int, requests: int, hold_ms: float) -> dict:
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                async with Session() as session:
+                    await session.execute(text("SELECT count(*) FROM pg_catalog.pg_class WHERE relkind = :kind"), {"kind": "r"})
+                    await session.execute(text("SELECT pg_sleep(:s)"), {"s": hold_ms / 1000})
+                    await session.commit()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    # Warm up connections outside the timed section
+    async with Session() as session:
+        await session.execute(text("SELECT 1"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+        "pool": pool_status(engine),
+    }
+    await engine.dispose()
+    return result
+
+
+def baseline_engine(url: str):
+    engine = create_async_engine(url, echo=True)
+    # echo=True logs to stdout; keep the formatting cost but drop the output
+    devnull = open(os.devnull, "w")
+    for handler in logging.getLogger("sqlalchemy.engine.Engine").handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(devnull)
+    return engine
+
+
+async def run(url: str, concurrency: int, requests: int, hold_ms: float) -> list:
+    results = []
+    for name, make_engine in (("baseline", baseline_engine), ("configured", build_engine)):
+        result = await load(make_engine(url), concurrency, requests, hold_ms)
+        results.append({"engine": name, **result})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="Database URL (defaults to DATABASE_URL)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--hold-ms", type=float, default=5.0, help="Time each request holds its connection")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.url, args.concurrency, args.requests, args.hold_ms))
+
+    for r in results:
+        pool = r["pool"]
+        print(f"{r['engine']:<11} {r['requests_per_s']:>8} req/s  p50 {r['p50_ms']:>7} ms  p95 {r['p95_ms']:>7} ms  "
+              f"errors {r['errors']:>4}  wait avg {pool.get('checkout_wait_avg_ms', '-')} ms  "
+              f"max {pool.get('checkout_wait_max_ms', '-')} ms")
+
+    write_json(args.json, result_record("db_pool", concurrency=args.concurrency, results=results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark email delivery against a local SMTP stand-in.
+
+Starts a minimal in-process SMTP server (optionally adding --smtp-latency-ms
+per command, to mimic a remote server) and sends --emails rendered messages:
+
+  per_message  a new SMTP connection per email, as fastapi-mail did
+  reused       app.workers.email_outbox.SmtpTransport, one long-lived connection
+  outbox       (--db) rows queued through EmailService and delivered by
+               EmailOutboxSender.process_batch, end to end; needs a migrated
+               Postgres at DATABASE_URL and removes its rows afterwards
+
+Also checks that every email reached the stand-in and that a dropped
+connection is recovered. Reports time, emails/s and connections opened.
+
+Usage (from backend/):
+    python -m benchmarks.bench_email_outbox --emails 200 --smtp-latency-ms 20
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import result_record, write_json
+
+
+class SmtpStandIn:
+    """Accepts any mail; counts connections and delivered messages."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self.messages = []
+        self.server = None
+        self._writers = set()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop_connections(self):
+        for writer in list(self._writers):
+            writer.close()
+
+    async def _reply(self, writer, line: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(f"{line}\r\n".encode())
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            await self._reply(writer, "220 stand-in ESMTP")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode().strip().upper()
+                if command.startswith(("EHLO", "HELO")):
+                    await self._reply(writer, "250 stand-in")
+                elif command == "DATA":
+                    await self._reply(writer, "354 end with .")
+                    data = []
+                    while (chunk := await reader.readline()) not in (b".\r\n", b""):
+                        data.append(chunk)
+                    self.messages.append(b"".join(data))
+                    await self._reply(writer, "250 queued")
+                elif command == "QUIT":
+                    await self._reply(writer, "221 bye")
+                    return
+                else:  # MAIL, RCPT, RSET, NOOP
+                    await self._reply(writer, "250 ok")
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def sample_message(i: int):
+    from app.workers.email_outbox import build_message
+    return build_message(f"user{i}@bench.example", "Verify your Insydr Account", "verification.html",
+                         {"name": f"User {i}", "otp_code": "123456", "expiry_minutes": 10})
+
+
+async def per_message(emails: int):
+    import aiosmtplib
+    from app.core.config import settings
+
+    for i in range(emails):
+        smtp = aiosmtplib.SMTP(hostname=settings.MAIL_SERVER, port=settings.MAIL_PORT, start_tls=False)
+        await smtp.connect()
+        await smtp.send_message(sample_message(i))
+        await smtp.quit()
+
+
+async def reused(emails: int, stand_in: SmtpStandIn):
+    from app.workers.email_outbox import SmtpTransport
+
+    transport = SmtpTransport()
+    try:
+        for i in range(emails):
+            if i == emails // 2:
+                stand_in.drop_connections()  # The transport must reconnect transparently
+                await asyncio.sleep(0.01)
+            await transport.send(sample_message(i))
+    finally:
+        await transport.close()
+
+
+async def outbox(emails: int):
+    from sqlalchemy import delete
+
+    from app.db.models.email_outbox import EmailOutbox
+    from app.db.session import AsyncSessionLocal
+    from app.services.email_service import EmailService
+    from app.workers.email_outbox import EmailOutboxSender
+
+    recipients = [f"outbox{i}@bench.example" for i in range(emails)]
+    async with AsyncSessionLocal() as session:
+        await EmailService(session).send_email("Benchmark", recipients, "welcome.html", {"name": "Bench"})
+        await session.commit()
+    sender = EmailOutboxSender(AsyncSessionLocal)
+    try:
+        while await sender.process_batch():
+            pass
+    finally:
+        await sender.transport.close()
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(EmailOutbox).where(EmailOutbox.to_email.in_(recipients)))
+            await session.commit()
+
+
+async def run(args) -> dict:
+    from app.core.config import settings
+
+    stand_in = SmtpStandIn(args.smtp_latency_ms / 1000)
+    settings.MAIL_SERVER, settings.MAIL_PORT = "127.0.0.1", await stand_in.start()
+    settings.MAIL_STARTTLS, settings.MAIL_SSL_TLS, settings.USE_CREDENTIALS = False, False, False
+
+    variants = {"per_message": lambda: per_message(args.emails), "reused": lambda: reused(args.emails, stand_in)}
+    if args.db:
+        variants["outbox"] = lambda: outbox(args.emails)
+
+    results = {}
+    try:
+        for name, fn in variants.items():
+            stand_in.connections, stand_in.messages = 0, []
+            start = time.perf_counter()
+            await fn()
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                "delivered": len(stand_in.messages),
+                "connections": stand_in.connections,
+                "seconds": round(elapsed, 3),
+                "emails_per_s": round(len(stand_in.messages) / elapsed, 1),
+            }
+            if len(stand_in.messages) != args.emails:
+                raise RuntimeError(f"{name}: {len(stand_in.messages)} of {args.emails} emails delivered")
+    finally:
+        await stand_in.stop()
+        if args.db:
+            from app.db.session import engine
+            await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--smtp-latency-ms", type=float, default=0.0)
+    parser.add_argument("--db", action="store_true", help="Also run the outbox end to end (needs Postgres)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for name, r in results.items():
+        print(f"{name:<12} delivered {r['delivered']:>5}  connections {r['connections']:>5}  "
+              f"{r['seconds']:>7} s  {r['emails_per_s']:>7} emails/s")
+
+    write_json(args.json, result_record("email_outbox", config=vars(args), results=results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Upload / ingestion overlap timing check.
+
+Runs KnowledgeService.ingest_file with local stand-ins for the Cloudinary
+upload (a sleep), the embedding API (a sleep per batch) and the database,
+and compares its wall time against running the upload and the ingestion
+pipeline back to back. Also checks that a failed upload leaves no document
+behind and that a failed embedding leaves the document as 'error_embedding'.
+Text extraction and chunking are real (synthetic pages, or --pdf).
+
+Exits non-zero if ingest_file isn't overlapping the two or a failure case
+leaves an inconsistent status.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingest_overlap --upload-seconds 2 --embed-ms 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import app.services.cloudinary_service as cloudinary_service
+from app.rag.tokenizer import load_tokenizer
+from app.services.knowledge_service import KnowledgeService
+from benchmarks.bench_chunker import pdf_pages, synthetic_pages
+from benchmarks._common import result_record, write_json
+
+
+class StandInSession:
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+
+class StandInRepository:
+    """Just enough of KnowledgeRepository for ingest_file."""
+
+    def __init__(self):
+        self.session = StandInSession()
+        self.documents = {}
+        self.saved_chunks = {}
+
+    async def get_document(self, document_id):
+        return self.documents.get(document_id)
+
+    async def create_document(self, document):
+        self.documents[document.id] = document
+        return document
+
+    async def get_embeddings_by_hashes(self, workspace_id, content_hashes):
+        return {}
+
+    async def save_document_tree(self, document, chunks_data, version_content=None, version_meta=None):
+        self.saved_chunks[document.id] = chunks_data
+        return document
+
+
+class StandInQuota:
+    """No tier limits; ingest_file checks and reserves a document slot."""
+
+    async def check(self, workspace_id, metric, **kwargs):
+        pass
+
+    async def reserve(self, workspace_id, metric, **kwargs):
+        pass
+
+
+class StandInEmbeddings:
+    def __init__(self, seconds_per_batch: float, fail: bool = False):
+        self.seconds_per_batch = seconds_per_batch
+        self.fail = fail
+
+    def embed_documents(self, texts):
+        time.sleep(self.seconds_per_batch)
+        if self.fail:
+            raise RuntimeError("embedding API unavailable")
+        return [[0.0] * 384 for _ in texts]
+
+
+def make_service(pages, embed_seconds: float, embed_fail: bool = False) -> KnowledgeService:
+    service = KnowledgeService(None, quota=StandInQuota())
+    service.repo = StandInRepository()
+    service.pipeline.embedding_service = StandInEmbeddings(embed_seconds, embed_fail)
+    service.pipeline._extract_pages = lambda file_path: pages
+    return service
+
+
+def make_upload(seconds: float, fail: bool = False):
+    async def upload_file(file_path, public_id=None):
+        await asyncio.sleep(seconds)
+        if fail:
+            raise RuntimeError("upload failed")
+        return {"public_id": public_id, "secure_url": f"https://example.invalid/{public_id}"}
+    return upload_file
+
+
+def temp_file() -> str:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    return path
+
+
+async def run(pages, upload_seconds: float, embed_seconds: float) -> dict:
+    workspace_id, collection_id = uuid.uuid4(), uuid.uuid4()
+    load_tokenizer()  # Load outside the timed sections
+
+    # Sequential baseline: upload, then chunk + embed
+    cloudinary_service.upload_file = make_upload(upload_seconds)
+    service = make_service(pages, embed_seconds)
+    path = temp_file()
+    start = time.perf_counter()
+    await cloudinary_service.upload_file(path)
+    prepared = await service.pipeline.prepare_document(path)
+    await service._embed_prepared(workspace_id, prepared)
+    sequential = time.perf_counter() - start
+    os.remove(path)
+
+    # ingest_file: upload and processing overlap
+    service = make_service(pages, embed_seconds)
+    path = temp_file()
+    start = time.perf_counter()
+    document = await service.ingest_file(workspace_id, collection_id, path, process_embeddings=True)
+    overlapped = time.perf_counter() - start
+    checks = {
+        "processed": document.status == "processed",
+        "chunks_saved": bool(service.repo.saved_chunks.get(document.id)),
+        "file_removed": not os.path.exists(path),
+    }
+
+    # Upload fails: no document record, file removed
+    cloudinary_service.upload_file = make_upload(upload_seconds / 2, fail=True)
+    service = make_service(pages, embed_seconds)
+    path = temp_file()
+    try:
+        await service.ingest_file(workspace_id, collection_id, path, process_embeddings=True)
+        checks["upload_failure_raises"] = False
+    except RuntimeError:
+        checks["upload_failure_raises"] = True
+    checks["upload_failure_no_document"] = not service.repo.documents
+    checks["upload_failure_file_removed"] = not os.path.exists(path)
+
+    # Embedding fails: document recorded as error_embedding, no chunks
+    cloudinary_service.upload_file = make_upload(upload_seconds / 2)
+    service = make_service(pages, embed_seconds, embed_fail=True)
+    path = temp_file()
+    try:
+        await service.ingest_file(workspace_id, collection_id, path, process_embeddings=True)
+    except RuntimeError:
+        pass
+    statuses = [d.status for d in service.repo.documents.values()]
+    checks["embed_failure_status"] = statuses == ["error_embedding"]
+    checks["embed_failure_no_chunks"] = not service.repo.saved_chunks
+    checks["embed_failure_file_removed"] = not os.path.exists(path)
+
+    expected = max(upload_seconds, sequential - upload_seconds)
+    checks["overlapped"] = overlapped < sequential - 0.5 * min(upload_seconds, sequential - upload_seconds)
+
+    return {
+        "pages": len(pages),
+        "chunks": len(prepared["chunks"]),
+        "sequential_s": round(sequential, 3),
+        "ingest_file_s": round(overlapped, 3),
+        "ideal_s": round(expected, 3),
+        "speedup": round(sequential / overlapped, 2),
+        "checks": checks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=0.5, help="Size of the synthetic document in MB")
+    parser.add_argument("--pdf", help="Use the text of a real PDF instead of synthetic pages")
+    parser.add_argument("--upload-seconds", type=float, default=2.0, help="Simulated upload time")
+    parser.add_argument("--embed-ms", type=float, default=50.0, help="Simulated embedding API time per batch")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdf) if args.pdf else synthetic_pages(args.mb)
+    result = asyncio.run(run(pages, args.upload_seconds, args.embed_ms / 1000))
+
+    print(f"sequential {result['sequential_s']}s  ingest_file {result['ingest_file_s']}s  "
+          f"ideal {result['ideal_s']}s  speedup x{result['speedup']}  ({result['chunks']} chunks)")
+    for name, ok in result["checks"].items():
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+
+    write_json(args.json, result_record("ingest_overlap", config=vars(args), **result))
+
+    if not all(result["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
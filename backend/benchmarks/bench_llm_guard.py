@@ -0,0 +1,130 @@
+"""
+Exercise LLMService's concurrency limiter, timeout and circuit breaker against
+a stub model with injected latency and errors (no network, no database).
+
+Runs three phases of concurrent generate() calls:
+
+  healthy   fast responses; the limit should grow towards LLM_MAX_CONCURRENCY
+  degraded  slow responses (beyond the timeout) plus --error-rate failures;
+            the limit should shrink, the breaker open and calls fail fast
+  half_open after the reset timeout, fast responses again: one probe goes
+            through and closes the breaker, the rest of the burst is rejected
+  recovered fast responses; the limit doubles back to its last good value
+
+and reports outcomes, queue wait and limiter/breaker state per phase.
+
+Usage (from backend/):
+    python -m benchmarks.bench_llm_guard
+    python -m benchmarks.bench_llm_guard --calls 500 --concurrency 100 --json guard.json
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+from app.core.config import settings
+from benchmarks._common import result_record, write_json
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def configure(args):
+    # Scaled-down timings so a run takes seconds
+    settings.LLM_TIMEOUT_SECONDS = args.timeout_ms / 1000
+    settings.LLM_QUEUE_TIMEOUT_SECONDS = args.queue_timeout_ms / 1000
+    settings.LLM_TARGET_LATENCY_SECONDS = args.target_ms / 1000
+    settings.LLM_BREAKER_RESET_SECONDS = args.reset_ms / 1000
+    settings.GOOGLE_API_KEY = settings.GOOGLE_API_KEY or "stub"
+
+
+async def run_phase(service, name: str, calls: int, concurrency: int, workspaces: int, latency_ms: float, error_rate: float) -> dict:
+    from app.core.resilience import CircuitOpenError, OverloadedError
+    from app.services import llm_service
+
+    rng = random.Random(name)
+
+    async def call_model(prompt):
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * latency_ms / 1000)
+        if rng.random() < error_rate:
+            raise RuntimeError("injected failure")
+        return StubResponse("ok")
+
+    service._call_model = call_model
+
+    outcomes = Counter()
+    durations = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await service.generate("prompt", workspace_id=f"ws-{i % workspaces}")
+                outcomes["success"] += 1
+            except CircuitOpenError:
+                outcomes["circuit_open"] += 1
+            except OverloadedError:
+                outcomes["overloaded"] += 1
+            except asyncio.TimeoutError:
+                outcomes["timeout"] += 1
+            except RuntimeError:
+                outcomes["error"] += 1
+            durations.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+    durations.sort()
+    return {
+        "phase": name,
+        "seconds": round(elapsed, 3),
+        "outcomes": dict(outcomes),
+        "p50_ms": round(durations[len(durations) // 2] * 1000, 1),
+        "p95_ms": round(durations[int(len(durations) * 0.95) - 1] * 1000, 1),
+        "global_limit": int(llm_service._global_limiter.limit),
+        "breaker": llm_service._breaker.state,
+    }
+
+
+async def run(args) -> list:
+    from app.services.llm_service import LLMService
+
+    service = LLMService()
+    results = [await run_phase(service, "healthy", args.calls, args.concurrency, args.workspaces, args.latency_ms, 0.0)]
+    results.append(await run_phase(service, "degraded", args.calls, args.concurrency, args.workspaces,
+                                   args.timeout_ms * 2, args.error_rate))
+    await asyncio.sleep(args.reset_ms / 1000)
+    results.append(await run_phase(service, "half_open", args.calls, args.concurrency, args.workspaces, args.latency_ms, 0.0))
+    results.append(await run_phase(service, "recovered", args.calls, args.concurrency, args.workspaces, args.latency_ms, 0.0))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300, help="Calls per phase")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent callers")
+    parser.add_argument("--workspaces", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Healthy stub latency")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="Failure rate in the degraded phase")
+    parser.add_argument("--timeout-ms", type=float, default=200.0)
+    parser.add_argument("--queue-timeout-ms", type=float, default=100.0)
+    parser.add_argument("--target-ms", type=float, default=150.0)
+    parser.add_argument("--reset-ms", type=float, default=500.0)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    configure(args)
+    results = asyncio.run(run(args))
+    for r in results:
+        print(f"{r['phase']:<9} {r['seconds']:>6}s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  "
+              f"limit {r['global_limit']}  breaker {r['breaker']}  {r['outcomes']}")
+
+    write_json(args.json, result_record("llm_guard", config=vars(args), results=results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark listing the members of a large workspace.
+
+Seeds a throwaway workspace with --members members (each with its own user),
+then compares:
+
+  n_plus_one  the previous approach: load member rows, then one users lookup
+              per member (plus the workspace and its owner)
+  paged       WorkspaceService.get_members: members joined with users, keyset
+              pagination (--page-size), following next_cursor to the end
+  first_page  WorkspaceService.get_members for the first page only
+
+reporting wall time and SQL round trips for each. Needs a migrated Postgres at
+DATABASE_URL; the seeded rows are removed afterwards.
+
+Usage (from backend/):
+    python -m benchmarks.bench_members --members 5000 --page-size 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, insert
+from benchmarks._common import result_record, write_json
+
+
+async def seed(session_factory, members: int) -> dict:
+    from app.db.models.user import User
+    from app.db.models.workspace import Workspace
+    from app.db.models.workspace_member import WorkspaceMember
+
+    run_id = uuid.uuid4().hex[:8]
+    now = datetime.utcnow()
+    owner_id = uuid.uuid4()
+    user_rows = [
+        {"id": owner_id, "email": f"owner-{run_id}@bench.example", "password_hash": "x", "full_name": "Owner",
+         "email_verified": True, "created_at": now, "updated_at": now}
+    ]
+    member_rows = []
+    async with session_factory() as session:
+        workspace = Workspace(owner_id=owner_id, name=f"Members bench {run_id}", slug=f"members-bench-{run_id}",
+                              subscription_tier="BUSINESS", settings={})
+        session.add(workspace)
+        await session.flush()
+        for i in range(members):
+            user_id = uuid.uuid4()
+            user_rows.append({"id": user_id, "email": f"member-{i}-{run_id}@bench.example", "password_hash": "x",
+                              "full_name": f"Member {i:05d}", "email_verified": True,
+                              "created_at": now, "updated_at": now})
+            member_rows.append({"id": uuid.uuid4(), "workspace_id": workspace.id, "user_id": user_id,
+                                "role": "MEMBER", "joined_at": now - timedelta(seconds=i)})
+        for start in range(0, len(user_rows), 1000):
+            await session.execute(insert(User), user_rows[start:start + 1000])
+        for start in range(0, len(member_rows), 1000):
+            await session.execute(insert(WorkspaceMember), member_rows[start:start + 1000])
+        await session.commit()
+        return {"workspace_id": workspace.id, "owner_id": owner_id, "user_ids": [r["id"] for r in user_rows]}
+
+
+async def cleanup(session_factory, fixture: dict):
+    from app.db.models.user import User
+    from app.db.models.workspace import Workspace
+    from app.db.models.workspace_member import WorkspaceMember
+
+    async with session_factory() as session:
+        await session.execute(delete(WorkspaceMember).where(WorkspaceMember.workspace_id == fixture["workspace_id"]))
+        await session.execute(delete(Workspace).where(Workspace.id == fixture["workspace_id"]))
+        await session.execute(delete(User).where(User.id.in_(fixture["user_ids"])))
+        await session.commit()
+
+
+async def n_plus_one(session, workspace_id, user_id) -> int:
+    from app.db.repositories.auth_repository import UserRepository
+    from app.db.repositories.workspace_repository import WorkspaceRepository, WorkspaceMemberRepository
+
+    workspace_repo, member_repo, user_repo = WorkspaceRepository(session), WorkspaceMemberRepository(session), UserRepository(session)
+    await workspace_repo.user_has_access(workspace_id, user_id)
+    members = await member_repo.get_members(workspace_id)
+    workspace = await workspace_repo.get_by_id(workspace_id)
+    await user_repo.get_by_id(workspace.owner_id)
+    for member in members:
+        await user_repo.get_by_id(member.user_id)
+    return len(members) + 1
+
+
+async def paged(service, workspace_id, user_id, page_size: int, first_only: bool) -> int:
+    rows, cursor = 0, None
+    while True:
+        page = await service.get_members(workspace_id, user_id, limit=page_size, cursor=cursor)
+        rows += len(page["members"])
+        cursor = page["next_cursor"]
+        if first_only or not cursor:
+            return rows
+
+
+async def run(args) -> dict:
+    from app.api.deps import _build_workspace_service
+    from app.db.session import AsyncSessionLocal, engine
+
+    statements = {"count": 0}
+
+    def count_statement(*_):
+        statements["count"] += 1
+
+    fixture = await seed(AsyncSessionLocal, args.members)
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    results = {}
+    try:
+        variants = {
+            "n_plus_one": lambda s: n_plus_one(s, fixture["workspace_id"], fixture["owner_id"]),
+            "paged": lambda s: paged(_build_workspace_service(s), fixture["workspace_id"], fixture["owner_id"], args.page_size, False),
+            "first_page": lambda s: paged(_build_workspace_service(s), fixture["workspace_id"], fixture["owner_id"], args.page_size, True),
+        }
+        for name, fn in variants.items():
+            timings = []
+            for _ in range(args.repeat):
+                async with AsyncSessionLocal() as session:
+                    statements["count"] = 0
+                    start = time.perf_counter()
+                    rows = await fn(session)
+                    timings.append(time.perf_counter() - start)
+            results[name] = {
+                "rows": rows,
+                "queries": statements["count"],
+                "best_ms": round(min(timings) * 1000, 1),
+                "mean_ms": round(sum(timings) / len(timings) * 1000, 1),
+            }
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+        await cleanup(AsyncSessionLocal, fixture)
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for name, r in results.items():
+        print(f"{name:<11} rows {r['rows']:>6}  queries {r['queries']:>6}  best {r['best_ms']} ms  mean {r['mean_ms']} ms")
+
+    write_json(args.json, result_record("members", config=vars(args), results=results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark event-loop responsiveness during a burst of password checks.
+
+Fires --logins concurrent bcrypt verifications while a ticker coroutine sleeps
+for --tick-ms in a loop and records how late each wake-up is (a stand-in for
+every other request on the worker, e.g. widget chats):
+
+  inline  verify_password() called directly in the coroutine (the old login path)
+  pool    verify_and_update_password(), on the bounded hashing pool
+
+Reports the burst's wall time and the ticker's lag (p50/p99/max). With the
+pool, lag should stay near zero while inline lag grows with every login.
+Needs no database.
+
+Usage (from backend/):
+    python -m benchmarks.bench_password_hash --logins 32
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks._common import result_record, write_json
+
+
+async def ticker(stop: asyncio.Event, tick: float, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, time.perf_counter() - start - tick))
+
+
+async def burst(mode: str, logins: int, tick: float) -> dict:
+    from app.security.auth import hash_password, verify_and_update_password, verify_password
+
+    stored = hash_password("correct horse battery staple")
+
+    async def inline_login():
+        return verify_password("correct horse battery staple", stored)
+
+    async def pool_login():
+        valid, _ = await verify_and_update_password("correct horse battery staple", stored)
+        return valid
+
+    login = inline_login if mode == "inline" else pool_login
+    lags, stop = [], asyncio.Event()
+    tick_task = asyncio.create_task(ticker(stop, tick, lags))
+    await asyncio.sleep(tick * 3)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    assert all(results)
+
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    return {
+        "burst_s": round(elapsed, 2),
+        "ticks": len(lags_ms),
+        "lag_p50_ms": round(statistics.median(lags_ms), 1),
+        "lag_p99_ms": round(lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))], 1),
+        "lag_max_ms": round(lags_ms[-1], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--tick-ms", type=float, default=10.0)
+    parser.add_argument("--rounds", type=int, help="Override BCRYPT_ROUNDS")
+    parser.add_argument("--workers", type=int, help="Override PASSWORD_HASH_WORKERS")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    # Must be set before app.security.auth builds the context and pool
+    from app.core.config import settings
+    if args.rounds is not None:
+        settings.BCRYPT_ROUNDS = args.rounds
+    if args.workers is not None:
+        settings.PASSWORD_HASH_WORKERS = args.workers
+    settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS = 600
+
+    results = {}
+    for mode in ("inline", "pool"):
+        results[mode] = asyncio.run(burst(mode, args.logins, args.tick_ms / 1000))
+        r = results[mode]
+        print(f"{mode:<6} burst {r['burst_s']:>6} s  ticks {r['ticks']:>5}  "
+              f"lag p50 {r['lag_p50_ms']} ms  p99 {r['lag_p99_ms']} ms  max {r['lag_max_ms']} ms")
+
+    config = dict(vars(args), rounds=settings.BCRYPT_ROUNDS, workers=settings.PASSWORD_HASH_WORKERS)
+    write_json(args.json, result_record("password_hash", config=config, results=results))
+
+
+if __name__ == "__main__":
+    main()
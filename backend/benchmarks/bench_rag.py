@@ -0,0 +1,276 @@
+"""
+RAG micro-benchmarks on synthetic corpora.
+
+Measures each stage of the RAG path on its own:
+
+  chunk    chunk_text throughput (MB/s, chunks/s)
+  pooling  EmbeddingService pooling of token-level feature_extraction output
+           (the HF call itself is stubbed)
+  prompt   generate_node context packing + prompt assembly (LLM stubbed)
+  insert   save_document_tree insert rate into a synthetic workspace     [--db]
+  search   search_similar_chunks latency and recall@k against brute-force
+           NumPy ground truth, filtered to a --selectivity fraction of the
+           workspace's documents (like an agent's knowledge_sources)      [--db]
+
+The DB stages need a migrated Postgres + pgvector at DATABASE_URL; they build
+a throwaway workspace of --chunks chunks across --documents documents and
+remove it afterwards. Results are written as JSON (with the git commit) for
+trend comparison.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rag --json rag.json
+    python -m benchmarks.bench_rag --db --chunks 100000 --documents 500 --selectivity 0.05
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+import numpy as np
+
+from benchmarks.bench_chunker import synthetic_pages
+from benchmarks._common import result_record, write_json
+
+EMBEDDING_DIM = 384
+
+
+def timed(fn, repeat: int) -> list:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def latency_summary(durations: list) -> dict:
+    ordered = sorted(durations)
+    return {
+        "runs": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000, 3),
+    }
+
+
+def synthetic_vectors(n: int, seed: int, clusters: int = 64) -> np.ndarray:
+    """Unit vectors grouped around random centroids, so nearest neighbours are meaningful."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, EMBEDDING_DIM))
+    vectors = centroids[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, EMBEDDING_DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+# ---- in-process stages ----
+
+def bench_chunk(mb: float) -> dict:
+    from app.rag.chunker import chunk_text
+    from app.rag.tokenizer import load_tokenizer
+
+    load_tokenizer()
+    text = "\n".join(synthetic_pages(mb))
+    size = len(text.encode("utf-8"))
+    start = time.perf_counter()
+    chunks = chunk_text(text)
+    elapsed = time.perf_counter() - start
+    return {
+        "mb": round(size / (1024 * 1024), 2),
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(size / (1024 * 1024) / elapsed, 2),
+        "chunks": len(chunks),
+        "chunks_per_s": round(len(chunks) / elapsed, 1),
+    }
+
+
+class _TokenLevelClient:
+    """Stands in for InferenceClient: returns [1, seq_len, 384] token embeddings."""
+
+    def __init__(self, seq_len: int):
+        rng = random.Random(3)
+        self.response = [[[rng.random() for _ in range(EMBEDDING_DIM)] for _ in range(seq_len)]]
+
+    def feature_extraction(self, text, model=None):
+        return self.response
+
+
+def bench_pooling(seq_len: int, texts: int) -> dict:
+    from app.rag.embeddings import EmbeddingService
+
+    service = EmbeddingService()
+    service.client = _TokenLevelClient(seq_len)
+    batch = [f"text {i}" for i in range(texts)]
+    durations = timed(lambda: service.embed_documents(batch), repeat=5)
+    per_text = [d / texts for d in durations]
+    return {"seq_len": seq_len, "texts_per_run": texts, **latency_summary(per_text)}
+
+
+def bench_prompt(context_chunks: int, repeat: int) -> dict:
+    from app.rag.graph import generate_node
+
+    class StubLLM:
+        async def generate(self, prompt, workspace_id=None, usage=None):
+            return "ok"
+
+    rng = random.Random(5)
+    words = "refund shipping invoice plan upgrade password account billing order delivery".split()
+    state = {
+        "question": "How long do refunds take?",
+        "workspace_id": uuid.uuid4(),
+        "context": [
+            {
+                "chunk_id": str(uuid.uuid4()),
+                "content": ". ".join(" ".join(rng.choice(words) for _ in range(12)) for _ in range(8)) + ".",
+                "distance": rng.random(),
+            }
+            for _ in range(context_chunks)
+        ],
+        "context_token_budget": None,
+        "timings": {},
+    }
+    llm = StubLLM()
+    loop = asyncio.new_event_loop()
+    try:
+        durations = timed(lambda: loop.run_until_complete(generate_node(state, llm)), repeat)
+    finally:
+        loop.close()
+    return {"context_chunks": context_chunks, **latency_summary(durations)}
+
+
+# ---- DB stages ----
+
+async def bench_db(chunks: int, documents: int, selectivity: float, queries: int, k: int) -> dict:
+    from sqlalchemy import delete, select
+    from app.db.models.document import Document
+    from app.db.models.document_chunk import DocumentChunk
+    from app.db.models.embedding import Embedding
+    from app.db.repositories.knowledge_repo import KnowledgeRepository
+    from app.db.session import AsyncSessionLocal, engine
+
+    workspace_id = uuid.uuid4()
+    collection_id = uuid.uuid4()
+    vectors = synthetic_vectors(chunks, seed=1)
+    per_document = max(1, chunks // documents)
+    document_ids = []
+    chunk_document = np.empty(chunks, dtype=np.int64)
+    chunk_ids = [None] * chunks
+
+    insert_seconds = 0.0
+    try:
+        async with AsyncSessionLocal() as session:
+            repo = KnowledgeRepository(session)
+            for d in range(documents):
+                start_index = d * per_document
+                end_index = chunks if d == documents - 1 else min(chunks, start_index + per_document)
+                if start_index >= end_index:
+                    break
+                document = Document(
+                    workspace_id=workspace_id, collection_id=collection_id, title=f"bench {d}",
+                    source_type="file", status="processed", version_number=1, meta={},
+                )
+                await repo.create_document(document)
+                rows = [
+                    {
+                        "content": f"chunk {i}",
+                        "chunk_index": i - start_index,
+                        "token_count": 2,
+                        "content_hash": f"{i:064d}",
+                        "embedding": vectors[i].tolist(),
+                        "meta": {},
+                    }
+                    for i in range(start_index, end_index)
+                ]
+                start = time.perf_counter()
+                await repo.save_document_tree(document, rows)
+                insert_seconds += time.perf_counter() - start
+                document_ids.append(document.id)
+                chunk_document[start_index:end_index] = len(document_ids) - 1
+
+            # Map rows back to their vectors for ground truth
+            result = await session.execute(
+                select(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_index)
+                .where(DocumentChunk.workspace_id == workspace_id)
+            )
+            index_of_document = {doc_id: n for n, doc_id in enumerate(document_ids)}
+            for chunk_id, document_id, chunk_index in result.all():
+                chunk_ids[index_of_document[document_id] * per_document + chunk_index] = str(chunk_id)
+
+            # Search: an agent restricted to a fraction of the documents
+            rng = np.random.default_rng(2)
+            selected = rng.choice(len(document_ids), max(1, int(len(document_ids) * selectivity)), replace=False)
+            selected_ids = [str(document_ids[i]) for i in selected]
+            mask = np.isin(chunk_document, selected)
+            candidate_index = np.nonzero(mask)[0]
+
+            query_vectors = synthetic_vectors(queries, seed=3)
+            latencies, recalls = [], []
+            for q in query_vectors:
+                start = time.perf_counter()
+                rows = await repo.search_similar_chunks(workspace_id, q.tolist(), limit=k, document_ids=selected_ids)
+                latencies.append(time.perf_counter() - start)
+
+                # Brute-force ground truth over the same filtered set
+                similarity = vectors[candidate_index] @ q
+                truth = {chunk_ids[i] for i in candidate_index[np.argsort(-similarity)[:k]]}
+                found = {str(chunk.id) for chunk, _ in rows}
+                recalls.append(len(found & truth) / len(truth) if truth else 1.0)
+    finally:
+        async with AsyncSessionLocal() as session:
+            for model in (Embedding, DocumentChunk, Document):
+                await session.execute(delete(model).where(model.workspace_id == workspace_id))
+            await session.commit()
+        await engine.dispose()
+
+    return {
+        "insert": {
+            "chunks": chunks,
+            "documents": len(document_ids),
+            "seconds": round(insert_seconds, 3),
+            "chunks_per_s": round(chunks / insert_seconds, 1) if insert_seconds else None,
+        },
+        "search": {
+            "chunks": chunks,
+            "selectivity": selectivity,
+            "candidate_chunks": int(len(candidate_index)),
+            "k": k,
+            "recall_at_k": round(float(np.mean(recalls)), 4),
+            **latency_summary(latencies),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default="chunk,pooling,prompt", help="Comma-separated in-process stages to run")
+    parser.add_argument("--mb", type=float, default=1.0, help="Text size for the chunk stage")
+    parser.add_argument("--seq-len", type=int, default=128, help="Token count per text for the pooling stage")
+    parser.add_argument("--context-chunks", type=int, default=10, help="Retrieved chunks for the prompt stage")
+    parser.add_argument("--db", action="store_true", help="Also run the insert and search stages")
+    parser.add_argument("--chunks", type=int, default=10000, help="Synthetic workspace size (1k-1M)")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--selectivity", type=float, default=0.1, help="Fraction of documents in knowledge_sources")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    stages = {s.strip() for s in args.stages.split(",") if s.strip()}
+    if "chunk" in stages:
+        results["chunk"] = bench_chunk(args.mb)
+    if "pooling" in stages:
+        results["pooling"] = bench_pooling(args.seq_len, texts=20)
+    if "prompt" in stages:
+        results["prompt"] = bench_prompt(args.context_chunks, repeat=200)
+    if args.db:
+        results.update(asyncio.run(bench_db(args.chunks, args.documents, args.selectivity, args.queries, args.k)))
+
+    for stage, result in results.items():
+        print(f"{stage:<8} " + "  ".join(f"{key}={value}" for key, value in result.items()))
+
+    write_json(args.json, result_record("rag", config=vars(args), results=results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark the widget rate limiter.
+
+Offers --requests chat turns, spread evenly over --seconds, from --clients
+client IPs against one agent (of --tier), through
+app.security.rate_limit.limit_widget_chat, and reports per backend:
+
+  local  in-process buckets (no REDIS_URL, or Redis unreachable)
+  redis  the Lua token bucket in Redis at REDIS_URL (with --redis)
+
+admitted vs. the number the buckets allow (burst + rate x duration for each
+limit that binds), rejected with their median Retry-After, and the p50/p99
+cost of one limiter check.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rate_limit --requests 2000 --seconds 5 --clients 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from benchmarks._common import result_record, write_json
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def expected_admitted(args) -> int:
+    from app.core.config import settings
+    from app.security.rate_limit import TIER_RATE_LIMITS
+
+    # Each request uses its own session, so the IP and agent buckets are the binding ones
+    per_ip = settings.RATE_LIMIT_CHAT_IP_BURST + settings.RATE_LIMIT_CHAT_IP_PER_MINUTE / 60 * args.seconds
+    per_minute, burst = TIER_RATE_LIMITS[args.tier]["agent_chat"]
+    per_agent = burst + per_minute / 60 * args.seconds
+    offered_per_ip = args.requests / args.clients
+    return int(min(args.clients * min(per_ip, offered_per_ip), per_agent, args.requests))
+
+
+async def offer(args) -> dict:
+    from app.security import rate_limit
+
+    agent_id = uuid.uuid4()
+    rate_limit.remember_agent_tier(agent_id, args.tier)
+    admitted, retry_after, check_ms = 0, [], []
+    interval = args.seconds / args.requests
+    start = time.perf_counter()
+    for i in range(args.requests):
+        delay = start + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        try:
+            await rate_limit.limit_widget_chat(f"10.0.0.{i % args.clients}", agent_id, uuid.uuid4())
+            admitted += 1
+        except rate_limit.RateLimitExceeded as e:
+            retry_after.append(e.retry_after)
+        check_ms.append((time.perf_counter() - t0) * 1000)
+    return {
+        "admitted": admitted,
+        "expected": expected_admitted(args),
+        "rejected": len(retry_after),
+        "median_retry_after_s": round(statistics.median(retry_after), 2) if retry_after else None,
+        "check_p50_ms": round(percentile(check_ms, 50), 3),
+        "check_p99_ms": round(percentile(check_ms, 99), 3),
+    }
+
+
+async def run(args) -> dict:
+    from app.core import redis as redis_module
+    from app.core.config import settings
+
+    settings.RATE_LIMIT_ENABLED = True
+    results = {}
+    saved_url = settings.REDIS_URL
+    try:
+        settings.REDIS_URL = None
+        results["local"] = await offer(args)
+        if args.redis:
+            settings.REDIS_URL = saved_url
+            if not saved_url:
+                raise SystemExit("--redis needs REDIS_URL")
+            results["redis"] = await offer(args)
+    finally:
+        settings.REDIS_URL = saved_url
+        await redis_module.close_redis()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=20, help="Distinct client IPs")
+    parser.add_argument("--tier", default="FREE", choices=["FREE", "PRO", "BUSINESS"])
+    parser.add_argument("--redis", action="store_true", help="Also run against Redis at REDIS_URL")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for name, r in results.items():
+        print(f"{name:<6} admitted {r['admitted']:>5} (expected ~{r['expected']})  rejected {r['rejected']:>5}  "
+              f"retry-after p50 {r['median_retry_after_s']} s  check p50 {r['check_p50_ms']} ms  p99 {r['check_p99_ms']} ms")
+
+    write_json(args.json, result_record("rate_limit", config=vars(args), results=results))
+
+
+if __name__ == "__main__":
+    main()
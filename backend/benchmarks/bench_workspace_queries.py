@@ -0,0 +1,153 @@
+"""
+Benchmark SQL statements per request on the workspace routes.
+
+Seeds a throwaway user, workspace and --members members, then calls each GET
+route below through the ASGI app as the workspace owner, counting statements
+per request in three modes:
+
+  no_cache   ROLE_CACHE_SECONDS=0: access is resolved per request (still once,
+             thanks to the per-session memo)
+  cold       role cache enabled, first request after a clear
+  warm       role cache enabled and populated
+
+Needs a migrated Postgres at DATABASE_URL; the seeded rows are removed afterwards.
+The role cache is only used with REDIS_URL set; without it cold and warm match no_cache.
+
+Usage (from backend/):
+    python -m benchmarks.bench_workspace_queries --repeat 20
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+from sqlalchemy import delete, event, insert
+from benchmarks._common import result_record, write_json
+
+ROUTES = {
+    "list_workspaces": "/api/v1/workspaces",
+    "get_workspace": "/api/v1/workspaces/{workspace_id}",
+    "list_members": "/api/v1/workspaces/{workspace_id}/members?limit=100",
+    "list_invitations": "/api/v1/workspaces/{workspace_id}/invitations",
+    "list_api_keys": "/api/v1/workspaces/{workspace_id}/api-keys",
+    "analytics_dashboard": "/api/v1/analytics/dashboard?workspace_id={workspace_id}",
+}
+
+
+async def seed(session_factory, members: int) -> dict:
+    from app.db.models.user import User
+    from app.db.models.workspace import Workspace
+    from app.db.models.workspace_member import WorkspaceMember
+
+    run_id = uuid.uuid4().hex[:8]
+    now = datetime.utcnow()
+    owner_id = uuid.uuid4()
+    user_rows = [
+        {"id": owner_id, "email": f"owner-{run_id}@bench.example", "password_hash": "x", "full_name": "Owner",
+         "email_verified": True, "created_at": now, "updated_at": now}
+    ]
+    async with session_factory() as session:
+        await session.execute(insert(User), user_rows)
+        workspace = Workspace(owner_id=owner_id, name=f"Queries bench {run_id}", slug=f"queries-bench-{run_id}",
+                              subscription_tier="BUSINESS", settings={})
+        session.add(workspace)
+        await session.flush()
+        member_rows = []
+        for i in range(members):
+            user_id = uuid.uuid4()
+            user_rows.append({"id": user_id, "email": f"member-{i}-{run_id}@bench.example", "password_hash": "x",
+                              "full_name": f"Member {i:05d}", "email_verified": True,
+                              "created_at": now, "updated_at": now})
+            member_rows.append({"id": uuid.uuid4(), "workspace_id": workspace.id, "user_id": user_id,
+                                "role": "MEMBER", "joined_at": now})
+        if member_rows:
+            await session.execute(insert(User), user_rows[1:])
+            await session.execute(insert(WorkspaceMember), member_rows)
+        await session.commit()
+        return {"workspace_id": workspace.id, "owner_id": owner_id, "user_ids": [r["id"] for r in user_rows]}
+
+
+async def cleanup(session_factory, fixture: dict):
+    from app.db.models.user import User
+    from app.db.models.workspace import Workspace
+    from app.db.models.workspace_member import WorkspaceMember
+
+    async with session_factory() as session:
+        await session.execute(delete(WorkspaceMember).where(WorkspaceMember.workspace_id == fixture["workspace_id"]))
+        await session.execute(delete(Workspace).where(Workspace.id == fixture["workspace_id"]))
+        await session.execute(delete(User).where(User.id.in_(fixture["user_ids"])))
+        await session.commit()
+
+
+async def measure(client, path: str, headers: dict, statements: dict, repeat: int, clear=None) -> dict:
+    counts, timings = [], []
+    for _ in range(repeat):
+        if clear:
+            clear()
+        statements["count"] = 0
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        timings.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} -> {response.status_code}: {response.text[:200]}")
+        counts.append(statements["count"])
+    return {
+        "queries": round(sum(counts) / len(counts), 1),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 1),
+    }
+
+
+async def run(args) -> dict:
+    from app.core.config import settings
+    from app.db.session import AsyncSessionLocal, engine
+    from app.main import app
+    from app.security.auth import create_access_token
+    from app.security.permissions import _access_cache
+
+    statements = {"count": 0}
+
+    def count_statement(*_):
+        statements["count"] += 1
+
+    fixture = await seed(AsyncSessionLocal, args.members)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(fixture['owner_id'])})}"}
+    ttl = settings.ROLE_CACHE_SECONDS or 30.0
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, template in ROUTES.items():
+                path = template.format(workspace_id=fixture["workspace_id"])
+                _access_cache.ttl = 0
+                no_cache = await measure(client, path, headers, statements, args.repeat)
+                _access_cache.ttl = ttl
+                cold = await measure(client, path, headers, statements, args.repeat, clear=_access_cache.clear)
+                warm = await measure(client, path, headers, statements, args.repeat)
+                results[name] = {"no_cache": no_cache, "cold": cold, "warm": warm}
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+        await cleanup(AsyncSessionLocal, fixture)
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for name, modes in results.items():
+        line = "  ".join(f"{mode} {r['queries']:>4} q {r['mean_ms']:>6} ms" for mode, r in modes.items())
+        print(f"{name:<20} {line}")
+
+    write_json(args.json, result_record("workspace_queries", config=vars(args), results=results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Load test for the public widget API.
+
+Drives full widget sessions (/widget/init -> N x /widget/chat -> /widget/event)
+at a fixed concurrency against the real FastAPI app (in-process, over ASGI)
+and the Postgres + pgvector database at DATABASE_URL. The LLM and embedding
+backends are replaced by deterministic stubs with configurable latency, so
+runs are reproducible and only measure our own code and the database.
+
+Before the run it seeds a throwaway workspace, agent, API key and a document
+with --chunks chunks (stub embeddings); --keep leaves them in place.
+
+Reports throughput and p50/p95/p99 per endpoint plus DB pool saturation
+(peak connections in use, overflow, checkout waits), and writes the results
+as JSON (tagged with the current git commit) for comparison between commits:
+
+    python -m benchmarks.load_widget --sessions 200 --concurrency 20 --json after.json
+    python -m benchmarks.load_widget --sessions 200 --concurrency 20 --compare before.json
+
+With a deliberately small pool, chat concurrency should not be capped by it
+(the peak concurrent LLM calls exceed pool_size + max_overflow):
+
+    python -m benchmarks.load_widget --pool-size 2 --max-overflow 0 --concurrency 8 --llm-ms 1000
+
+The database must already be migrated (alembic upgrade head).
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+
+import httpx
+
+from app.core.config import settings
+from benchmarks._common import result_record, write_json
+
+EMBEDDING_DIM = 384
+PAGE_URL = "https://loadtest.example/pricing"
+_WORDS = (
+    "refund shipping invoice plan upgrade password account billing order delivery "
+    "support widget agent workspace subscription cancel trial export import"
+).split()
+
+
+def stub_vector(text: str) -> list:
+    """Deterministic unit vector for text."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_DIM)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+# Concurrent stub LLM calls; with connections released during generation the
+# peak can exceed the DB pool size
+llm_calls = {"active": 0, "peak": 0}
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def install_stubs(embed_ms: float, llm_ms: float, llm_error_rate: float = 0.0):
+    """Replace the embedding API and Gemini with deterministic, fixed-latency stubs.
+
+    Only the model call itself is stubbed, so LLMService's limiter, timeout and
+    circuit breaker stay in the path; llm_error_rate injects upstream failures.
+    """
+    from app.rag.embeddings import EmbeddingService
+    from app.services.llm_service import LLMService
+
+    rng = random.Random(13)
+    llm_calls["active"] = llm_calls["peak"] = 0
+
+    def get_embedding(self, text):
+        # The real client call is synchronous too; keep its blocking behaviour
+        time.sleep(embed_ms / 1000)
+        return stub_vector(text)
+
+    async def call_model(self, prompt):
+        llm_calls["active"] += 1
+        llm_calls["peak"] = max(llm_calls["peak"], llm_calls["active"])
+        try:
+            await asyncio.sleep(llm_ms / 1000)
+        finally:
+            llm_calls["active"] -= 1
+        if rng.random() < llm_error_rate:
+            raise RuntimeError("injected LLM failure")
+        return StubResponse(f"Stub answer ({hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]}).")
+
+    EmbeddingService._get_embedding = get_embedding
+    LLMService._call_model = call_model
+
+
+async def seed(session_factory, chunks: int) -> dict:
+    """Create a workspace with an agent, an API key and one document of stub chunks."""
+    from app.db.models.agent import Agent
+    from app.db.models.api_key import ApiKey
+    from app.db.models.document import Document
+    from app.db.models.knowledge import KnowledgeCollection
+    from app.db.models.workspace import Workspace
+    from app.db.repositories.knowledge_repo import KnowledgeRepository
+    from app.rag.versioning import content_hash
+
+    rng = random.Random(7)
+    run_id = uuid.uuid4().hex[:8]
+    api_key = f"sk_live_loadtest_{uuid.uuid4().hex}"
+
+    async with session_factory() as session:
+        workspace = Workspace(owner_id=uuid.uuid4(), name=f"Load test {run_id}", slug=f"loadtest-{run_id}")
+        session.add(workspace)
+        await session.flush()
+
+        collection = KnowledgeCollection(workspace_id=workspace.id, name="Load test")
+        agent = Agent(
+            workspace_id=workspace.id, name="Load test agent", agent_type="support",
+            status="active", version="1", allowed_domains=[], configuration={},
+        )
+        session.add_all([collection, agent])
+        session.add(ApiKey(
+            workspace_id=workspace.id, name="load test", key_prefix=api_key[:12],
+            key_hash=hashlib.sha256(api_key.encode()).hexdigest(), allowed_domains=[], is_active=True,
+        ))
+        await session.flush()
+
+        document = Document(
+            workspace_id=workspace.id, collection_id=collection.id, title="Load test corpus",
+            source_type="file", status="processed", version_number=1, meta={},
+        )
+        session.add(document)
+        await session.commit()
+
+        chunk_rows = []
+        for i in range(chunks):
+            content = " ".join(rng.choice(_WORDS) for _ in range(60)).capitalize() + "."
+            chunk_rows.append({
+                "content": content,
+                "chunk_index": i,
+                "token_count": 60,
+                "content_hash": content_hash(content),
+                "embedding": stub_vector(content),
+                "meta": {},
+            })
+        await KnowledgeRepository(session).save_document_tree(document, chunk_rows)
+
+        return {"workspace_id": workspace.id, "agent_id": str(agent.id), "api_key": api_key}
+
+
+async def cleanup(session_factory, workspace_id):
+    from sqlalchemy import delete
+    from app.db.models.agent import Agent
+    from app.db.models.analytics_event import AnalyticsEvent
+    from app.db.models.api_key import ApiKey
+    from app.db.models.conversation import Conversation
+    from app.db.models.document import Document
+    from app.db.models.document_chunk import DocumentChunk
+    from app.db.models.embedding import Embedding
+    from app.db.models.knowledge import KnowledgeCollection
+    from app.db.models.message import Message
+    from app.db.models.workspace import Workspace
+
+    async with session_factory() as session:
+        for model in (Embedding, DocumentChunk, Document, KnowledgeCollection,
+                      Message, AnalyticsEvent, Conversation, ApiKey, Agent):
+            await session.execute(delete(model).where(model.workspace_id == workspace_id))
+        await session.execute(delete(Workspace).where(Workspace.id == workspace_id))
+        await session.commit()
+
+
+def percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return round(sorted_values[index] * 1000, 2)
+
+
+async def run_sessions(client: httpx.AsyncClient, fixture: dict, sessions: int, concurrency: int, messages: int) -> dict:
+    latencies = {"init": [], "chat": [], "event": []}
+    errors = {"init": 0, "chat": 0, "event": 0}
+    rng = random.Random(11)
+    questions = [f"How do I {rng.choice(_WORDS)} my {rng.choice(_WORDS)}?" for _ in range(50)]
+
+    async def call(endpoint: str, payload: dict):
+        start = time.perf_counter()
+        response = await client.post(f"/api/v1/widget/{endpoint}", json=payload)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            errors[endpoint] += 1
+            return None
+        latencies[endpoint].append(elapsed)
+        return response.json()
+
+    async def session_flow(i: int):
+        init = await call("init", {"agent_id": fixture["agent_id"], "api_key": fixture["api_key"], "page_url": PAGE_URL})
+        if not init or not init.get("allowed"):
+            return
+        for m in range(messages):
+            await call("chat", {
+                "agent_id": fixture["agent_id"],
+                "session_id": init["session_id"],
+                "message": questions[(i * messages + m) % len(questions)],
+            })
+        await call("event", {"agent_id": fixture["agent_id"], "session_id": init["session_id"], "event_type": "widget_close"})
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(i: int):
+        async with semaphore:
+            await session_flow(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for endpoint, values in latencies.items():
+        values.sort()
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "requests_per_s": round(len(values) / elapsed, 2) if elapsed else None,
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+        }
+    return {"seconds": round(elapsed, 3), "sessions_per_s": round(sessions / elapsed, 2), "endpoints": endpoints}
+
+
+async def sample_pool(engine, stop: asyncio.Event, peak: dict):
+    from app.db.session import pool_status
+
+    while not stop.is_set():
+        status = pool_status(engine)
+        peak["max_checked_out"] = max(peak.get("max_checked_out", 0), status["checked_out"])
+        peak["max_overflow"] = max(peak.get("max_overflow", 0), status["overflow"])
+        await asyncio.sleep(0.05)
+
+
+async def run(args) -> dict:
+    # Must be set before app.db.session creates the engine
+    if args.pool_size is not None:
+        settings.DB_POOL_SIZE = args.pool_size
+    if args.max_overflow is not None:
+        settings.DB_MAX_OVERFLOW = args.max_overflow
+    install_stubs(args.embed_ms, args.llm_ms, args.llm_error_rate)
+    settings.RATE_LIMIT_ENABLED = False  # Every simulated visitor comes from the same client address
+
+    from app.db.session import AsyncSessionLocal, engine, pool_status
+    from app.main import app
+
+    fixture = await seed(AsyncSessionLocal, args.chunks)
+    peak = {}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_pool(engine, stop, peak))
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            output = open(os.devnull, "w") if not args.verbose else None
+            with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+                result = await run_sessions(client, fixture, args.sessions, args.concurrency, args.messages)
+    finally:
+        stop.set()
+        await sampler
+        if not args.keep:
+            await cleanup(AsyncSessionLocal, fixture["workspace_id"])
+
+    status = pool_status(engine)
+    result["db_pool"] = {
+        "pool_size": status["pool_size"],
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "peak_checked_out": peak.get("max_checked_out", 0),
+        "peak_overflow": peak.get("max_overflow", 0),
+        "checkout_wait_avg_ms": status.get("checkout_wait_avg_ms"),
+        "checkout_wait_max_ms": status.get("checkout_wait_max_ms"),
+        "checkout_timeouts": status.get("checkout_timeouts"),
+    }
+    result["peak_concurrent_llm_calls"] = llm_calls["peak"]
+    await engine.dispose()
+    return result
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"{result['sessions_per_s']} sessions/s over {result['seconds']}s (commit {result['commit']})")
+    for endpoint, stats in result["endpoints"].items():
+        line = (f"  {endpoint:<6} {stats['requests_per_s']:>8} req/s  p50 {stats['p50_ms']} ms  "
+                f"p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms  errors {stats['errors']}")
+        if baseline and endpoint in baseline.get("endpoints", {}):
+            before = baseline["endpoints"][endpoint]
+            if before.get("p95_ms") and stats.get("p95_ms"):
+                line += f"  (p95 {(stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100:+.1f}% vs {baseline.get('commit')})"
+        print(line)
+    pool = result["db_pool"]
+    print(f"  db pool: peak {pool['peak_checked_out']}/{pool['pool_size']} in use, overflow {pool['peak_overflow']}, "
+          f"wait avg {pool['checkout_wait_avg_ms']} ms max {pool['checkout_wait_max_ms']} ms, "
+          f"timeouts {pool['checkout_timeouts']}")
+    print(f"  peak concurrent LLM calls: {result.get('peak_concurrent_llm_calls')} "
+          f"(pool holds at most {pool['pool_size'] + pool['max_overflow']} connections)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=3, help="Chat messages per session")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks in the seeded knowledge base")
+    parser.add_argument("--embed-ms", type=float, default=20.0, help="Stub embedding latency")
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="Stub LLM latency")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of stub LLM calls that fail")
+    parser.add_argument("--pool-size", type=int, help="Override DB_POOL_SIZE")
+    parser.add_argument("--max-overflow", type=int, help="Override DB_MAX_OVERFLOW")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Previous results file to compare p95 against")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded workspace")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's debug output")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    result = result_record(
+        "widget_load",
+        config={k: v for k, v in vars(args).items() if k not in ("json", "compare", "verbose", "keep")},
+        **result,
+    )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    write_json(args.json, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -84,8 +84,11 @@ export const workspaceApi = {
   createInvitation: (workspaceId: string, data: WorkspaceMemberAdd) =>
     api.post<InvitationResponse>(`/workspaces/${workspaceId}/invitations`, data),
   
-  getMembers: (workspaceId: string) =>
-    api.get<{ members: WorkspaceMember[]; total: number }>(`/workspaces/${workspaceId}/members`),
+  getMembers: (workspaceId: string, cursor?: string) =>
+    api.get<{ members: WorkspaceMember[]; total: number; next_cursor?: string | null }>(
+      `/workspaces/${workspaceId}/members`,
+      { params: cursor ? { cursor } : undefined }
+    ),
   
   removeMember: (workspaceId: string, memberId: string) =>
     api.delete(`/workspaces/${workspaceId}/members/${memberId}`),
@@ -110,8 +110,16 @@ export const fetchMembers = createAsyncThunk(
   'workspace/fetchMembers',
   async (workspaceId: string, { rejectWithValue }) => {
     try {
+      // The API returns a page at a time; follow next_cursor to list everyone
       const response = await workspaceApi.getMembers(workspaceId);
-      return response.data;
+      const members = [...response.data.members];
+      let cursor = response.data.next_cursor;
+      while (cursor) {
+        const page = await workspaceApi.getMembers(workspaceId, cursor);
+        members.push(...page.data.members);
+        cursor = page.data.next_cursor;
+      }
+      return { members, total: response.data.total };
     } catch (error: any) {
       const message = error?.response?.data?.detail || error?.message || 'Failed to fetch members';
       return rejectWithValue(message);